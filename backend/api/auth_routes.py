@@ -18,7 +18,7 @@ async def register(body: dict = Body(...)):
         logger.warning("Registration failed: missing credentials", extra={"username": username})
         raise HTTPException(status_code=400, detail="username and password required")
     try:
-        user = auth_service.create_user(username=username, email=email, password=password)
+        user = await auth_service.create_user_async(username=username, email=email, password=password)
         logger.info("User registered successfully", extra={
             "user_id": user["user_id"],
             "username": username,
@@ -44,7 +44,7 @@ async def login(form_data: dict = Body(...)):
     if not username or not password:
         logger.warning("Login attempt: missing credentials", extra={"username": username})
         raise HTTPException(status_code=400, detail="username and password required")
-    user = auth_service.authenticate_user(username, password)
+    user = await auth_service.authenticate_user_async(username, password)
     if not user:
         logger.warning("Login failed: invalid credentials", extra={"username": username})
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -1,15 +1,18 @@
+import hashlib
 from typing import Optional
-from fastapi import APIRouter, Body, HTTPException, Depends
+from fastapi import APIRouter, Body, HTTPException, Depends, Header, Query, Response
 from pydantic import BaseModel
-from datetime import datetime, timezone
-from backend.services.user_profile_service import build_user_profile
-from backend.services.db import user_profiles_col
+from backend.services.user_profile_service import build_user_profile_async
+from backend.services import profile_mutations
 from backend.services.logger import AppLogger
 from backend.api.utils import get_user_id_from_auth, require_user_id_from_auth
 
 router = APIRouter()
 logger = AppLogger.get_logger(__name__)
 
+# Largest `limit` accepted by the profile GET endpoints
+MAX_PAGE_SIZE = 1000
+
 
 # --- Request models ---
 
@@ -25,42 +28,88 @@ def get_effective_user(auth_user, user_id):
     return auth_user if auth_user and auth_user != "guest" else (user_id or "guest")
 
 
-def remove_from_implicit(profile, keyword):
-    """Remove keyword from implicit_exclusions and implicit_interests."""
-    exclusions = profile.get("implicit_exclusions", [])
-    profile["implicit_exclusions"] = [e for e in exclusions if e.lower() != keyword.lower()]
-
-    if "implicit_interests" in profile and profile.get("implicit_interests"):
-        profile["implicit_interests"] = {
-            k: v for k, v in profile["implicit_interests"].items()
-            if k.lower() != keyword.lower()
-        }
-
+def profile_etag(user_id, revision):
+    """ETag for a profile: changes whenever profile_revision does."""
+    user_hash = hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()[:12]
+    return f'"{user_hash}-{int(revision or 0)}"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header lists `etag` (weak comparison) or is "*"."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def parse_fields(fields):
+    """Split a `fields=a,b` query parameter; 400 on unknown profile fields."""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in profile_mutations.PROFILE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown profile field(s): {', '.join(unknown)}")
+    return selected or None
+
+
+async def load_profile(user_id, response, refresh=False, if_none_match=None, fields=None, limit=None, cursor=0):
+    """
+    The user's profile for a GET endpoint.
+
+    Serves the stored document instead of rebuilding it; with If-None-Match
+    only the revision is read and an unchanged profile is answered with 304.
+    `refresh=True` (or a user without a stored profile) runs a full build.
+    `fields`, `limit` and `cursor` select fields and page the history and
+    implicit-interest lists (see profile_mutations.profile_projection).
+    """
+    selected = parse_fields(fields)
+    profile = None
+    if not refresh:
+        if if_none_match:
+            revision = await profile_mutations.get_profile_revision(user_id)
+            if revision is not None and etag_matches(if_none_match, profile_etag(user_id, revision)):
+                logger.debug("Profile not modified", extra={"user_id": user_id, "profile_revision": revision})
+                return _not_modified(profile_etag(user_id, revision))
+        profile = await profile_mutations.get_stored_profile(user_id, selected, limit, cursor)
 
-def promote_to_explicit(profile, keyword, weight=1.0):
-    """Add a keyword as explicit interest and remove it from implicit lists."""
-    existing_keywords = {e["keyword"].lower() for e in profile.get("explicit_interests", [])}
-    if keyword.lower() in existing_keywords:
-        raise HTTPException(status_code=400, detail="Keyword already exists")
-
-    profile.setdefault("explicit_interests", []).append({
-        "keyword": keyword,
-        "weight": weight,
-        "last_updated": datetime.now(timezone.utc).isoformat()
-    })
+    if not profile:
+        profile = profile_mutations.shape_profile(await build_user_profile_async(user_id), selected, limit, cursor)
+    if not profile:
+        logger.warning("Profile not found", extra={"user_id": user_id})
+        raise HTTPException(status_code=404, detail="User profile not found")
 
-    remove_from_implicit(profile, keyword)
+    etag = profile_etag(user_id, profile.get("profile_revision"))
+    if refresh and etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return profile
 
 
 # --- Endpoints ---
 
 @router.get("/profiles/me")
-async def get_my_profile(user_id: str = Depends(require_user_id_from_auth)):
+async def get_my_profile(
+        response: Response,
+        refresh: bool = Query(False),
+        fields: Optional[str] = Query(None),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: int = Query(0, ge=0),
+        if_none_match: Optional[str] = Header(None),
+        user_id: str = Depends(require_user_id_from_auth)
+):
     logger.debug("Fetching profile", extra={"user_id": user_id})
-    profile = build_user_profile(user_id)
-    if not profile:
-        logger.warning("Profile not found", extra={"user_id": user_id})
-        raise HTTPException(status_code=404, detail="User profile not found")
+    profile = await load_profile(user_id, response, refresh, if_none_match, fields, limit, cursor)
+    if isinstance(profile, Response):
+        return profile
     logger.debug("Profile fetched", extra={
         "user_id": user_id,
         "implicit_count": len(profile.get("implicit_interests", {})),
@@ -70,13 +119,17 @@ async def get_my_profile(user_id: str = Depends(require_user_id_from_auth)):
 
 
 @router.get("/profiles/{user_id}")
-async def get_user_profile(user_id: str):
+async def get_user_profile(
+        user_id: str,
+        response: Response,
+        refresh: bool = Query(False),
+        fields: Optional[str] = Query(None),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: int = Query(0, ge=0),
+        if_none_match: Optional[str] = Header(None)
+):
     logger.debug("Fetching profile for user", extra={"user_id": user_id})
-    profile = build_user_profile(user_id)
-    if not profile:
-        logger.warning("Profile not found", extra={"user_id": user_id})
-        raise HTTPException(status_code=404, detail="User profile not found")
-    return profile
+    return await load_profile(user_id, response, refresh, if_none_match, fields, limit, cursor)
 
 
 @router.post("/profiles/explicit/add")
@@ -87,15 +140,11 @@ async def add_explicit_interest(
         auth_user: str = Depends(get_user_id_from_auth)
 ):
     effective_user = get_effective_user(auth_user, user_id)
-    profile = build_user_profile(effective_user)
 
-    promote_to_explicit(profile, keyword, weight)
-
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": profile},
-        upsert=True
-    )
+    try:
+        profile = await profile_mutations.add_explicit_interest(effective_user, keyword, weight)
+    except profile_mutations.KeywordExistsError:
+        raise HTTPException(status_code=400, detail="Keyword already exists")
 
     logger.info("Explicit interest added", extra={
         "user_id": effective_user,
@@ -113,31 +162,7 @@ async def bulk_update_explicit_interests(
         auth_user: str = Depends(get_user_id_from_auth)
 ):
     effective_user = get_effective_user(auth_user, user_id)
-    profile = build_user_profile(effective_user)
-
-    keyword_map = {e["keyword"].lower(): e for e in profile.get("explicit_interests", [])}
-
-    for item in updates:
-        kw = item["keyword"]
-        wt = float(item.get("weight", 1.0))
-        key = kw.lower()
-
-        if key in keyword_map:
-            keyword_map[key]["weight"] = wt
-            keyword_map[key]["last_updated"] = datetime.now(timezone.utc).isoformat()
-        else:
-            promote_to_explicit(profile, kw, wt)
-
-    profile["explicit_interests"] = list(keyword_map.values()) + [
-        e for e in profile.get("explicit_interests", [])
-        if e["keyword"].lower() not in keyword_map
-    ]
-
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": profile},
-        upsert=True
-    )
+    profile = await profile_mutations.update_explicit_interests(effective_user, updates)
 
     logger.info("Bulk explicit interests updated", extra={
         "user_id": effective_user,
@@ -154,18 +179,7 @@ async def remove_explicit_interest(
         auth_user: str = Depends(get_user_id_from_auth)
 ):
     effective_user = get_effective_user(auth_user, user_id)
-    profile = build_user_profile(effective_user)
-
-    profile["explicit_interests"] = [
-        e for e in profile.get("explicit_interests", [])
-        if e["keyword"].lower() != keyword.lower()
-    ]
-
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": profile},
-        upsert=True
-    )
+    profile = await profile_mutations.remove_explicit_interest(effective_user, keyword)
 
     logger.info("Explicit interest removed", extra={
         "user_id": effective_user,
@@ -186,19 +200,7 @@ async def remove_implicit_interest(
     if not keyword:
         raise HTTPException(status_code=400, detail="keyword required")
 
-    existing_profile = user_profiles_col.find_one({"user_id": effective_user}) or {}
-    exclusions = existing_profile.get("implicit_exclusions", [])
-
-    if keyword.lower() not in (e.lower() for e in exclusions):
-        exclusions.append(keyword)
-        user_profiles_col.update_one(
-            {"user_id": effective_user},
-            {"$set": {"implicit_exclusions": exclusions}},
-            upsert=True
-        )
-
-    profile = build_user_profile(effective_user)
-    return profile
+    return await profile_mutations.exclude_implicit_interest(effective_user, keyword)
 
 
 @router.delete("/profiles/implicit/exclusion/remove")
@@ -212,18 +214,7 @@ async def remove_implicit_exclusion(
     if not keyword:
         raise HTTPException(status_code=400, detail="keyword required")
 
-    existing_profile = user_profiles_col.find_one({"user_id": effective_user}) or {}
-    exclusions = existing_profile.get("implicit_exclusions", [])
-
-    exclusions = [e for e in exclusions if e.lower() != keyword.lower()]
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": {"implicit_exclusions": exclusions}},
-        upsert=True
-    )
-
-    profile = build_user_profile(effective_user)
-    return profile
+    return await profile_mutations.remove_implicit_exclusion(effective_user, keyword)
 
 @router.put("/profiles/implicit/upgrade")
 async def upgrade_implicit_interest(
@@ -236,27 +227,17 @@ async def upgrade_implicit_interest(
 
     effective_user = get_effective_user(auth_user, user_id)
 
-    # Load persisted profile
-    profile = user_profiles_col.find_one({"user_id": effective_user}) or {
-        "user_id": effective_user
-    }
-
     # Promote to explicit (also removes from implicit + exclusions)
-    promote_to_explicit(profile, keyword, weight=1.0)
-
-    # Persist changes
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": profile},
-        upsert=True
-    )
+    try:
+        profile = await profile_mutations.promote_implicit_interest(effective_user, keyword)
+    except profile_mutations.KeywordExistsError:
+        raise HTTPException(status_code=400, detail="Keyword already exists")
 
     logger.info("Implicit interest upgraded to explicit", extra={
         "user_id": effective_user,
         "keyword": keyword
     })
 
-    profile = build_user_profile(effective_user)
     return profile
 
 
@@ -268,16 +249,7 @@ async def clear_all_explicit_interests(
         auth_user: str = Depends(get_user_id_from_auth)
 ):
     effective_user = get_effective_user(auth_user, payload.user_id if payload else None)
-
-    profile = build_user_profile(effective_user)
-    profile["explicit_interests"] = []
-
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": profile},
-        upsert=True
-    )
-    return profile
+    return await profile_mutations.clear_explicit_interests(effective_user)
 
 
 @router.post("/profiles/implicit/clear")
@@ -286,24 +258,4 @@ async def clear_all_implicit_interests(
         auth_user: str = Depends(get_user_id_from_auth)
 ):
     effective_user = get_effective_user(auth_user, payload.user_id if payload else None)
-
-    profile = build_user_profile(effective_user)
-    implicit_keys = list(profile.get("implicit_interests", {}).keys())
-
-    stored = user_profiles_col.find_one({"user_id": effective_user}) or {}
-    current_exclusions = stored.get("implicit_exclusions", []) or []
-
-    lower_excl = {e.lower() for e in current_exclusions}
-    for k in implicit_keys:
-        if k.lower() not in lower_excl:
-            current_exclusions.append(k)
-            lower_excl.add(k.lower())
-
-    user_profiles_col.update_one(
-        {"user_id": effective_user},
-        {"$set": {"implicit_exclusions": current_exclusions}},
-        upsert=True
-    )
-
-    profile = build_user_profile(effective_user)
-    return profile
+    return await profile_mutations.clear_implicit_interests(effective_user)
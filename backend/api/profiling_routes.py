@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from backend.services import profiling
+
+router = APIRouter()
+
+
+def _require_admin(token: str | None) -> None:
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/admin/profiles")
+async def list_request_profiles(x_admin_token: str = Header(None)):
+    """
+    List stored request profiles, newest first.
+    Requires the X-Admin-Token header (PROFILING_ADMIN_TOKEN).
+    """
+    _require_admin(x_admin_token)
+    return {"profiles": profiling.list_profiles()}
+
+
+@router.get("/admin/profiles/{name}")
+async def get_request_profile(name: str, format: str = "prof", x_admin_token: str = Header(None)):
+    """
+    Download a stored profile (pstats dump, open with `python -m pstats` or
+    snakeviz), or `?format=text` for the top functions by cumulative time.
+    """
+    _require_admin(x_admin_token)
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return PlainTextResponse(profiling.render_text(path))
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
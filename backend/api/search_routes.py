@@ -1,24 +1,48 @@
 import time
-from fastapi import APIRouter, Query, Body, Depends, HTTPException
-from backend.services.search_service import search
-from backend.services.logging_service import log_query, log_interaction, log_feedback
+from fastapi import APIRouter, Query, Body, Depends, Header, HTTPException, Response
+from backend.services.search_service import search_async
+from backend.services.logging_service import log_query_async, log_interaction_async, log_feedback_async
 from backend.services.semantic_expansion import expand_query
 from backend.services.logger import AppLogger
 from backend.api.utils import get_user_id_from_auth
 from backend.sandbox import block_shell_execution
-from backend.services.user_profile_service import get_profile_insight
+from backend.services.user_profile_service import get_profile_insight_async
+from backend.services.guest_sessions import guest_sessions, is_guest
+from backend.services.tracing import span
 
 router = APIRouter()
 logger = AppLogger.get_logger(__name__)
 
 
+def _expansion_source(use_enhanced: bool, insight: dict = None) -> str:
+    """
+    Which path produced the logged `enhanced_text`: "llm" for a real LLM
+    result, "cache" / "negative_cache" for cache hits, "disabled", "error",
+    or the expansion's fallback_reason ("gate", "load_shed", ...).
+    """
+    if not use_enhanced:
+        return "disabled"
+    if not insight:
+        return "error"
+    if insight.get("fallback_reason"):
+        return insight["fallback_reason"]
+    cache_status = insight.get("cache_status")
+    if cache_status == "NEGATIVE_HIT":
+        return "negative_cache"
+    if cache_status in ("HIT", "CANONICAL_HIT"):
+        return "cache"
+    return "llm"
+
+
 @router.get("/search")
 async def search_endpoint(
         q: str = Query(...),
         use_enhanced: bool = Query(True),
         verbosity: str = Query("medium"),
         semantic_mode: str = Query("clarify_only"),
-        user_id: str = Depends(get_user_id_from_auth)
+        user_id: str = Depends(get_user_id_from_auth),
+        x_guest_session: str = Header(None),
+        response: Response = None,
 ):
     """
     Search endpoint with optional semantic expansion.
@@ -47,6 +71,11 @@ async def search_endpoint(
           - clarify_and_personalize  → uses strong user interests to resolve ambiguity when present
       user_id: str (from Depends)
         Authenticated user ID; guest if not logged in.
+      X-Guest-Session: header
+        Opaque anonymous session id; lets guests get reranking from their own
+        short-lived session profile instead of a shared "guest" profile. A new
+        id is issued when a guest sends none, returned in the `X-Guest-Session`
+        response header and the `guest_session` field.
 
     Returns:
       JSON object with:
@@ -56,6 +85,7 @@ async def search_endpoint(
         - enhanced_query
         - use_enhanced
         - verbosity
+        - guest_session (guests only)
     """
     start_time = time.time()
 
@@ -70,7 +100,7 @@ async def search_endpoint(
 
     if use_enhanced:
         try:
-            with block_shell_execution():
+            with block_shell_execution(), span("expand"):
                 expanded_data = await expand_query(
                     q,
                     user_id=user_id,
@@ -114,21 +144,34 @@ async def search_endpoint(
         insight = None
 
     # Log the query in DB before search (helps personalization/reranking)
-    query_id = log_query(
-        user_id=user_id,
-        raw_text=q,
-        enhanced_text=enhanced
-    )
+    with span("log_query"):
+        query_id = await log_query_async(
+            user_id=user_id,
+            raw_text=q,
+            enhanced_text=enhanced,
+            expansion_source=_expansion_source(use_enhanced, insight),
+        )
     logger.debug("Query logged to database", extra={
         "user_id": user_id,
         "query_id": query_id
     })
 
     # Perform search using the active query
-    results = search(enhanced, user_id=user_id)
-
-    # Fetch profile insight after search (profile builder may have updated interests)
-    profile_insight = get_profile_insight(user_id)
+    guest_session = None
+    if is_guest(user_id):
+        # Issue a session id on the first anonymous search; the client echoes it back
+        guest_session = guest_sessions.resolve_id(x_guest_session)
+        response.headers["X-Guest-Session"] = guest_session
+        with span("search"):
+            results = await search_async(enhanced, user_id=user_id, session_profile=guest_sessions.profile(guest_session))
+        guest_sessions.record_query(guest_session, q)
+        profile_insight = guest_sessions.insight(guest_session)
+    else:
+        with span("search"):
+            results = await search_async(enhanced, user_id=user_id)
+        # Fetch profile insight after search (profile builder may have updated interests)
+        with span("profile_insight"):
+            profile_insight = await get_profile_insight_async(user_id)
 
     # Measure duration
     elapsed_ms = round((time.time() - start_time) * 1000, 2)
@@ -150,7 +193,8 @@ async def search_endpoint(
         "verbosity": verbosity,
         "semantic_mode": semantic_mode,
         "insight": insight,
-        "profile_insight": profile_insight
+        "profile_insight": profile_insight,
+        "guest_session": guest_session
     }
 
 
@@ -160,11 +204,13 @@ async def log_click(
         query_id: str = Body(...),
         clicked_url: str = Body(...),
         rank: int = Body(...),
-        auth_user: str = Depends(get_user_id_from_auth)
+        auth_user: str = Depends(get_user_id_from_auth),
+        x_guest_session: str = Header(None),
 ):
     """
     Log search interactions/clicks.
     Authenticated user overrides the supplied user_id.
+    Guest clicks also feed the X-Guest-Session profile.
     """
 
     effective_user = (
@@ -179,12 +225,14 @@ async def log_click(
         "rank": rank
     })
 
-    interaction_id = log_interaction(
+    interaction_id = await log_interaction_async(
         effective_user,
         query_id,
         clicked_url,
         rank
     )
+    if is_guest(effective_user):
+        guest_sessions.record_click(x_guest_session, clicked_url)
 
     return {
         "interaction_id": interaction_id,
@@ -221,7 +269,7 @@ async def log_feedback_endpoint(
         "is_relevant": is_relevant,
     })
 
-    feedback_id = log_feedback(
+    feedback_id = await log_feedback_async(
         effective_user,
         query_id,
         result_url,
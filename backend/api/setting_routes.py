@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Body
-from backend.services.db import user_profiles_col
+from backend.services.async_db import async_user_profiles_col
 from backend.api.utils import get_user_id_from_auth
 
 router = APIRouter()
@@ -34,12 +34,15 @@ async def get_settings(
 ):
     effective_user = get_effective_user(auth_user, user_id)
 
-    doc = user_profiles_col.find_one({"user_id": effective_user})
+    doc = await async_user_profiles_col.find_one({"user_id": effective_user})
 
+    # Settings are part of the profile document, so every write bumps
+    # profile_revision (the profile ETag) like any other profile edit.
     if not doc:
-        user_profiles_col.insert_one({
+        await async_user_profiles_col.insert_one({
             "user_id": effective_user,
-            "settings": DEFAULT_SETTINGS.copy()
+            "settings": DEFAULT_SETTINGS.copy(),
+            "profile_revision": 1,
         })
         return DEFAULT_SETTINGS
 
@@ -47,9 +50,9 @@ async def get_settings(
     merged = {**DEFAULT_SETTINGS, **existing}
 
     if existing != merged:
-        user_profiles_col.update_one(
+        await async_user_profiles_col.update_one(
             {"user_id": effective_user},
-            {"$set": {"settings": merged}}
+            {"$set": {"settings": merged}, "$inc": {"profile_revision": 1}}
         )
 
     return merged
@@ -64,16 +67,17 @@ async def update_settings(
     effective_user = get_effective_user(auth_user, user_id)
 
     # Update ONLY settings fields
-    user_profiles_col.update_one(
+    await async_user_profiles_col.update_one(
         {"user_id": effective_user},
         {
             "$set": {
                 **{f"settings.{k}": v for k, v in update.items()},
                 "user_id": effective_user,
-            }
+            },
+            "$inc": {"profile_revision": 1},
         },
         upsert=True,
     )
 
-    doc = user_profiles_col.find_one({"user_id": effective_user})
+    doc = await async_user_profiles_col.find_one({"user_id": effective_user})
     return doc.get("settings", DEFAULT_SETTINGS)
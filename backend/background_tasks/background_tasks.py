@@ -3,20 +3,43 @@ Background tasks for profile rebuilding and maintenance.
 
 Runs on a scheduled interval (default 3 minutes) to keep user profiles
 up-to-date with session-aware weighting without blocking search requests.
+Before each rebuild, events older than EVENT_ROLLUP_HORIZON_DAYS are
+compacted into per-user daily rollups (see services/event_rollups.py), so a
+rebuild only scans recent raw history.
+
+Also runs an asyncio prewarm loop on the app's event loop that expands the
+hottest queries (see services/heavy_hitters.py) while the LLM is idle, so
+popular searches are answered from cache on their first hit.
 """
 
+import asyncio
 import os
 import threading
 import time
 from datetime import datetime, timezone
 from backend.services.db import queries_col, user_profiles_col
 from backend.services.user_profile_service import build_user_profile
+from backend.services.event_rollups import rollup_users
+from backend.services import expansion_gate
+from backend.services.heavy_hitters import heavy_hitters
+from backend.services.guest_sessions import is_guest, purge_guest_history
+from backend.services.ollama_pool import OLLAMA_HEALTH_CHECK_SECONDS
+from backend.services.metrics import profile_rebuild_duration, profile_rebuild_users
 from backend.services.logger import AppLogger
 
 # Configuration
 PROFILE_REBUILD_INTERVAL_MINUTES = int(os.getenv("PROFILE_REBUILD_INTERVAL_MINUTES", 3))
 PROFILE_REBUILD_ENABLED = os.getenv("PROFILE_REBUILD_ENABLED", "true").lower() == "true"
 
+PREWARM_ENABLED = os.getenv("SE_PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_INTERVAL_SECONDS = int(os.getenv("SE_PREWARM_INTERVAL_SECONDS", 60))
+# Max LLM expansions started per prewarm cycle
+PREWARM_BUDGET = int(os.getenv("SE_PREWARM_BUDGET", 10))
+# Only queries seen at least this many times (estimated) are prewarmed
+PREWARM_MIN_COUNT = int(os.getenv("SE_PREWARM_MIN_COUNT", 3))
+# Recent queries replayed into the tracker at startup, so trends survive a deploy
+PREWARM_SEED_HISTORY = int(os.getenv("SE_PREWARM_SEED_HISTORY", 5000))
+
 # Get logger
 logger = AppLogger.get_logger(__name__)
 
@@ -50,6 +73,9 @@ class ProfileRebuildThread(threading.Thread):
                 logger.error("Error during profile rebuild cycle", extra={
                     "error": str(e)
                 }, exc_info=True)
+
+            self._refresh_expansion_gate()
+            self._purge_guest_history()
             
             # Sleep in small increments so we can exit quickly if needed
             for _ in range(int(self.interval_seconds)):
@@ -60,8 +86,9 @@ class ProfileRebuildThread(threading.Thread):
     def _rebuild_all_profiles(self):
         """Rebuild profiles for all users with recent activity."""
         try:
-            # Find all unique user IDs from queries_col
-            user_ids = queries_col.distinct("user_id")
+            # Find all unique user IDs from queries_col. Guests have in-memory
+            # session profiles only; an aggregated "guest" profile is never built.
+            user_ids = [u for u in queries_col.distinct("user_id") if not is_guest(u)]
             
             if not user_ids:
                 logger.debug("No users with queries found; skipping rebuild cycle")
@@ -69,6 +96,8 @@ class ProfileRebuildThread(threading.Thread):
             
             logger.info("Profile rebuild cycle starting", extra={"user_count": len(user_ids)})
             start_time = datetime.now(timezone.utc)
+
+            self._rollup_events(user_ids)
             
             rebuilt_count = 0
             failed_count = 0
@@ -85,6 +114,8 @@ class ProfileRebuildThread(threading.Thread):
                     }, exc_info=True)
             
             elapsed = (datetime.now(timezone.utc) - start_time).total_seconds()
+            profile_rebuild_duration.observe(elapsed)
+            profile_rebuild_users.set(rebuilt_count)
             logger.info("Profile rebuild cycle complete", extra={
                 "total_users": len(user_ids),
                 "rebuilt_count": rebuilt_count,
@@ -97,20 +128,141 @@ class ProfileRebuildThread(threading.Thread):
                 "error": str(e)
             }, exc_info=True)
     
+    def _rollup_events(self, user_ids):
+        """Compact events past the rollup horizon before profiles are rebuilt."""
+        try:
+            rollup_users(user_ids)
+        except Exception as e:
+            logger.warning("Failed to roll up events", extra={
+                "error": str(e)
+            }, exc_info=True)
+
+    def _refresh_expansion_gate(self):
+        """Re-learn expansion gate rules from query history (if enabled)."""
+        if not expansion_gate.GATE_LEARNED:
+            return
+        try:
+            expansion_gate.refresh_learned_rules()
+        except Exception as e:
+            logger.warning("Failed to refresh expansion gate rules", extra={
+                "error": str(e)
+            }, exc_info=True)
+
+    def _purge_guest_history(self):
+        """Apply the guest query/interaction retention limit."""
+        try:
+            purge_guest_history()
+        except Exception as e:
+            logger.warning("Failed to purge guest history", extra={
+                "error": str(e)
+            }, exc_info=True)
+
     def stop(self):
         """Stop the background thread gracefully."""
         logger.info("Stopping profile rebuild thread")
         self.running = False
 
 
+def _recent_raw_queries(limit: int):
+    """Raw text of the most recent queries (blocking; run off the event loop)."""
+    cursor = queries_col.find({}, {"raw_text": 1}).sort("timestamp", -1).limit(limit)
+    return [doc.get("raw_text", "") for doc in cursor]
+
+
+async def prewarm_hot_queries(budget: int = PREWARM_BUDGET) -> int:
+    """
+    Expand the hottest shareable queries that are not cached yet, at low
+    priority and only while the LLM scheduler is idle.
+
+    Returns the number of expansions that actually called the LLM.
+    """
+    # Imported lazily: semantic_expansion pulls in the LLM client stack.
+    from backend.services.semantic_expansion import expand_query, llm_scheduler, PRIORITY_PREWARM
+
+    started = 0
+    for query, count in heavy_hitters.top():
+        if started >= budget or count < PREWARM_MIN_COUNT:
+            break
+        if not llm_scheduler.is_idle():
+            logger.debug("Prewarm paused: LLM busy", extra=llm_scheduler.stats())
+            break
+        if not expansion_gate.should_expand(query)[0]:
+            continue
+
+        result = await expand_query(
+            query,
+            user_id=None,
+            semantic_mode="clarify_only",
+            priority=PRIORITY_PREWARM,
+        )
+        insight = result.get("insight") or {}
+        if insight.get("fallback_reason") in {"circuit_open", "load_shed"}:
+            break
+        if insight.get("cache_status") == "MISS":
+            started += 1
+    return started
+
+
+async def _prewarm_loop():
+    """Seed the heavy-hitters tracker from history, then prewarm every interval."""
+    try:
+        seeded = heavy_hitters.seed(await asyncio.to_thread(_recent_raw_queries, PREWARM_SEED_HISTORY))
+        logger.info("Heavy hitters seeded from query history", extra={"query_count": seeded})
+    except Exception as e:
+        logger.warning("Failed to seed heavy hitters from history", extra={"error": str(e)})
+
+    while True:
+        try:
+            prewarmed = await prewarm_hot_queries()
+            if prewarmed:
+                logger.info("Expansion prewarm cycle complete", extra={"prewarmed": prewarmed})
+        except Exception as e:
+            logger.warning("Error during expansion prewarm cycle", extra={
+                "error": str(e)
+            }, exc_info=True)
+        heavy_hitters.decay()
+        await asyncio.sleep(PREWARM_INTERVAL_SECONDS)
+
+
+async def _ollama_health_loop():
+    """Actively probe Ollama endpoints so dead hosts are ejected before users hit them."""
+    from backend.services.semantic_expansion import ollama_pool
+
+    while True:
+        try:
+            await ollama_pool.health_check()
+        except Exception as e:
+            logger.warning("Error during Ollama health check", extra={"error": str(e)})
+        await asyncio.sleep(OLLAMA_HEALTH_CHECK_SECONDS)
+
+
 # Global thread instance
 _rebuild_thread = None
+# Global asyncio tasks (live on the FastAPI event loop)
+_prewarm_task = None
+_health_task = None
 
 
 def start_background_tasks():
     """Start background tasks (called on FastAPI startup)."""
-    global _rebuild_thread
-    
+    global _rebuild_thread, _prewarm_task, _health_task
+
+    if PREWARM_ENABLED and _prewarm_task is None:
+        try:
+            _prewarm_task = asyncio.get_running_loop().create_task(_prewarm_loop())
+            logger.info("Expansion prewarm task started")
+        except RuntimeError:
+            logger.warning("No running event loop; expansion prewarm task not started")
+
+    if OLLAMA_HEALTH_CHECK_SECONDS > 0 and _health_task is None:
+        from backend.services.semantic_expansion import ollama_pool
+        if len(ollama_pool) > 1:
+            try:
+                _health_task = asyncio.get_running_loop().create_task(_ollama_health_loop())
+                logger.info("Ollama health check task started", extra={"endpoints": len(ollama_pool)})
+            except RuntimeError:
+                logger.warning("No running event loop; Ollama health check task not started")
+
     if not PROFILE_REBUILD_ENABLED:
         logger.info("Profile rebuild background task is disabled")
         return
@@ -126,8 +278,16 @@ def start_background_tasks():
 
 def stop_background_tasks():
     """Stop background tasks (called on FastAPI shutdown)."""
-    global _rebuild_thread
-    
+    global _rebuild_thread, _prewarm_task, _health_task
+
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        _prewarm_task = None
+
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+
     if _rebuild_thread is None:
         return
     
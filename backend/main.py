@@ -1,12 +1,20 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api.auth_routes import router as auth_router
 from backend.api.search_routes import router as search_router
 from backend.api.profile_routes import router as profile_router
 from backend.api.setting_routes import router as settings_router
+from backend.api.profiling_routes import router as profiling_router
 from backend.background_tasks.background_tasks import start_background_tasks, stop_background_tasks
 from backend.services.logger import AppLogger
+from backend.services.db_indexes import bootstrap_indexes
+from backend.services.async_db import close_async_client
+from backend.services.db import close_client
+from backend.services.tracing import TracingMiddleware, shutdown_sink
+from backend.services import metrics
+from backend.services import profiling
 
 # Initialize logger
 logger = AppLogger.get_logger(__name__)
@@ -16,14 +24,21 @@ logger = AppLogger.get_logger(__name__)
 async def lifespan(app: FastAPI):
     """Manage application lifecycle - startup and shutdown."""
     # Startup
+    AppLogger.start()
     logger.info("FastAPI application startup initiated")
+    bootstrap_indexes()
     start_background_tasks()
     logger.info("FastAPI application started successfully")
     yield
     # Shutdown
     logger.info("FastAPI application shutdown initiated")
     stop_background_tasks()
+    await close_async_client()
+    close_client()
     logger.info("FastAPI application shutdown complete")
+    shutdown_sink()
+    # Flush anything still queued in the async logging pipeline
+    AppLogger.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -40,13 +55,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Guest-Session"],
 )
 
+# Per-stage request timing (Server-Timing header + structured timing log)
+app.add_middleware(TracingMiddleware)
+# Per-route latency histograms for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+# On-demand cProfile capture; not installed at all unless enabled
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Include API routes
 app.include_router(auth_router)
 app.include_router(search_router)
 app.include_router(profile_router)
 app.include_router(settings_router)
+if profiling.PROFILING_ENABLED:
+    app.include_router(profiling_router)
 
 
 # Simple health check endpoint, can be removed
@@ -54,3 +80,11 @@ app.include_router(settings_router)
 async def health_check():
     logger.debug("Health check endpoint called")
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus text exposition of in-process metrics."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,17 +1,68 @@
 import uuid
 from datetime import datetime, timezone
+from typing import Optional
 
-def make_query_doc(user_id: str, raw_text: str, enhanced_text: str = None):
+
+# Event timestamps are stored as native BSON datetimes (UTC) so range filters
+# and time-ordered index scans work. Documents written before that stored ISO
+# strings; readers go through to_datetime()/timestamp_filter() until
+# scripts/migrate_timestamps.py has converted them.
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """
+    Timezone-aware UTC datetime from a stored timestamp, in either format:
+    a BSON datetime (pymongo returns these naive, in UTC) or a legacy ISO
+    string. Returns None for missing or unparseable values.
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+    return None
+
+
+def timestamp_filter(gte: datetime = None, lt: datetime = None, field: str = "timestamp") -> dict:
+    """
+    Range filter on `field` matching both native and legacy ISO-string values.
+    MongoDB only compares values of the same BSON type, so each format gets
+    its own branch. Legacy strings compare correctly only as UTC ISO strings,
+    which is what make_*_doc always wrote.
+    """
+    native, legacy = {}, {}
+    if gte is not None:
+        native["$gte"] = gte
+        legacy["$gte"] = gte.astimezone(timezone.utc).isoformat()
+    if lt is not None:
+        native["$lt"] = lt
+        legacy["$lt"] = lt.astimezone(timezone.utc).isoformat()
+    return {"$or": [{field: native}, {field: legacy}]}
+
+
+def make_query_doc(user_id: str, raw_text: str, enhanced_text: str = None, expansion_source: str = None):
     """
     Prepare a query document for insertion into MongoDB.
+
+    `expansion_source` records which path produced `enhanced_text`
+    ("llm", "cache", "disabled", or a fallback reason such as "gate").
     """
-    return {
+    doc = {
         "_id": str(uuid.uuid4()),
         "user_id": user_id,
         "raw_text": raw_text,
         "enhanced_text": enhanced_text,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": utc_now(),
     }
+    if expansion_source is not None:
+        doc["expansion_source"] = expansion_source
+    return doc
 
 def make_interaction_doc(user_id: str, query_id: str, clicked_url: str, rank: int, action_type: str = "click"):
     """
@@ -23,7 +74,7 @@ def make_interaction_doc(user_id: str, query_id: str, clicked_url: str, rank: in
         "query_id": query_id,
         "clicked_url": clicked_url,
         "rank": rank,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": utc_now(),
         "action_type": action_type, #can be click (default), positive_feedback or negative_feedback
     }
 
@@ -36,7 +87,7 @@ def make_user_profile_doc(user_id, interests, query_history, click_history, expl
         "implicit_interests": interests,
         "query_history": query_history,
         "click_history": click_history,
-        "last_updated": datetime.now(timezone.utc).isoformat(),
+        "last_updated": utc_now(),
         "explicit_interests": explicit_interests or [],
         "embedding": None
     }
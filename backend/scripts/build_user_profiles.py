@@ -19,12 +19,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.services.user_profile_service import build_user_profile
 from backend.services.db import queries_col
+from backend.services.guest_sessions import is_guest
 def run_profile_build():
     """
     Aggregates all unique user_ids in queries_col and rebuilds their profiles.
-    Explicit interests are preserved.
+    Explicit interests are preserved. Guest traffic is skipped.
     """
-    user_ids = queries_col.distinct("user_id")
+    user_ids = [uid for uid in queries_col.distinct("user_id") if not is_guest(uid)]
     print(f"Found {len(user_ids)} users: {user_ids}")
 
     for uid in user_ids:
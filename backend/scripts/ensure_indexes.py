@@ -0,0 +1,36 @@
+"""
+Create the MongoDB indexes the backend relies on (see services/db_indexes.py).
+
+Safe to run repeatedly: existing indexes are left alone. Use it when the
+server runs with MONGO_INDEX_MODE=verify, or to check a database by hand:
+
+    python backend/scripts/ensure_indexes.py           # create missing indexes
+    python backend/scripts/ensure_indexes.py --check   # only list missing ones
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.db_indexes import ensure_indexes, missing_indexes
+
+
+def run(check_only: bool = False) -> int:
+    missing = missing_indexes()
+    if not missing:
+        print("✅ All required indexes present.")
+        return 0
+    for spec in missing:
+        print(f"❌ Missing: {spec.collection}.{spec.name}{' (unique)' if spec.unique else ''}")
+    if check_only:
+        return 1
+
+    summary = ensure_indexes()
+    for label in summary["created"]:
+        print(f"✅ Created: {label}")
+    for label in summary["failed"]:
+        print(f"⚠️  Failed: {label}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(check_only="--check" in sys.argv[1:]))
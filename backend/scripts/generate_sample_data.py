@@ -0,0 +1,89 @@
+"""
+Generate a synthetic query/click history for offline runs and benchmarks.
+
+Writes a seed file for the in-memory backend:
+
+    python backend/scripts/generate_sample_data.py --users 1000 --queries-per-user 500 --out /tmp/seed.json
+    DB_BACKEND=memory MEMORY_DB_SEED=/tmp/seed.json uvicorn backend.main:app
+
+Each user gets a few favourite topics; queries are grouped into sessions
+spread over --days, and roughly one query in three gets a click on a
+topic-specific domain. The output is deterministic for a given --seed.
+Documents match models/data_models.py (native datetime timestamps).
+"""
+import argparse
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bson import json_util
+
+TOPICS = {
+    "python": ["python asyncio", "python typing generics", "pandas groupby", "fastapi dependency injection",
+               "python packaging pyproject", "pytest fixtures"],
+    "rust": ["rust borrow checker", "rust async tokio", "rust lifetimes explained", "cargo workspaces"],
+    "mongodb": ["mongodb aggregation pipeline", "mongodb index strategy", "mongodb ttl index", "pymongo bulk write"],
+    "cooking": ["sourdough starter", "ramen broth recipe", "cast iron seasoning", "knife sharpening angle"],
+    "travel": ["lisbon itinerary", "japan rail pass", "cheap flights tips", "hiking dolomites"],
+    "finance": ["index fund fees", "roth ira limits", "mortgage refinance", "budgeting app"],
+    "ml": ["transformer attention", "gradient boosting", "embedding models", "vector database"],
+}
+DOMAINS = {
+    "python": ["docs.python.org", "realpython.com", "stackoverflow.com"],
+    "rust": ["doc.rust-lang.org", "users.rust-lang.org", "stackoverflow.com"],
+    "mongodb": ["mongodb.com", "stackoverflow.com"],
+    "cooking": ["seriouseats.com", "bonappetit.com"],
+    "travel": ["lonelyplanet.com", "wikivoyage.org"],
+    "finance": ["investopedia.com", "bogleheads.org"],
+    "ml": ["arxiv.org", "huggingface.co", "distill.pub"],
+}
+
+
+def generate(users: int, queries_per_user: int, days: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    queries, interactions = [], []
+    for u in range(users):
+        user_id = f"user{u:05d}"
+        favourites = rng.sample(sorted(TOPICS), k=3)
+        ts = now - timedelta(days=days)
+        for _ in range(queries_per_user):
+            # New session every few queries: jump ahead by hours or days
+            gap = timedelta(minutes=rng.randint(1, 10)) if rng.random() < 0.7 else \
+                timedelta(hours=rng.uniform(1, 24 * days * 2 / max(1, queries_per_user)))
+            ts = min(now, ts + gap)
+            topic = rng.choice(favourites) if rng.random() < 0.8 else rng.choice(sorted(TOPICS))
+            text = rng.choice(TOPICS[topic])
+            query_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            queries.append({"_id": query_id, "user_id": user_id, "raw_text": text,
+                            "enhanced_text": text, "timestamp": ts})
+            if rng.random() < 0.35:
+                domain = rng.choice(DOMAINS[topic])
+                interactions.append({
+                    "_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "user_id": user_id,
+                    "query_id": query_id,
+                    "clicked_url": f"https://{domain}/{text.replace(' ', '-')}",
+                    "rank": rng.randint(1, 10),
+                    "action_type": "click",
+                    "timestamp": ts + timedelta(seconds=rng.randint(5, 120)),
+                })
+    return {"queries": queries, "interactions": interactions}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--queries-per-user", type=int, default=200)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    data = generate(args.users, args.queries_per_user, args.days, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(data))
+    print(f"✅ Wrote {len(data['queries'])} queries and {len(data['interactions'])} interactions to {args.out}")
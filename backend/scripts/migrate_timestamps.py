@@ -0,0 +1,101 @@
+"""
+Convert legacy ISO-string timestamps to native BSON datetimes.
+
+New documents already store datetimes (see models/data_models.py) and all
+readers accept both formats, so this can run while the app is serving.
+
+Converts:
+    queries.timestamp
+    interactions.timestamp
+    user_profiles.last_updated
+
+Work is done in chunks of --batch-size documents, each written with one
+unordered bulk_write. The run is resumable: only documents whose field is
+still a string are selected, so an interrupted run simply picks up where
+it stopped. Each update also matches the original string, so a document
+rewritten concurrently by the app is left alone. Profile updates also bump
+profile_revision, so cached profiles (ETags) are revalidated.
+
+    python backend/scripts/migrate_timestamps.py              # migrate everything
+    python backend/scripts/migrate_timestamps.py --dry-run    # only count
+    python backend/scripts/migrate_timestamps.py --collection queries --batch-size 500
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from pymongo import UpdateOne
+
+from backend.models.data_models import to_datetime
+from backend.services.db import queries_col, interactions_col, user_profiles_col
+
+TARGETS = {
+    "queries": (queries_col, "timestamp"),
+    "interactions": (interactions_col, "timestamp"),
+    "user_profiles": (user_profiles_col, "last_updated"),
+}
+# Collections whose documents carry a revision counter that every write must bump
+REVISION_FIELDS = {"user_profiles": "profile_revision"}
+
+
+def migrate_collection(collection, field: str, batch_size: int = 1000, dry_run: bool = False,
+                       revision_field: str = None) -> dict:
+    """
+    Convert `field` from ISO string to datetime on every document of
+    `collection`, incrementing `revision_field` on each converted document
+    when given. Returns {"converted", "unparseable", "batches"}.
+    """
+    summary = {"converted": 0, "unparseable": 0, "batches": 0}
+    last_id = None
+    while True:
+        filt = {field: {"$type": "string"}}
+        if last_id is not None:
+            # Walk by _id so unparseable strings (left as-is) are not re-read forever
+            filt["_id"] = {"$gt": last_id}
+        batch = list(collection.find(filt, {field: 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        summary["batches"] += 1
+
+        ops = []
+        for doc in batch:
+            value = doc.get(field)
+            converted = to_datetime(value)
+            if converted is None:
+                summary["unparseable"] += 1
+                continue
+            update = {"$set": {field: converted}}
+            if revision_field:
+                update["$inc"] = {revision_field: 1}
+            ops.append(UpdateOne({"_id": doc["_id"], field: value}, update))
+
+        if ops and not dry_run:
+            result = collection.bulk_write(ops, ordered=False)
+            summary["converted"] += result.modified_count
+        else:
+            summary["converted"] += len(ops)
+    return summary
+
+
+def run(names=None, batch_size: int = 1000, dry_run: bool = False) -> dict:
+    results = {}
+    for name in names or TARGETS:
+        collection, field = TARGETS[name]
+        print(f"🔄 {name}.{field}{' (dry run)' if dry_run else ''}")
+        results[name] = migrate_collection(collection, field, batch_size=batch_size, dry_run=dry_run,
+                                           revision_field=REVISION_FIELDS.get(name))
+        s = results[name]
+        verb = "would convert" if dry_run else "converted"
+        print(f"✅ {name}: {verb} {s['converted']} in {s['batches']} batches, {s['unparseable']} unparseable left as-is")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", choices=sorted(TARGETS), action="append")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    run(args.collection, batch_size=args.batch_size, dry_run=args.dry_run)
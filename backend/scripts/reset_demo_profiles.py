@@ -17,14 +17,13 @@ def reset_user_profile(user_id: str, explicit_keywords: list[str]):
         "click_history": [],
         "implicit_exclusions": [],
         "last_updated": datetime.now(timezone.utc).isoformat(),
-        "profile_revision": 1,
         "embedding": None
     }
 
-    # 3. Upsert into Mongo
+    # 3. Upsert into Mongo; bump the revision so cached profiles (ETags) are not reused
     user_profiles_col.update_one(
         {"user_id": user_id},
-        {"$set": profile_doc},
+        {"$set": profile_doc, "$inc": {"profile_revision": 1}},
         upsert=True
     )
 
@@ -0,0 +1,39 @@
+"""
+Compact old queries/interactions into per-user daily rollups.
+
+The background rebuild thread already does this before every rebuild cycle;
+run it by hand to backfill a large history once (e.g. before enabling
+EVENT_TTL_DAYS), or from cron when PROFILE_REBUILD_ENABLED=false.
+
+Only events between each user's watermark and the horizon are read, so
+repeated runs are cheap and safe.
+
+    python backend/scripts/rollup_events.py                    # every user, default horizon
+    python backend/scripts/rollup_events.py --horizon-days 30
+    python backend/scripts/rollup_events.py --user alice --user bob
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.db import queries_col
+from backend.services.event_rollups import EVENT_ROLLUP_HORIZON_DAYS, rollup_users
+from backend.services.guest_sessions import is_guest
+
+
+def run(user_ids=None, horizon_days: int = EVENT_ROLLUP_HORIZON_DAYS) -> dict:
+    user_ids = user_ids or [uid for uid in queries_col.distinct("user_id") if not is_guest(uid)]
+    print(f"🔄 Rolling up events older than {horizon_days} days for {len(user_ids)} users")
+    totals = rollup_users(user_ids, horizon_days=horizon_days)
+    print(f"✅ {totals['users']} users: {totals['queries']} queries and {totals['clicks']} clicks rolled up, "
+          f"{totals['failed']} failed")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", action="append", dest="users")
+    parser.add_argument("--horizon-days", type=int, default=EVENT_ROLLUP_HORIZON_DAYS)
+    args = parser.parse_args()
+    run(args.users, horizon_days=args.horizon_days)
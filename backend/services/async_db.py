@@ -0,0 +1,77 @@
+"""backend/services/async_db.py
+
+Purpose
+-------
+Async MongoDB handles for request handlers.
+
+`services/db.py` uses the synchronous pymongo client; every call from an
+`async def` route blocks the event loop for a full round trip, so one
+worker serves one DB call at a time. Handlers use these collections
+instead (`await async_user_profiles_col.find_one(...)`), built on PyMongo's
+native async API (`AsyncMongoClient`), so a worker keeps serving other
+requests while it waits on MongoDB.
+
+The sync handles in `services/db.py` stay for scripts and the background
+rebuild thread, which run outside the event loop.
+
+Like the sync client, the async client is created lazily (on the first
+awaited call, i.e. on the server's event loop) with the same pool, timeout
+and compression settings (see `client_options()` in services/db.py).
+`close_async_client()` is called on application shutdown. With
+DB_BACKEND=memory they resolve to the in-process database instead, sharing
+its documents with the sync handles.
+"""
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+
+from backend.services.db import DB_BACKEND, MONGO_URI, DB_NAME, LazyCollection, client_options
+from backend.services.memory_db import get_async_memory_db
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+_async_client: Optional[AsyncMongoClient] = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    """Return the process-wide async client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        try:
+            _async_client = AsyncMongoClient(MONGO_URI, **client_options())
+        except Exception as e:
+            logger.error("Failed to create async database client", extra={
+                "db_name": DB_NAME,
+                "error": str(e)
+            }, exc_info=True)
+            raise
+    return _async_client
+
+
+def get_async_db():
+    if DB_BACKEND == "memory":
+        return get_async_memory_db(DB_NAME)
+    return get_async_client()[DB_NAME]
+
+
+# Collections (async handles, same names as services/db.py with an async_ prefix)
+async_queries_col = LazyCollection("queries", get_async_db)
+async_interactions_col = LazyCollection("interactions", get_async_db)
+async_user_profiles_col = LazyCollection("user_profiles", get_async_db)
+async_users_col = LazyCollection("users", get_async_db)
+async_discarded_tokens_col = LazyCollection("discarded_tokens", get_async_db)
+async_event_rollups_col = LazyCollection("event_rollups", get_async_db)
+async_rollup_watermarks_col = LazyCollection("rollup_watermarks", get_async_db)
+
+
+async def close_async_client() -> None:
+    """Close the async client's connection pool if it was ever created (application shutdown)."""
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is None:
+        return
+    try:
+        await client.close()
+    except Exception as e:
+        logger.warning("Failed to close async database client", extra={"error": str(e)})
@@ -6,6 +6,7 @@ from jose.exceptions import ExpiredSignatureError
 from passlib.context import CryptContext
 
 from backend.services.db import users_col
+from backend.services.async_db import async_users_col
 from backend.services.logger import AppLogger
 
 # Config
@@ -60,6 +61,45 @@ def authenticate_user(username: str, password: str) -> Optional[dict]:
     logger.debug("User authenticated", extra={"username": username})
     return user
 
+async def create_user_async(username: str, email: Optional[str], password: str) -> dict:
+    """Async version of create_user() for request handlers."""
+    existing = await async_users_col.find_one({"username": username})
+    if existing:
+        logger.warning("User creation failed: username already exists", extra={"username": username})
+        raise ValueError("username already exists")
+
+    try:
+        hashed = hash_password(password)
+    except Exception as e:
+        logger.error("Password hashing failed", extra={"username": username}, exc_info=True)
+        raise
+
+    user_doc = {
+        "user_id": username,
+        "username": username,
+        "email": email,
+        "hashed_password": hashed,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await async_users_col.insert_one(user_doc)
+    logger.debug("User document inserted", extra={
+        "user_id": user_doc["user_id"],
+        "username": username
+    })
+    return user_doc
+
+async def authenticate_user_async(username: str, password: str) -> Optional[dict]:
+    """Async version of authenticate_user() for request handlers."""
+    user = await async_users_col.find_one({"username": username})
+    if not user:
+        logger.debug("Authentication failed: user not found", extra={"username": username})
+        return None
+    if not verify_password(password, user.get("hashed_password", "")):
+        logger.debug("Authentication failed: invalid password", extra={"username": username})
+        return None
+    logger.debug("User authenticated", extra={"username": username})
+    return user
+
 def create_access_token(*, data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     now = datetime.now(timezone.utc)
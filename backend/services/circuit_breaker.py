@@ -0,0 +1,140 @@
+"""backend/services/circuit_breaker.py
+
+Purpose
+-------
+Small circuit breaker used to stop hammering an external backend (Ollama)
+once it is clearly down, and to notice quickly when it comes back.
+
+States
+------
+closed
+    Normal operation. Consecutive failures are counted; reaching
+    `failure_threshold` trips the breaker to "open".
+
+open
+    Calls are short-circuited (``allow_request()`` returns False) until
+    `reset_timeout` seconds have passed since the breaker opened.
+
+half_open
+    After the reset timeout a single probe call is let through. Success
+    closes the breaker; failure re-opens it for another `reset_timeout`.
+    A probe that never reached the backend (dropped from the LLM queue,
+    cancelled) hands its slot back with ``release_probe()``.
+
+Env vars
+--------
+SE_BREAKER_FAILURE_THRESHOLD
+    Consecutive failures before the breaker opens (default: 3).
+
+SE_BREAKER_RESET_SECONDS
+    How long the breaker stays open before allowing a probe (default: 30).
+
+Notes
+-----
+Dependency-free and cheap to call on every request.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("SE_BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("SE_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a single-probe half-open state.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+            reset_timeout: float = BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("[Breaker] %s half-open, allowing a probe request", self.name)
+
+    def allow_request(self) -> bool:
+        """
+        Return True if a call to the backend should be attempted now.
+        In half-open state only one caller gets True until it reports back
+        (or until the probe is presumed lost after another `reset_timeout`).
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                now = time.monotonic()
+                if not self._probe_in_flight or now - self._probe_started >= self.reset_timeout:
+                    self._probe_in_flight = True
+                    self._probe_started = now
+                    return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("[Breaker] %s closed after successful probe", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(
+                        "[Breaker] %s opened after %d consecutive failure(s); short-circuiting for %.0fs",
+                        self.name, self._failures, self.reset_timeout,
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Free the half-open probe slot without a verdict, for a call that was
+        allowed but never reached the backend. No-op in other states.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = 0.0
+            self._probe_in_flight = False
@@ -1,34 +1,161 @@
+"""backend/services/db.py
+
+Purpose
+-------
+MongoDB client factory and collection handles (synchronous pymongo; request
+handlers use the async handles in services/async_db.py).
+
+The client is created lazily on first use, not at import: importing a
+service (tests, scripts, the app) does no connection setup, and pool and
+timeout settings come from the environment so they can be sized per worker.
+The collection handles below are lightweight proxies that resolve to the
+real collection on first attribute access. `close_client()` is called on
+application shutdown.
+
+With DB_BACKEND=memory the same handles resolve to an in-process database
+instead (services/memory_db.py) and no client is ever created, so the app,
+scripts and benchmarks run without a MongoDB server.
+
+Env vars
+--------
+DB_BACKEND
+    "mongo" (default) or "memory".
+
+MONGODB_URI / MONGODB_DB_NAME
+    Connection string and database (default database: "ai_search_dev").
+
+MONGODB_MAX_POOL_SIZE / MONGODB_MIN_POOL_SIZE
+    Connections per client (default: 50 / 0). Each uvicorn worker has its
+    own clients, so the server sees up to workers x max pool size x 2
+    (sync + async) connections.
+
+MONGODB_SERVER_SELECTION_TIMEOUT_MS
+    How long an operation waits for a usable server before failing
+    (default: 5000; pymongo's own default is 30000).
+
+MONGODB_CONNECT_TIMEOUT_MS / MONGODB_SOCKET_TIMEOUT_MS
+    Socket connect and read timeouts (default: 5000 / unset = no timeout).
+
+MONGODB_APPNAME
+    Reported to the server (logs, currentOp) (default: "ai-search-backend").
+
+MONGODB_COMPRESSORS
+    Wire compression, e.g. "zstd,snappy,zlib"; zstd and snappy need their
+    optional packages (default: unset = no compression).
+"""
 import os
+import threading
+from typing import Callable, Optional
+
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from backend.services.logger import AppLogger
+from backend.services.metrics import MongoCommandMetrics
+from backend.services.memory_db import get_memory_db
 
 logger = AppLogger.get_logger(__name__)
 
 load_dotenv()
 
+DB_BACKEND = (os.getenv("DB_BACKEND", "mongo") or "mongo").strip().lower()
 MONGO_URI = os.getenv("MONGODB_URI")
 DB_NAME = os.getenv("MONGODB_DB_NAME", "ai_search_dev")
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    logger.info("Database connection established", extra={"db_name": DB_NAME})
-except Exception as e:
-    logger.error("Failed to connect to database", extra={
-        "db_name": DB_NAME,
-        "error": str(e)
-    }, exc_info=True)
-    raise
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0"))
+MONGODB_APPNAME = os.getenv("MONGODB_APPNAME", "ai-search-backend")
+MONGODB_COMPRESSORS = (os.getenv("MONGODB_COMPRESSORS", "") or "").strip()
+
+
+def client_options() -> dict:
+    """Keyword arguments shared by the sync and async clients."""
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "appname": MONGODB_APPNAME,
+        # Command listener feeds mongo_command_duration_seconds on /metrics
+        "event_listeners": [MongoCommandMetrics()],
+    }
+    if MONGODB_SOCKET_TIMEOUT_MS > 0:
+        options["socketTimeoutMS"] = MONGODB_SOCKET_TIMEOUT_MS
+    if MONGODB_COMPRESSORS:
+        options["compressors"] = MONGODB_COMPRESSORS
+    return options
+
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide sync client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = MongoClient(MONGO_URI, **client_options())
+                    logger.info("Database connection established", extra={
+                        "db_name": DB_NAME,
+                        "max_pool_size": MONGODB_MAX_POOL_SIZE,
+                    })
+                except Exception as e:
+                    logger.error("Failed to connect to database", extra={
+                        "db_name": DB_NAME,
+                        "error": str(e)
+                    }, exc_info=True)
+                    raise
+    return _client
+
+
+def get_db():
+    if DB_BACKEND == "memory":
+        return get_memory_db(DB_NAME)
+    return get_client()[DB_NAME]
+
+
+def close_client() -> None:
+    """Close the sync client if it was ever created (application shutdown)."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+class LazyCollection:
+    """
+    Stand-in for a collection that resolves it on first attribute access, so
+    module-level handles can be imported without creating a client.
+    """
+
+    def __init__(self, name: str, get_database: Callable):
+        self._name = name
+        self._get_database = get_database
+
+    def _resolve(self):
+        return self._get_database()[self._name]
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self._name!r})"
+
 
 # Collections (simple handles)
-queries_col = db["queries"]
-interactions_col = db["interactions"]
-user_profiles_col = db["user_profiles"]
-users_col = db["users"]
+queries_col = LazyCollection("queries", get_db)
+interactions_col = LazyCollection("interactions", get_db)
+user_profiles_col = LazyCollection("user_profiles", get_db)
+users_col = LazyCollection("users", get_db)
 # Collection to track tokens that were discarded during preprocessing
-discarded_tokens_col = db["discarded_tokens"]
-
-logger.debug("Database collections initialized", extra={
-    "collections": ["queries", "interactions", "user_profiles", "users", "discarded_tokens"]
-})
\ No newline at end of file
+discarded_tokens_col = LazyCollection("discarded_tokens", get_db)
+# Per-user daily aggregates of old events and how far each user is rolled up
+# (services/event_rollups.py)
+event_rollups_col = LazyCollection("event_rollups", get_db)
+rollup_watermarks_col = LazyCollection("rollup_watermarks", get_db)
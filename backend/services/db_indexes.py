@@ -0,0 +1,178 @@
+"""backend/services/db_indexes.py
+
+Purpose
+-------
+Declare the MongoDB indexes the application relies on, create them
+idempotently, and report any that are missing.
+
+Without them every profile build (`find({"user_id": ...})` on queries and
+interactions), feedback write (`log_feedback`'s `delete_many`) and login
+is a collection scan.
+
+Indexes
+-------
+queries(user_id, timestamp)
+interactions(user_id, timestamp)
+interactions(user_id, clicked_url, action_type)
+user_profiles(user_id)          unique
+users(username)                 unique
+discarded_tokens(token)
+event_rollups(user_id, day)
+rollup_watermarks(user_id)      unique
+queries(timestamp), interactions(timestamp)   TTL, only when EVENT_TTL_DAYS > 0
+
+How it works
+------------
+- At startup `bootstrap_indexes()` creates any missing index
+  (MONGO_INDEX_MODE=create) or only logs a warning listing them
+  (MONGO_INDEX_MODE=verify). Failures are logged, never fatal.
+- `scripts/ensure_indexes.py` does the same from the command line, e.g. for
+  deployments that run with MONGO_INDEX_MODE=verify.
+- `create_index` is a no-op for an index that already exists with the same
+  keys and options, so running either repeatedly is safe. Changing
+  EVENT_TTL_DAYS on an existing deployment needs a `collMod` (or dropping
+  the TTL index); creation reports it as failed otherwise.
+
+Env vars
+--------
+MONGO_INDEX_MODE
+    "create" (default), "verify" or "off".
+
+EVENT_TTL_DAYS
+    Expire raw queries/interactions this many days after their timestamp;
+    0 keeps them forever (default: 0). Must exceed EVENT_ROLLUP_HORIZON_DAYS
+    so events are rolled up before they expire (services/event_rollups.py).
+"""
+from __future__ import annotations
+
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from backend.services.db import (
+    queries_col,
+    interactions_col,
+    user_profiles_col,
+    users_col,
+    discarded_tokens_col,
+    event_rollups_col,
+    rollup_watermarks_col,
+)
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+MONGO_INDEX_MODE = (os.getenv("MONGO_INDEX_MODE", "create") or "create").strip().lower()
+EVENT_TTL_DAYS = int(os.getenv("EVENT_TTL_DAYS", "0"))
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        # Same naming scheme pymongo uses by default
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+REQUIRED_INDEXES: List[IndexSpec] = [
+    IndexSpec("queries", (("user_id", 1), ("timestamp", 1))),
+    IndexSpec("interactions", (("user_id", 1), ("timestamp", 1))),
+    IndexSpec("interactions", (("user_id", 1), ("clicked_url", 1), ("action_type", 1))),
+    IndexSpec("user_profiles", (("user_id", 1),), unique=True),
+    IndexSpec("users", (("username", 1),), unique=True),
+    IndexSpec("discarded_tokens", (("token", 1),)),
+    IndexSpec("event_rollups", (("user_id", 1), ("day", 1))),
+    IndexSpec("rollup_watermarks", (("user_id", 1),), unique=True),
+]
+
+if EVENT_TTL_DAYS > 0:
+    REQUIRED_INDEXES += [
+        IndexSpec("queries", (("timestamp", 1),), expire_after_seconds=EVENT_TTL_DAYS * 86400),
+        IndexSpec("interactions", (("timestamp", 1),), expire_after_seconds=EVENT_TTL_DAYS * 86400),
+    ]
+
+
+def _default_collections() -> Dict[str, object]:
+    return {
+        "queries": queries_col,
+        "interactions": interactions_col,
+        "user_profiles": user_profiles_col,
+        "users": users_col,
+        "discarded_tokens": discarded_tokens_col,
+        "event_rollups": event_rollups_col,
+        "rollup_watermarks": rollup_watermarks_col,
+    }
+
+
+def _signature(spec: IndexSpec) -> tuple:
+    return spec.keys, spec.unique, spec.expire_after_seconds
+
+
+def _existing_keys(collection) -> List[tuple]:
+    """(keys, unique, expireAfterSeconds) for every index currently on `collection`."""
+    out = []
+    for info in collection.index_information().values():
+        keys = tuple((field, int(direction)) for field, direction in info.get("key", []))
+        ttl = info.get("expireAfterSeconds")
+        out.append((keys, bool(info.get("unique", False)), int(ttl) if ttl is not None else None))
+    return out
+
+
+def missing_indexes(collections: Optional[Dict[str, object]] = None) -> List[IndexSpec]:
+    """Required indexes not present (same keys and uniqueness) on their collection."""
+    collections = collections or _default_collections()
+    existing: Dict[str, list] = {}
+    missing = []
+    for spec in REQUIRED_INDEXES:
+        if spec.collection not in existing:
+            existing[spec.collection] = _existing_keys(collections[spec.collection])
+        if _signature(spec) not in existing[spec.collection]:
+            missing.append(spec)
+    return missing
+
+
+def ensure_indexes(collections: Optional[Dict[str, object]] = None) -> Dict[str, List[str]]:
+    """
+    Create every required index that is missing. An index that cannot be
+    built (e.g. duplicate values under a unique index) is reported under
+    "failed" and does not stop the others.
+    """
+    collections = collections or _default_collections()
+    summary: Dict[str, List[str]] = {"created": [], "failed": []}
+    for spec in missing_indexes(collections):
+        label = f"{spec.collection}.{spec.name}"
+        try:
+            options = {"name": spec.name, "unique": spec.unique}
+            if spec.expire_after_seconds is not None:
+                options["expireAfterSeconds"] = spec.expire_after_seconds
+            collections[spec.collection].create_index(list(spec.keys), **options)
+            summary["created"].append(label)
+        except Exception as e:
+            summary["failed"].append(label)
+            logger.error("Failed to create index", extra={"index": label, "error": str(e)})
+    return summary
+
+
+def bootstrap_indexes(mode: str = MONGO_INDEX_MODE, collections: Optional[Dict[str, object]] = None) -> None:
+    """Startup hook: create or verify required indexes according to MONGO_INDEX_MODE."""
+    if mode == "off":
+        return
+    try:
+        if mode == "verify":
+            missing = missing_indexes(collections)
+            if missing:
+                logger.warning("Required MongoDB indexes are missing; run scripts/ensure_indexes.py", extra={
+                    "missing": [f"{s.collection}.{s.name}" for s in missing],
+                })
+            return
+        summary = ensure_indexes(collections)
+        if summary["created"] or summary["failed"]:
+            logger.info("MongoDB index bootstrap complete", extra={
+                "created_indexes": summary["created"],
+                "failed_indexes": summary["failed"],
+            })
+    except Exception as e:
+        logger.warning("MongoDB index bootstrap skipped", extra={"error": str(e)})
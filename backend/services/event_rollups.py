@@ -0,0 +1,184 @@
+"""backend/services/event_rollups.py
+
+Purpose
+-------
+Bound the history a profile rebuild has to scan. `queries` and
+`interactions` grow forever and build_user_profile() used to read all of
+them; this job compacts each user's events older than a horizon into
+per-user daily aggregates, and the profile builder combines those with the
+raw recent events.
+
+How it works
+------------
+- Scores decay as exp(-age / decay_days), and
+  exp(-(now - t) / D) = exp(-(now - anchor) / D) * exp(-(anchor - t) / D),
+  so each event's weight can be stored relative to a fixed anchor (the start
+  of its UTC day) and decayed to "now" at read time. Query weights are
+  computed per session exactly as in _score_queries() (repetition boost,
+  session-mean timestamp); click weights use the same rank weighting as
+  _score_clicks(). Rolled-up events are far older than the current-session
+  window, so they never carry the session boost. The result is the same
+  score the raw events would have produced (for the decay the rollup was
+  built with, ROLLUP_DECAY_DAYS, which matches build_user_profile's default).
+- A per-user watermark in `rollup_watermarks` records how far events are
+  rolled up; the builder reads raw events only from the watermark on. The
+  cut is moved back to a session boundary so no session is split.
+- Rollup documents have deterministic ids (user, day, previous watermark), so
+  a run interrupted before the watermark moved is simply redone.
+- Raw events behind the watermark are no longer read. They can be expired
+  by a TTL index (EVENT_TTL_DAYS, see services/db_indexes.py); keep it longer
+  than the horizon plus the rebuild interval so every event is rolled up
+  before it expires. TTL only applies to native datetime timestamps
+  (scripts/migrate_timestamps.py converts legacy ones).
+
+Env vars
+--------
+EVENT_ROLLUP_HORIZON_DAYS
+    Events older than this are rolled up; 0 disables the job (default: 90).
+    (EVENT_TTL_DAYS, the optional raw-event expiry, lives in db_indexes.py.)
+"""
+from __future__ import annotations
+
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from backend.models.data_models import timestamp_filter, to_datetime, utc_now
+from backend.services.db import queries_col, interactions_col, event_rollups_col, rollup_watermarks_col
+from backend.services.user_profile_service import (
+    SESSION_DECAY_MINUTES,
+    normalize_url,
+    _click_rank_weight,
+    _group_sessions,
+    _parse_iso,
+    _session_token_weights,
+)
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+EVENT_ROLLUP_HORIZON_DAYS = int(os.getenv("EVENT_ROLLUP_HORIZON_DAYS", "90"))
+
+# Must match build_user_profile()'s recency_decay_days for exact scores
+ROLLUP_DECAY_DAYS = 30.0
+SESSION_WINDOW_MINUTES = 30
+
+
+def _day_anchor(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _anchored(weight: float, ts: datetime, anchor: datetime, decay_days: float) -> float:
+    """`weight` decayed from `ts` to `anchor` (anchor <= ts, so this scales up slightly)."""
+    return weight * math.exp(-((anchor - ts).total_seconds() / 86400.0) / decay_days)
+
+
+def rollup_user(user_id: str,
+                now: Optional[datetime] = None,
+                horizon_days: int = None,
+                session_window_minutes: int = SESSION_WINDOW_MINUTES,
+                decay_days: float = ROLLUP_DECAY_DAYS) -> Dict[str, int]:
+    """
+    Roll up one user's events between their watermark and the horizon.
+    Returns {"queries", "clicks", "days"} counts of what was compacted.
+    """
+    horizon_days = EVENT_ROLLUP_HORIZON_DAYS if horizon_days is None else horizon_days
+    summary = {"queries": 0, "clicks": 0, "days": 0}
+    now = now or utc_now()
+    decay_days = max(1.0, decay_days)
+    horizon = now - timedelta(days=horizon_days)
+
+    mark = rollup_watermarks_col.find_one({"user_id": user_id})
+    since = to_datetime(mark.get("until")) if mark else None
+    if since is not None and since >= horizon:
+        return summary
+
+    window = timestamp_filter(gte=since, lt=horizon)
+    query_docs = list(queries_col.find({"user_id": user_id, **window}))
+    click_docs = list(interactions_col.find({"user_id": user_id, **window}))
+
+    sessions = _group_sessions(query_docs, session_window_minutes)
+    cutoff = horizon
+    if sessions and sessions[-1][-1][1] + timedelta(minutes=session_window_minutes) >= horizon:
+        # The last session may continue past the horizon: leave it raw.
+        cutoff = sessions.pop()[0][1]
+
+    tokens: Dict[datetime, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    domains: Dict[datetime, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    counts: Dict[datetime, list] = defaultdict(lambda: [0, 0])
+
+    for session in sessions:
+        mean_ts = datetime.fromtimestamp(sum(ts.timestamp() for _doc, ts in session) / len(session), timezone.utc)
+        anchor = _day_anchor(mean_ts)
+        for token, weight in _session_token_weights(session).items():
+            tokens[anchor][token] += _anchored(weight, mean_ts, anchor, decay_days)
+        counts[anchor][0] += len(session)
+        summary["queries"] += len(session)
+
+    for doc in click_docs:
+        ts = _parse_iso(doc.get("timestamp"))
+        if ts >= cutoff:
+            continue
+        anchor = _day_anchor(ts)
+        domain = normalize_url(doc.get("clicked_url", ""))
+        domains[anchor][domain] += _anchored(_click_rank_weight(doc), ts, anchor, decay_days)
+        counts[anchor][1] += 1
+        summary["clicks"] += 1
+
+    since_key = since.isoformat() if since else "start"
+    for anchor in sorted(counts):
+        event_rollups_col.replace_one(
+            {"_id": f"{user_id}|{anchor.date().isoformat()}|{since_key}"},
+            {
+                "user_id": user_id,
+                "day": anchor,
+                "decay_days": decay_days,
+                # [key, weight] pairs: domain keys contain dots
+                "tokens": [[k, v] for k, v in tokens[anchor].items()],
+                "domains": [[k, v] for k, v in domains[anchor].items()],
+                "query_count": counts[anchor][0],
+                "click_count": counts[anchor][1],
+                "created": now,
+            },
+            upsert=True,
+        )
+    summary["days"] = len(counts)
+
+    rollup_watermarks_col.update_one(
+        {"user_id": user_id},
+        {"$set": {"user_id": user_id, "until": cutoff, "updated": now}},
+        upsert=True,
+    )
+    return summary
+
+
+def rollup_users(user_ids: Iterable[str], horizon_days: int = None) -> Dict[str, int]:
+    """Roll up every user in `user_ids`; failures are logged per user. Returns totals."""
+    horizon_days = EVENT_ROLLUP_HORIZON_DAYS if horizon_days is None else horizon_days
+    totals = {"users": 0, "queries": 0, "clicks": 0, "failed": 0}
+    if horizon_days <= 0:
+        return totals
+    if horizon_days * 1440 <= SESSION_DECAY_MINUTES:
+        logger.warning("Rollup horizon is inside the session boost window; skipping rollups", extra={
+            "horizon_days": horizon_days,
+            "session_decay_minutes": SESSION_DECAY_MINUTES,
+        })
+        return totals
+
+    for user_id in user_ids:
+        try:
+            summary = rollup_user(user_id, horizon_days=horizon_days)
+        except Exception as e:
+            totals["failed"] += 1
+            logger.warning("Failed to roll up events", extra={"user_id": user_id, "error": str(e)})
+            continue
+        if summary["queries"] or summary["clicks"]:
+            totals["users"] += 1
+            totals["queries"] += summary["queries"]
+            totals["clicks"] += summary["clicks"]
+
+    if totals["users"] or totals["failed"]:
+        logger.info("Event rollup complete", extra=totals)
+    return totals
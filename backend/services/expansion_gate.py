@@ -0,0 +1,194 @@
+"""backend/services/expansion_gate.py
+
+Purpose
+-------
+Cheap pre-expansion classifier that decides whether a query is worth an
+LLM round trip at all.
+
+Some queries cannot benefit from expansion and only pay its latency:
+  - URLs / bare domains           ("github.com/psf/requests")
+  - quoted phrases                ("\"to be or not to be\"")
+  - very long queries             (already specific)
+  - navigational queries          ("youtube", "gmail login")
+  - keyword-dense queries         (no filler words left to clarify)
+
+Learned rules (optional)
+------------------------
+`refresh_learned_rules()` scans past `queries` rows and learns:
+  - exact queries whose `enhanced_text` has (almost) always equalled
+    `raw_text`, i.e. the LLM never changed them;
+  - a token-count threshold above which expansions (almost) never
+    changed the query.
+Only rows whose `expansion_source` is "llm" count: deferred, shed,
+breaker-open, gate-skipped and cached rows also have
+`enhanced_text == raw_text` without the LLM having judged the query.
+A query must have been seen `SE_GATE_LEARN_MIN_COUNT` times with an
+unchanged ratio of at least `SE_GATE_LEARN_MIN_RATIO` before it is learned.
+
+`should_expand()` never does I/O; learned rules are refreshed from the
+background task loop.
+
+Env vars
+--------
+SE_GATE_ENABLED
+    "1" (default) to enable the gate, "0" to always expand.
+
+SE_GATE_MAX_TOKENS
+    Queries with more words than this skip expansion (default: 12).
+
+SE_GATE_DENSE_MIN_TOKENS
+    Minimum words for the keyword-dense rule to apply (default: 4).
+
+SE_GATE_LEARNED
+    "1" to use learned rules from query history (default: "0").
+
+SE_GATE_LEARN_MIN_COUNT / SE_GATE_LEARN_MIN_RATIO
+    Evidence required before a query / token count is learned (default: 5 / 0.9).
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, Optional, Set, Tuple
+
+from backend.services.db import queries_col
+from backend.services.user_profile_service import preprocess
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+GATE_ENABLED = (os.getenv("SE_GATE_ENABLED", "1") or "1").strip() == "1"
+GATE_MAX_TOKENS = int(os.getenv("SE_GATE_MAX_TOKENS", "12"))
+GATE_DENSE_MIN_TOKENS = int(os.getenv("SE_GATE_DENSE_MIN_TOKENS", "4"))
+GATE_LEARNED = (os.getenv("SE_GATE_LEARNED", "0") or "0").strip() == "1"
+GATE_LEARN_MIN_COUNT = int(os.getenv("SE_GATE_LEARN_MIN_COUNT", "5"))
+GATE_LEARN_MIN_RATIO = float(os.getenv("SE_GATE_LEARN_MIN_RATIO", "0.9"))
+
+# Single-word (or "<site> login") queries that are really "take me to this site"
+NAVIGATIONAL_QUERIES = {
+    "youtube", "google", "gmail", "facebook", "instagram", "twitter", "x", "reddit",
+    "amazon", "netflix", "wikipedia", "linkedin", "github", "outlook", "hotmail",
+    "yahoo", "bing", "spotify", "twitch", "tiktok", "pinterest", "ebay", "whatsapp",
+    "discord", "slack", "zoom", "chatgpt", "maps", "translate",
+}
+NAVIGATIONAL_SUFFIXES = {"login", "sign in", "signin", "homepage", "home page", "app"}
+
+_URL_REGEX = re.compile(
+    r"(^|\s)(https?://|www\.)\S+|(^|\s)[\w-]+(\.[\w-]+)*\.(com|org|net|io|gov|edu|dev|co|ca|uk|ai|app)(/\S*)?($|\s)",
+    re.IGNORECASE,
+)
+_QUOTED_REGEX = re.compile(r"[\"“”][^\"“”]+[\"“”]")
+
+# `expansion_source` of query rows whose unchanged expansion was the LLM's own verdict
+LEARNABLE_SOURCE = "llm"
+
+# Populated by refresh_learned_rules()
+_learned_queries: Set[str] = set()
+_learned_max_tokens: Optional[int] = None
+
+
+def _norm(seed: str) -> str:
+    return " ".join((seed or "").lower().split())
+
+
+def should_expand(seed: str) -> Tuple[bool, str]:
+    """
+    Decide whether `seed` should be sent to the LLM.
+
+    Returns:
+      (expand, reason) — reason is "expand" when expanding, otherwise the
+      name of the rule that skipped it (for the insight trace).
+    """
+    if not GATE_ENABLED:
+        return True, "gate_disabled"
+
+    norm = _norm(seed)
+    if not norm:
+        return False, "empty"
+
+    if _URL_REGEX.search(norm):
+        return False, "url"
+
+    if _QUOTED_REGEX.search(seed):
+        return False, "quoted_phrase"
+
+    words = norm.split()
+    if len(words) > GATE_MAX_TOKENS:
+        return False, "long_query"
+
+    if norm in NAVIGATIONAL_QUERIES:
+        return False, "navigational"
+    for suffix in NAVIGATIONAL_SUFFIXES:
+        if norm.endswith(" " + suffix) and norm[: -len(suffix) - 1].strip() in NAVIGATIONAL_QUERIES:
+            return False, "navigational"
+
+    # Every word survives stopword/filler removal: nothing left to clarify.
+    if len(words) >= GATE_DENSE_MIN_TOKENS and len(preprocess(norm)) >= len(words):
+        return False, "keyword_dense"
+
+    if GATE_LEARNED:
+        if norm in _learned_queries:
+            return False, "learned_unchanged"
+        if _learned_max_tokens is not None and len(words) > _learned_max_tokens:
+            return False, "learned_long_query"
+
+    return True, "expand"
+
+
+def refresh_learned_rules(limit: int = 50000) -> Dict[str, object]:
+    """
+    Rebuild the learned rules from recent `queries` rows whose expansion
+    came from a real LLM call (`expansion_source == "llm"`). Safe to call
+    periodically.
+
+    Returns a small summary for logging.
+    """
+    global _learned_queries, _learned_max_tokens
+
+    pipeline = [
+        {"$match": {"expansion_source": LEARNABLE_SOURCE, "enhanced_text": {"$ne": None}}},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": limit},
+        {"$group": {
+            "_id": {"$toLower": "$raw_text"},
+            "total": {"$sum": 1},
+            "unchanged": {"$sum": {"$cond": [{"$eq": ["$enhanced_text", "$raw_text"]}, 1, 0]}},
+        }},
+    ]
+
+    learned: Set[str] = set()
+    by_len: Dict[int, list] = {}
+    for row in queries_col.aggregate(pipeline):
+        norm = _norm(row.get("_id") or "")
+        total = int(row.get("total", 0))
+        unchanged = int(row.get("unchanged", 0))
+        if not norm or total <= 0:
+            continue
+
+        counts = by_len.setdefault(len(norm.split()), [0, 0])
+        counts[0] += total
+        counts[1] += unchanged
+
+        if total >= GATE_LEARN_MIN_COUNT and unchanged / total >= GATE_LEARN_MIN_RATIO:
+            learned.add(norm)
+
+    # Smallest length from which every longer bucket (with enough evidence)
+    # was left unchanged by the LLM.
+    max_tokens = None
+    for n in sorted(by_len, reverse=True):
+        total, unchanged = by_len[n]
+        if total < GATE_LEARN_MIN_COUNT:
+            continue
+        if unchanged / total >= GATE_LEARN_MIN_RATIO:
+            max_tokens = n - 1
+        else:
+            break
+
+    # Short queries are where expansion helps most; never learn a cut-off below
+    # the keyword-dense floor.
+    _learned_queries = learned
+    _learned_max_tokens = max_tokens if max_tokens and max_tokens >= GATE_DENSE_MIN_TOKENS else None
+
+    summary = {"learned_queries": len(learned), "learned_max_tokens": _learned_max_tokens}
+    logger.info("Expansion gate learned rules refreshed", extra=summary)
+    return summary
@@ -1,7 +1,9 @@
 import os
+import time
 import requests
 from dotenv import load_dotenv
 from backend.services.logger import AppLogger
+from backend.services.metrics import google_request_duration
 
 logger = AppLogger.get_logger(__name__)
 
@@ -24,6 +26,7 @@ def search_google(query: str, num_results: int = 10):
         "q": query,
         "num": num_results,
     }
+    start = time.perf_counter()
     try:
         logger.debug("Calling Google Custom Search API", extra={
             "query": query,
@@ -40,12 +43,14 @@ def search_google(query: str, num_results: int = 10):
                 "link": item.get("link"),
                 "snippet": item.get("snippet"),
             })
+        google_request_duration.observe(time.perf_counter() - start, outcome="ok")
         logger.debug("Google Custom Search API call successful", extra={
             "query": query,
             "result_count": len(results)
         })
         return results
     except requests.exceptions.RequestException as e:
+        google_request_duration.observe(time.perf_counter() - start, outcome="error")
         logger.error("Google Custom Search API call failed", extra={
             "query": query,
             "error": str(e)
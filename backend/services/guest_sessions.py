@@ -0,0 +1,195 @@
+"""backend/services/guest_sessions.py
+
+Purpose
+-------
+First-class handling of anonymous ("guest") traffic.
+
+Every unauthenticated request is attributed to the single user id "guest".
+Building a stored profile for that id would aggregate all anonymous traffic
+ever recorded and rerank every guest's results against it, so guests are:
+  - excluded from background profile rebuilds and expansion personalization;
+  - given a short-lived, in-memory profile per anonymous session instead
+    (keyed by the `X-Guest-Session` header; /search issues a new id when the
+    client sends none and returns it in the `X-Guest-Session` response header
+    and the `guest_session` field), built from that session's own queries
+    and clicks and used only for result reranking;
+  - subject to a retention limit: stored guest queries/interactions older
+    than GUEST_QUERY_RETENTION_DAYS are purged by the background task.
+
+Env vars
+--------
+GUEST_SESSION_TTL_SECONDS
+    Idle time after which a session profile is forgotten (default: 1800).
+
+GUEST_SESSION_MAX
+    Max session profiles kept in memory, least recently used evicted (default: 10000).
+
+GUEST_QUERY_RETENTION_DAYS
+    Age after which stored guest queries/interactions are deleted; 0 keeps them (default: 7).
+"""
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from backend.services.db import queries_col, interactions_col, user_profiles_col
+from backend.models.data_models import timestamp_filter
+from backend.services.user_profile_service import preprocess, normalize_url
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+GUEST_USER_ID = "guest"
+GUEST_SESSION_TTL_SECONDS = int(os.getenv("GUEST_SESSION_TTL_SECONDS", "1800"))
+GUEST_SESSION_MAX = int(os.getenv("GUEST_SESSION_MAX", "10000"))
+GUEST_QUERY_RETENTION_DAYS = int(os.getenv("GUEST_QUERY_RETENTION_DAYS", "7"))
+
+# Same relative weights as build_user_profile (query_weight=1, click_weight=2)
+SESSION_QUERY_WEIGHT = 1.0
+SESSION_CLICK_WEIGHT = 2.0
+# Keep session profiles small: only the strongest terms survive
+SESSION_MAX_TERMS = 50
+MAX_SESSION_ID_LENGTH = 128
+
+
+def is_guest(user_id: Optional[str]) -> bool:
+    return not user_id or user_id == GUEST_USER_ID
+
+
+class _Session:
+    __slots__ = ("interests", "query_count", "click_count", "last_seen")
+
+    def __init__(self):
+        self.interests: Dict[str, float] = defaultdict(float)
+        self.query_count = 0
+        self.click_count = 0
+        self.last_seen = time.monotonic()
+
+
+class GuestSessionStore:
+    """
+    In-memory per-session guest profiles with idle expiry and LRU bound.
+    Thread-safe.
+    """
+
+    def __init__(self, ttl: int = GUEST_SESSION_TTL_SECONDS, max_sessions: int = GUEST_SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _valid(session_id: Optional[str]) -> bool:
+        return bool(session_id) and len(session_id) <= MAX_SESSION_ID_LENGTH
+
+    def resolve_id(self, session_id: Optional[str]) -> str:
+        """The client's session id if usable, otherwise a freshly issued one."""
+        return session_id if self._valid(session_id) else secrets.token_urlsafe(16)
+
+    def _get(self, session_id: str, create: bool) -> Optional[_Session]:
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is not None and now - session.last_seen > self.ttl:
+            del self._sessions[session_id]
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = _Session()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    @staticmethod
+    def _trim(session: _Session) -> None:
+        if len(session.interests) > SESSION_MAX_TERMS:
+            top = sorted(session.interests.items(), key=lambda kv: -kv[1])[:SESSION_MAX_TERMS]
+            session.interests = defaultdict(float, top)
+
+    def record_query(self, session_id: Optional[str], raw_text: str) -> None:
+        if not self._valid(session_id) or self.ttl <= 0:
+            return
+        tokens = preprocess(raw_text or "")
+        with self._lock:
+            session = self._get(session_id, create=True)
+            session.query_count += 1
+            for token in tokens:
+                session.interests[token] += SESSION_QUERY_WEIGHT
+            self._trim(session)
+
+    def record_click(self, session_id: Optional[str], clicked_url: str) -> None:
+        if not self._valid(session_id) or self.ttl <= 0:
+            return
+        domain = normalize_url(clicked_url or "")
+        if not domain:
+            return
+        with self._lock:
+            session = self._get(session_id, create=True)
+            session.click_count += 1
+            session.interests[domain] += SESSION_CLICK_WEIGHT
+            self._trim(session)
+
+    def profile(self, session_id: Optional[str]) -> Optional[dict]:
+        """Profile-shaped dict (implicit interests only) for reranking, or None."""
+        if not self._valid(session_id):
+            return None
+        with self._lock:
+            session = self._get(session_id, create=False)
+            if session is None or not session.interests:
+                return None
+            interests = dict(session.interests)
+        return {
+            "user_id": GUEST_USER_ID,
+            "implicit_interests": dict(sorted(interests.items(), key=lambda kv: -kv[1])),
+            "explicit_interests": [],
+        }
+
+    def insight(self, session_id: Optional[str]) -> Optional[dict]:
+        """Same shape as get_profile_insight(), for the session profile."""
+        if not self._valid(session_id):
+            return None
+        with self._lock:
+            session = self._get(session_id, create=False)
+            if session is None:
+                return None
+            top = sorted(session.interests.items(), key=lambda kv: -kv[1])[:5]
+            return {
+                "top_interests": [{"interest": k, "score": round(v, 3)} for k, v in top],
+                "query_history_size": session.query_count,
+                "click_history_size": session.click_count,
+                "profile_revision": 0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+guest_sessions = GuestSessionStore()
+
+
+def purge_guest_history(retention_days: int = GUEST_QUERY_RETENTION_DAYS) -> Dict[str, int]:
+    """
+    Delete guest queries/interactions older than `retention_days` and any
+    legacy aggregated "guest" profile. Returns deleted counts for logging.
+    """
+    summary = {"queries": 0, "interactions": 0, "profiles": 0}
+    if retention_days <= 0:
+        return summary
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    old = {"user_id": GUEST_USER_ID, **timestamp_filter(lt=cutoff)}
+
+    summary["queries"] = queries_col.delete_many(old).deleted_count
+    summary["interactions"] = interactions_col.delete_many(old).deleted_count
+    summary["profiles"] = user_profiles_col.delete_many({"user_id": GUEST_USER_ID}).deleted_count
+
+    logger.info("Guest history purged", extra=summary)
+    return summary
@@ -0,0 +1,147 @@
+"""backend/services/heavy_hitters.py
+
+Purpose
+-------
+Track the most frequent ("hottest") normalized raw queries in bounded memory,
+so background work (expansion prewarming) knows what users are about to ask.
+
+Design
+------
+- Count-min sketch: approximate counts for every query ever seen, in a fixed
+  `depth x width` table. Estimates never undercount.
+- Top-K candidate set: the K queries with the highest estimates, kept in a
+  min-heap (with lazy invalidation) so each update is O(log K).
+- `decay()` halves all counts, so yesterday's spike stops outranking today's
+  trend. The background prewarm loop calls it once per cycle.
+
+Env vars
+--------
+HH_TOP_K
+    Number of heavy hitters to keep (default: 100).
+
+HH_SKETCH_WIDTH / HH_SKETCH_DEPTH
+    Count-min sketch dimensions (default: 2048 x 4).
+"""
+from __future__ import annotations
+
+import hashlib
+import heapq
+import os
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+HH_TOP_K = int(os.getenv("HH_TOP_K", "100"))
+HH_SKETCH_WIDTH = int(os.getenv("HH_SKETCH_WIDTH", "2048"))
+HH_SKETCH_DEPTH = int(os.getenv("HH_SKETCH_DEPTH", "4"))
+
+
+def normalize_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+class CountMinSketch:
+    """Approximate frequency counter with a fixed memory footprint."""
+
+    def __init__(self, width: int = HH_SKETCH_WIDTH, depth: int = HH_SKETCH_DEPTH):
+        self.width = max(1, width)
+        self.depth = max(1, depth)
+        self._table = [[0] * self.width for _ in range(self.depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8", errors="ignore"), digest_size=8 * self.depth).digest()
+        return [
+            int.from_bytes(digest[i * 8:(i + 1) * 8], "big") % self.width
+            for i in range(self.depth)
+        ]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Increment `key` and return its new estimate."""
+        estimate = None
+        for row, idx in zip(self._table, self._indexes(key)):
+            row[idx] += count
+            estimate = row[idx] if estimate is None else min(estimate, row[idx])
+        return estimate or 0
+
+    def estimate(self, key: str) -> int:
+        return min(row[idx] for row, idx in zip(self._table, self._indexes(key)))
+
+    def decay(self, factor: float = 0.5) -> None:
+        for row in self._table:
+            for i, v in enumerate(row):
+                row[i] = int(v * factor)
+
+
+class HeavyHitters:
+    """
+    Count-min sketch + top-K heap over normalized queries. Thread-safe.
+    """
+
+    def __init__(self, k: int = HH_TOP_K, width: int = HH_SKETCH_WIDTH, depth: int = HH_SKETCH_DEPTH):
+        self.k = max(1, k)
+        self._sketch = CountMinSketch(width, depth)
+        self._top: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def _pop_min(self) -> None:
+        # Skip heap entries that no longer match the current estimate.
+        while self._heap:
+            est, key = heapq.heappop(self._heap)
+            if self._top.get(key) == est:
+                del self._top[key]
+                return
+
+    def _current_min(self) -> int:
+        while self._heap:
+            est, key = self._heap[0]
+            if self._top.get(key) == est:
+                return est
+            heapq.heappop(self._heap)
+        return 0
+
+    def record(self, query: str, count: int = 1) -> None:
+        key = normalize_query(query)
+        if not key:
+            return
+        with self._lock:
+            est = self._sketch.add(key, count)
+            if key in self._top or len(self._top) < self.k:
+                self._top[key] = est
+                heapq.heappush(self._heap, (est, key))
+            elif est > self._current_min():
+                self._pop_min()
+                self._top[key] = est
+                heapq.heappush(self._heap, (est, key))
+
+    def seed(self, queries: Iterable[str]) -> int:
+        """Bulk-record queries (e.g. recent history at startup). Returns how many were recorded."""
+        n = 0
+        for q in queries:
+            self.record(q)
+            n += 1
+        return n
+
+    def top(self, n: int = None) -> List[Tuple[str, int]]:
+        """Return up to `n` (query, estimated_count) pairs, hottest first."""
+        with self._lock:
+            items = sorted(self._top.items(), key=lambda kv: kv[1], reverse=True)
+        return items[:n] if n else items
+
+    def decay(self, factor: float = 0.5) -> None:
+        """Scale all counts down so old traffic fades; drops candidates that reach zero."""
+        with self._lock:
+            self._sketch.decay(factor)
+            self._top = {
+                key: self._sketch.estimate(key)
+                for key in self._top
+                if self._sketch.estimate(key) > 0
+            }
+            self._heap = [(est, key) for key, est in self._top.items()]
+            heapq.heapify(self._heap)
+
+
+heavy_hitters = HeavyHitters()
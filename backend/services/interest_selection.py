@@ -38,7 +38,8 @@ from typing import Dict, List, Tuple
 
 from backend.services.logger import AppLogger
 
-logger = AppLogger.get_logger(__name__)
+# Selection lines fire on every personalized expansion, so they are sampled / rate limited
+logger = AppLogger.get_hot_path_logger(__name__)
 
 
 # -----------------------
@@ -59,8 +60,8 @@ def select_top_k(explicit: Dict[str, float], implicit: Dict[str, float], k_expli
     top_explicit = [kw for kw, _ in explicit_sorted[:k_explicit]]
     top_implicit = [kw for kw, _ in implicit_sorted[:k_implicit]]
 
-    logger.info("[Personalization] Top explicit (ordered): %s", top_explicit)
-    logger.info("[Personalization] Top implicit (ordered): %s", top_implicit)
+    logger.debug("[Personalization] Top explicit (ordered): %s", top_explicit)
+    logger.debug("[Personalization] Top implicit (ordered): %s", top_implicit)
 
     return top_explicit, top_implicit
 
@@ -126,8 +127,8 @@ def select_hybrid(explicit: Dict[str, float], implicit: Dict[str, float], k_expl
     selected_explicit = _hybrid_one(explicit, k_explicit, core_n, pool_size, rng)
     selected_implicit = _hybrid_one(implicit, k_implicit, core_n, pool_size, rng)
 
-    logger.info("[Personalization] Hybrid explicit: %s", selected_explicit)
-    logger.info("[Personalization] Hybrid implicit: %s", selected_implicit)
+    logger.debug("[Personalization] Hybrid explicit: %s", selected_explicit)
+    logger.debug("[Personalization] Hybrid implicit: %s", selected_implicit)
 
     return selected_explicit, selected_implicit
 
@@ -135,12 +136,30 @@ def select_hybrid(explicit: Dict[str, float], implicit: Dict[str, float], k_expl
 # -----------------------
 # Switcher (env-controlled)
 # -----------------------
-def select_interests(explicit: Dict[str, float], implicit: Dict[str, float], k_explicit: int, k_implicit: int, user_id: str = "", seed: str = "") -> Tuple[List[str], List[str]]:
+def selection_algo() -> str:
+    """Currently configured selection algorithm ("top_k" or "hybrid")."""
     algo = (os.getenv("SE_INTEREST_SELECTION_ALGO", "top_k") or "top_k").strip().lower()
 
     # accept a few aliases
     if algo in {"k", "k_matching", "kmatching", "topk"}:
         algo = "top_k"
+    return algo
+
+
+def selection_depends_on_seed() -> bool:
+    """True when the selected interests can differ per query (hybrid sampling)."""
+    return selection_algo() == "hybrid"
+
+
+def selection_is_deterministic() -> bool:
+    """False when repeated calls with the same inputs may select different interests."""
+    if selection_algo() != "hybrid":
+        return True
+    return (os.getenv("SE_HYBRID_DETERMINISTIC", "1") or "1").strip() == "1"
+
+
+def select_interests(explicit: Dict[str, float], implicit: Dict[str, float], k_explicit: int, k_implicit: int, user_id: str = "", seed: str = "") -> Tuple[List[str], List[str]]:
+    algo = selection_algo()
 
     if algo == "hybrid":
         return select_hybrid(explicit, implicit, k_explicit, k_implicit, user_id, seed)
@@ -50,6 +50,46 @@ Logs are written to: backend/logs/app.log
 Rotation occurs at 10 MB per file, with 5 backup files retained.
 Log directory is created automatically if it doesn't exist.
 
+Async Mode:
+-----------
+With LOG_ASYNC=1 (default) loggers only put records on a bounded in-memory
+queue; a single listener thread formats them and does the file/console I/O,
+so logging never blocks a request on disk writes.
+
+- LOG_QUEUE_SIZE (default 10000) bounds the queue. When it is full, DEBUG/INFO
+  records are dropped immediately and WARNING+ records wait up to
+  LOG_QUEUE_BLOCK_MS (default 50) before being dropped. Drops are counted per
+  level (AppLogger.stats()) and reported in the log once the queue drains.
+- AppLogger.shutdown() (called from the FastAPI lifespan and at exit) flushes
+  everything still queued; logging after shutdown is written synchronously.
+- LOG_ASYNC=0 restores the previous synchronous handlers.
+
+Hot-Path Volume Control:
+------------------------
+Call sites that fire on every request (cache HIT/MISS/STORED lines,
+personalization selection) log through a hot-path logger instead:
+
+    hot_logger = AppLogger.get_hot_path_logger(__name__)
+    hot_logger.info("[Cache] HIT key='%s'", key)
+
+Only hot-path loggers carry the HotPathFilter; every other logger writes all
+records at its level. The filter runs before a record is queued or
+formatted. WARNING+ records always pass; DEBUG/INFO records are
+  - sampled per logger (LOG_SAMPLE_RATES, e.g.
+    "backend.services.query_cache=0.05,backend.services.interest_selection=0.2",
+    longest matching prefix wins), then
+  - rate limited per call site (file:line) by a token bucket of
+    LOG_RATE_LIMIT_PER_SECOND records/s with bursts of LOG_RATE_LIMIT_BURST
+    (0 disables).
+The next record that passes from a call site reports how many were
+suppressed ("[+N suppressed]"). `extra` dicts are only turned into text by
+the formatter, i.e. never for suppressed records.
+
+LOG_LEVEL (default DEBUG) sets the logger level, so the file log keeps full
+detail; the console shows INFO and above. At DEBUG (or with
+LOG_SAMPLING_DISABLED=1) hot-path loggers are not sampled or rate limited
+either; set LOG_LEVEL=INFO to turn the volume control on.
+
 Examples by Component:
 ----------------------
 
@@ -113,44 +153,184 @@ logger.info("Profile rebuild cycle", extra={
 })
 """
 
+import atexit
 import os
+import queue
+import random
+import time
 import logging
 import logging.handlers
+import threading
+from collections import Counter
 from pathlib import Path
+from typing import Dict, Tuple
+
+LOG_ASYNC = (os.getenv("LOG_ASYNC", "1") or "1").strip() == "1"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_BLOCK_MS = int(os.getenv("LOG_QUEUE_BLOCK_MS", "50"))
+LOG_LEVEL = logging.getLevelName((os.getenv("LOG_LEVEL", "DEBUG") or "DEBUG").strip().upper())
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.DEBUG
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_RATE_LIMIT_PER_SECOND = float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", "10"))
+LOG_RATE_LIMIT_BURST = int(os.getenv("LOG_RATE_LIMIT_BURST", "20"))
+LOG_SAMPLING_DISABLED = (os.getenv("LOG_SAMPLING_DISABLED", "0") or "0").strip() == "1"
+
+# Plain values are safe to %-format later on the listener thread; anything
+# else (dicts, lists, objects) may change after the call, so it is
+# formatted on the caller's thread.
+_DEFERRABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+_STANDARD_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message", "asctime", "suppressed",
+}
 
 
-def _get_logger(name: str) -> logging.Logger:
+def format_extra(extra_dict: dict) -> str:
     """
-    Create and configure a logger instance with file and console handlers.
-    
+    Format extra parameters for display in log messages.
+
     Args:
-        name: Logger name (typically __name__ or module name)
-        
+        extra_dict: Dictionary of key-value pairs to format
+
     Returns:
-        Configured logger instance
+        Formatted string like " (key1=value1, key2=value2)"
     """
-    logger = logging.getLogger(name)
-    
-    # Only configure once (check if handlers already exist)
-    if logger.handlers:
-        return logger
-    
-    logger.setLevel(logging.DEBUG)
-    
+    if not extra_dict:
+        return ""
+    items = [f"{k}={v}" for k, v in extra_dict.items()]
+    return " (" + ", ".join(items) + ")"
+
+
+class ExtraFormatter(logging.Formatter):
+    """
+    Formatter that appends `extra` fields (and the suppressed-record count)
+    to the message. Runs only for records that are actually written.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extra = {k: v for k, v in record.__dict__.items() if k not in _STANDARD_RECORD_ATTRS}
+        suffix = format_extra(extra)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            suffix += f" [+{suppressed} suppressed]"
+        if not suffix:
+            return text
+        # Keep tracebacks after the extras
+        head, sep, tail = text.partition("\n")
+        return head + suffix + sep + tail
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in (spec or "").split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            try:
+                rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+            except ValueError:
+                continue
+    return rates
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Per-logger sampling + per-call-site token bucket for DEBUG/INFO records.
+    Thread-safe; rejected records are counted and reported by the next record
+    that passes from the same call site.
+    """
+
+    def __init__(
+            self,
+            sample_rates: Dict[str, float] = None,
+            rate_per_second: float = LOG_RATE_LIMIT_PER_SECOND,
+            burst: int = LOG_RATE_LIMIT_BURST,
+            bypass: bool = False,
+    ):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self.bypass = bypass
+        # (pathname, lineno) -> [tokens, last_refill]
+        self._buckets: Dict[Tuple[str, int], list] = {}
+        self._suppressed: Counter = Counter()
+        self.total_suppressed = 0
+        self._lock = threading.Lock()
+
+    def _sample_rate(self, name: str) -> float:
+        best, rate = -1, 1.0
+        for prefix, r in self.sample_rates.items():
+            if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                best, rate = len(prefix), r
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.bypass or record.levelno >= logging.WARNING:
+            return True
+
+        site = (record.pathname, record.lineno)
+        rate = self._sample_rate(record.name)
+        with self._lock:
+            if rate < 1.0 and random.random() >= rate:
+                self._suppressed[site] += 1
+                self.total_suppressed += 1
+                return False
+
+            if self.rate > 0:
+                now = time.monotonic()
+                bucket = self._buckets.get(site)
+                if bucket is None:
+                    bucket = self._buckets[site] = [float(self.burst), now]
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] < 1.0:
+                    self._suppressed[site] += 1
+                    self.total_suppressed += 1
+                    return False
+                bucket[0] -= 1.0
+
+            suppressed = self._suppressed.pop(site, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def _bypass_sampling(level: int) -> bool:
+    """Hot-path records are written in full at DEBUG level or with LOG_SAMPLING_DISABLED=1."""
+    return LOG_SAMPLING_DISABLED or level <= logging.DEBUG
+
+
+hot_path_filter = HotPathFilter(
+    _parse_sample_rates(LOG_SAMPLE_RATES),
+    LOG_RATE_LIMIT_PER_SECOND,
+    LOG_RATE_LIMIT_BURST,
+    bypass=_bypass_sampling(LOG_LEVEL),
+)
+
+# Suffix of the child logger that hot-path call sites log through.
+HOT_PATH_SUFFIX = "hot"
+
+
+def _build_handlers() -> list:
+    """File (DEBUG+, rotating) and console (INFO+) handlers."""
     # Create logs directory if it doesn't exist
     log_dir = Path(__file__).parent.parent / "logs"
     log_dir.mkdir(exist_ok=True)
     log_file = log_dir / "app.log"
-    
+
     # Formatter
-    file_formatter = logging.Formatter(
+    file_formatter = ExtraFormatter(
         fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S"
     )
-    console_formatter = logging.Formatter(
+    console_formatter = ExtraFormatter(
         fmt="%(levelname)-8s | %(name)s | %(message)s"
     )
-    
+
     # File handler with rotation (10 MB per file, keep 5 backups)
     file_handler = logging.handlers.RotatingFileHandler(
         log_file,
@@ -159,16 +339,185 @@ def _get_logger(name: str) -> logging.Logger:
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
-    
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)  # Only show INFO and above on console
     console_handler.setFormatter(console_formatter)
+
+    return [file_handler, console_handler]
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking QueueHandler for the request path.
+
+    Under overload DEBUG/INFO records are dropped at once and WARNING+ records
+    wait briefly; every drop is counted. Formatting is left to the listener
+    thread whenever the record's args are immutable.
+    """
+
+    def __init__(self, q: queue.Queue, block_ms: int = LOG_QUEUE_BLOCK_MS):
+        super().__init__(q)
+        self.block_seconds = max(0, block_ms) / 1000
+        self.dropped = Counter()
+        self._reported = 0
+        self._drops_lock = threading.Lock()
+        self.fallback = None  # set by AsyncLogPipeline while stopped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not all(isinstance(a, _DEFERRABLE_ARG_TYPES) for a in (
+                record.args.values() if isinstance(record.args, dict) else record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.WARNING and self.block_seconds:
+                self.queue.put(record, timeout=self.block_seconds)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drops_lock:
+                self.dropped[record.levelname] += 1
+            return
+        self._report_drops()
+
+    def _report_drops(self) -> None:
+        total = sum(self.dropped.values())
+        if total == self._reported:
+            return
+        with self._drops_lock:
+            new = total - self._reported
+            self._reported = total
+            by_level = dict(self.dropped)
+        notice = logging.LogRecord(
+            "backend.services.logger", logging.WARNING, __file__, 0,
+            "Log queue overloaded: dropped %d records (total by level: %s)", (new, str(by_level)), None,
+        )
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            pass
+
+    def emit(self, record: logging.LogRecord) -> None:
+        fallback = self.fallback
+        if fallback is not None:
+            # Listener stopped (shutdown): write synchronously so nothing is lost.
+            fallback(record)
+            return
+        super().emit(record)
+
+
+class AsyncLogPipeline:
+    """
+    Bounded queue + QueueListener thread in front of the real handlers.
+    All AppLogger loggers share one pipeline (and one set of file/console handlers).
+    """
+
+    def __init__(self, handlers: list, queue_size: int = LOG_QUEUE_SIZE, block_ms: int = LOG_QUEUE_BLOCK_MS):
+        self.handlers = handlers
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = DroppingQueueHandler(self.queue, block_ms)
+        self.handler.fallback = self._handle_sync
+        self._listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._state_lock = threading.Lock()
+        self.running = False
+
+    def _handle_sync(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def start(self) -> None:
+        with self._state_lock:
+            if self.running:
+                return
+            self._listener.start()
+            self.running = True
+            self.handler.fallback = None
+
+    def stop(self) -> None:
+        """Flush every queued record and stop the listener thread."""
+        with self._state_lock:
+            if not self.running:
+                return
+            self.handler.fallback = self._handle_sync
+            self._listener.stop()
+            self.running = False
+            # Records enqueued while the listener was shutting down
+            while True:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not None:
+                    self._handle_sync(record)
+            for handler in self.handlers:
+                try:
+                    handler.flush()
+                except (ValueError, OSError):
+                    # Stream already closed (interpreter shutdown, captured stdout)
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "async": True,
+            "running": self.running,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "dropped": dict(self.handler.dropped),
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def _get_pipeline() -> AsyncLogPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = AsyncLogPipeline(_build_handlers())
+            _pipeline.start()
+            atexit.register(_pipeline.stop)
+        return _pipeline
+
+
+def _get_logger(name: str, hot_path: bool = False) -> logging.Logger:
+    """
+    Create and configure a logger instance with file and console handlers.
     
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    Args:
+        name: Logger name (typically __name__ or module name)
+        hot_path: Attach the HotPathFilter (sampling / rate limiting)
+        
+    Returns:
+        Configured logger instance
+    """
+    logger = logging.getLogger(name)
+    
+    # Only configure once (check if handlers already exist)
+    if logger.handlers:
+        return logger
     
+    logger.setLevel(LOG_LEVEL)
+    if hot_path:
+        # Sampling / rate limiting happen before anything is queued or formatted.
+        logger.addFilter(hot_path_filter)
+        # Has its own handlers; propagating would write every record twice.
+        logger.propagate = False
+
+    if LOG_ASYNC:
+        # Hot path only enqueues; the listener thread formats and writes.
+        logger.addHandler(_get_pipeline().handler)
+        return logger
+
+    # Add handlers to logger
+    for handler in _build_handlers():
+        logger.addHandler(handler)
+
     return logger
 
 
@@ -197,46 +546,36 @@ class AppLogger:
             cls._loggers[name] = _get_logger(name)
         return cls._loggers[name]
 
+    @classmethod
+    def get_hot_path_logger(cls, name: str) -> logging.Logger:
+        """
+        Get or create the sampled / rate-limited logger for per-request call
+        sites of module `name` (logged as "<name>.hot").
+        """
+        hot_name = f"{name}.{HOT_PATH_SUFFIX}"
+        if hot_name not in cls._loggers:
+            cls._loggers[hot_name] = _get_logger(hot_name, hot_path=True)
+        return cls._loggers[hot_name]
 
-# Create default logger for services
-logger = AppLogger.get_logger("app")
-
-
-def format_extra(extra_dict: dict) -> str:
-    """
-    Format extra parameters for display in log messages.
-    
-    Args:
-        extra_dict: Dictionary of key-value pairs to format
-        
-    Returns:
-        Formatted string like "key1=value1, key2=value2"
-    """
-    if not extra_dict:
-        return ""
-    items = [f"{k}={v}" for k, v in extra_dict.items()]
-    return " (" + ", ".join(items) + ")"
-
-
-# Monkey-patch logger methods to support formatted extra parameters
-_original_info = logger.info
-_original_debug = logger.debug
-_original_warning = logger.warning
-_original_error = logger.error
-_original_critical = logger.critical
+    @classmethod
+    def start(cls) -> None:
+        """(Re)start the async listener thread; no-op in synchronous mode."""
+        if LOG_ASYNC:
+            _get_pipeline().start()
 
+    @classmethod
+    def shutdown(cls) -> None:
+        """Flush queued records and stop the listener; later logs are written synchronously."""
+        if _pipeline is not None:
+            _pipeline.stop()
 
-def _log_with_extra(original_method, level_name):
-    def wrapper(msg, *args, **kwargs):
-        extra = kwargs.pop("extra", None)
-        if extra and isinstance(extra, dict):
-            msg = msg + format_extra(extra)
-        original_method(msg, *args, **kwargs)
-    return wrapper
+    @classmethod
+    def stats(cls) -> dict:
+        """Queue depth, per-level drop counters and sampled/rate-limited record count."""
+        stats = _pipeline.stats() if _pipeline is not None else {"async": False}
+        stats["suppressed"] = hot_path_filter.total_suppressed
+        return stats
 
 
-logger.info = _log_with_extra(_original_info, "INFO")
-logger.debug = _log_with_extra(_original_debug, "DEBUG")
-logger.warning = _log_with_extra(_original_warning, "WARNING")
-logger.error = _log_with_extra(_original_error, "ERROR")
-logger.critical = _log_with_extra(_original_critical, "CRITICAL")
+# Create default logger for services
+logger = AppLogger.get_logger("app")
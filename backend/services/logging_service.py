@@ -1,5 +1,7 @@
 from backend.services.db import queries_col, interactions_col
+from backend.services.async_db import async_queries_col, async_interactions_col
 from backend.models.data_models import make_query_doc, make_interaction_doc
+from backend.services.heavy_hitters import heavy_hitters
 from backend.services.logger import AppLogger
 
 logger = AppLogger.get_logger(__name__)
@@ -14,6 +16,8 @@ def log_query(user_id: str, raw_text: str, enhanced_text: str = None):
     try:
         doc = make_query_doc(user_id, raw_text, enhanced_text)
         queries_col.insert_one(doc)
+        # Feed the popularity tracker used for expansion prewarming
+        heavy_hitters.record(raw_text)
         logger.debug("Query document inserted", extra={
             "user_id": user_id,
             "query_id": doc["_id"],
@@ -92,4 +96,92 @@ def log_feedback(user_id: str, query_id: str, result_url: str, rank: int, is_pos
             "action_type": action_type,
             "error": str(e),
         }, exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+
+# -----------------------
+# Async variants (request handlers)
+# -----------------------
+# Same documents and logging as above, written through the async client so
+# the event loop is not blocked. The sync versions remain for scripts.
+
+async def log_query_async(user_id: str, raw_text: str, enhanced_text: str = None, expansion_source: str = None):
+    """
+    Async version of log_query(); returns the inserted document's ID.
+    `expansion_source` tells which path produced `enhanced_text` (see make_query_doc).
+    """
+    try:
+        doc = make_query_doc(user_id, raw_text, enhanced_text, expansion_source)
+        await async_queries_col.insert_one(doc)
+        heavy_hitters.record(raw_text)
+        logger.debug("Query document inserted", extra={
+            "user_id": user_id,
+            "query_id": doc["_id"],
+            "raw_text_length": len(raw_text),
+            "expansion_source": expansion_source,
+        })
+        return doc["_id"]
+    except Exception as e:
+        logger.error("Failed to log query", extra={
+            "user_id": user_id,
+            "error": str(e)
+        }, exc_info=True)
+        raise
+
+
+async def log_interaction_async(user_id: str, query_id: str, clicked_url: str, rank: int):
+    """Async version of log_interaction()."""
+    try:
+        doc = make_interaction_doc(user_id, query_id, clicked_url, rank)
+        await async_interactions_col.insert_one(doc)
+        logger.debug("Interaction document inserted", extra={
+            "user_id": user_id,
+            "interaction_id": doc["_id"],
+            "query_id": query_id,
+            "rank": rank
+        })
+        return doc["_id"]
+    except Exception as e:
+        logger.error("Failed to log interaction", extra={
+            "user_id": user_id,
+            "query_id": query_id,
+            "error": str(e)
+        }, exc_info=True)
+        raise
+
+
+async def log_feedback_async(user_id: str, query_id: str, result_url: str, rank: int, is_positive: bool):
+    """Async version of log_feedback()."""
+    action_type = "positive_feedback" if is_positive else "negative_feedback"
+
+    try:
+        await async_interactions_col.delete_many({
+            "user_id": user_id,
+            "clicked_url": result_url,
+            "action_type": {"$in": ["positive_feedback", "negative_feedback"]},
+        })
+
+        doc = make_interaction_doc(
+            user_id=user_id,
+            query_id=query_id,
+            clicked_url=result_url,
+            rank=rank,
+            action_type=action_type,
+        )
+        await async_interactions_col.insert_one(doc)
+        logger.debug("Feedback document inserted", extra={
+            "user_id": user_id,
+            "feedback_id": doc["_id"],
+            "query_id": query_id,
+            "rank": rank,
+            "action_type": action_type,
+        })
+        return doc["_id"]
+    except Exception as e:
+        logger.error("Failed to log feedback", extra={
+            "user_id": user_id,
+            "query_id": query_id,
+            "action_type": action_type,
+            "error": str(e),
+        }, exc_info=True)
+        raise
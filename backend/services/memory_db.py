@@ -0,0 +1,1207 @@
+"""backend/services/memory_db.py
+
+Purpose
+-------
+In-process stand-in for MongoDB, selected with DB_BACKEND=memory (see
+services/db.py), so the whole app, its scripts and load tests can run on a
+box without a Mongo server, against realistic data volumes.
+
+Services keep talking to collections; with this backend `get_db()` and
+`get_async_db()` return a `MemoryDatabase` / `AsyncMemoryDatabase` over the
+same documents instead of a pymongo database. The sync and async handles
+share one store, as they share one server with Mongo.
+
+Supported subset
+----------------
+This is the part of the pymongo API the backend uses, not a general
+emulator; anything else raises NotImplementedError so a gap shows up
+loudly instead of as silently different results.
+
+Filters      equality (dotted paths, array membership), $eq $ne $gt $gte $lt
+             $lte $in $nin $exists $type $size $elemMatch $regex $not,
+             $and $or $nor. Like MongoDB, range operators only compare values
+             of the same type (datetimes never match ISO strings).
+Updates      $set $unset $inc $min $max $setOnInsert $push ($each, $slice)
+             $addToSet ($each) $pull, filtered positional $[name] with
+             array_filters, all-positional $[], upsert.
+Reads        find (projection incl. $slice and expressions, sort, skip,
+             limit), find_one,
+             count_documents, distinct, aggregate ($match $sort $skip $limit
+             $project $unwind $count $group).
+Writes       insert_one/many, update_one/many, replace_one, delete_one/many,
+             find_one_and_update/replace/delete, bulk_write.
+Indexes      create_index / index_information / drop_index; unique indexes
+             are enforced, TTL indexes are recorded but never expire anything.
+
+Documents are deep-copied on the way in and out, as they would be through
+BSON, so callers can mutate results freely. Each collection has its own lock
+(the background rebuild thread and request handlers share the store).
+
+Env vars
+--------
+MEMORY_DB_SEED
+    Optional JSON file loaded when the in-memory database is first created:
+    {"<collection>": [documents...]} in MongoDB Extended JSON (e.g. written
+    by scripts/generate_sample_data.py or mongoexport --jsonArray per
+    collection). Default: start empty.
+"""
+from __future__ import annotations
+
+import copy
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+MEMORY_DB_SEED = os.getenv("MEMORY_DB_SEED", "") or ""
+
+_MISSING = object()
+
+
+# -----------------------
+# Value comparison
+# -----------------------
+# BSON sort order between types; values of different types never compare equal
+# or satisfy $gt/$lt (apart from ints vs floats).
+_TYPE_ORDER = [(str, 3), (dict, 4), (list, 5), (bytes, 6), (ObjectId, 7), (datetime, 9)]
+
+_TYPE_ALIASES = {
+    "null": (type(None),), "bool": (bool,), "int": (int,), "long": (int,), "double": (float,),
+    "number": (int, float), "string": (str,), "object": (dict,), "array": (list,),
+    "binData": (bytes,), "objectId": (ObjectId,), "date": (datetime,),
+}
+
+
+def _type_rank(value) -> int:
+    if value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    for cls, rank in _TYPE_ORDER:
+        if isinstance(value, cls):
+            return rank
+    return 10
+
+
+def _norm(value):
+    """Naive datetimes are UTC (what pymongo returns without tz_aware)."""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _compare(a, b) -> Optional[int]:
+    """-1/0/1, or None when MongoDB would not compare the two values."""
+    rank = _type_rank(a)
+    if rank != _type_rank(b):
+        return None
+    if rank == 1:
+        return 0
+    a, b = _norm(a), _norm(b)
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return None
+
+
+def _equal(a, b) -> bool:
+    if isinstance(a, (dict, list)) or isinstance(b, (dict, list)):
+        return a == b
+    return _compare(a, b) == 0
+
+
+def _hash_key(value) -> tuple:
+    """Hashable key under which equal values (1 == 1.0, naive == aware UTC) collide."""
+    rank = _type_rank(value)
+    if rank == 2:
+        return rank, float(value)
+    if rank in (1, 3, 7, 8, 9):
+        return rank, _norm(value)
+    return rank, repr(value)
+
+
+def _sort_key(value):
+    value = _norm(value)
+    if isinstance(value, (dict, list)):
+        return _type_rank(value), repr(value)
+    return _type_rank(value), value
+
+
+# -----------------------
+# Filters
+# -----------------------
+def _values(node, parts: List[str]) -> list:
+    """Every value at a dotted path; paths through arrays of documents fan out."""
+    if not parts:
+        return [node]
+    head, rest = parts[0], parts[1:]
+    if isinstance(node, dict):
+        return _values(node[head], rest) if head in node else []
+    if isinstance(node, list):
+        if head.isdigit():
+            i = int(head)
+            return _values(node[i], rest) if i < len(node) else []
+        out = []
+        for el in node:
+            if isinstance(el, dict):
+                out.extend(_values(el, parts))
+        return out
+    return []
+
+
+def _candidates(values: list) -> list:
+    """Values plus the elements of any array among them (MongoDB array matching)."""
+    out = []
+    for v in values:
+        out.append(v)
+        if isinstance(v, list):
+            out.extend(v)
+    return out
+
+
+def _is_operator_dict(cond) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(str(k).startswith("$") for k in cond)
+
+
+def _range(values, arg, test) -> bool:
+    for v in _candidates(values):
+        c = _compare(v, arg)
+        if c is not None and test(c):
+            return True
+    return False
+
+
+def _match_op(values: list, op: str, arg, options: str = "") -> bool:
+    if op == "$eq":
+        if not values:
+            return arg is None
+        return any(_equal(v, arg) for v in _candidates(values))
+    if op == "$ne":
+        return not _match_op(values, "$eq", arg)
+    if op == "$gt":
+        return _range(values, arg, lambda c: c > 0)
+    if op == "$gte":
+        return _range(values, arg, lambda c: c >= 0)
+    if op == "$lt":
+        return _range(values, arg, lambda c: c < 0)
+    if op == "$lte":
+        return _range(values, arg, lambda c: c <= 0)
+    if op == "$in":
+        return any(_match_op(values, "$regex" if hasattr(a, "search") else "$eq", a) for a in arg)
+    if op == "$nin":
+        return not _match_op(values, "$in", arg)
+    if op == "$exists":
+        return bool(values) == bool(arg)
+    if op == "$type":
+        names = arg if isinstance(arg, list) else [arg]
+        classes = tuple(cls for name in names for cls in _TYPE_ALIASES.get(name, ()))
+        return any(isinstance(v, classes) and not (isinstance(v, bool) and bool not in classes) for v in values)
+    if op == "$size":
+        return any(isinstance(v, list) and len(v) == arg for v in values)
+    if op == "$elemMatch":
+        for v in values:
+            if not isinstance(v, list):
+                continue
+            for el in v:
+                if _is_operator_dict(arg):
+                    if _match_conditions([el], arg):
+                        return True
+                elif isinstance(el, dict) and matches(el, arg):
+                    return True
+        return False
+    if op == "$regex":
+        pattern = arg if hasattr(arg, "search") else re.compile(arg, _regex_flags(options))
+        return any(isinstance(v, str) and pattern.search(v) for v in _candidates(values))
+    if op == "$not":
+        return not _match_conditions(values, arg)
+    raise NotImplementedError(f"memory backend does not support query operator {op}")
+
+
+def _regex_flags(options: str) -> int:
+    flags = 0
+    for ch in options or "":
+        flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(ch, 0)
+    return flags
+
+
+def _match_conditions(values: list, cond) -> bool:
+    if hasattr(cond, "search"):
+        return _match_op(values, "$regex", cond)
+    if not _is_operator_dict(cond):
+        return _match_op(values, "$eq", cond)
+    options = cond.get("$options", "")
+    return all(_match_op(values, op, arg, options) for op, arg in cond.items() if op != "$options")
+
+
+def matches(doc: dict, filt: Optional[dict]) -> bool:
+    """True if `doc` satisfies the MongoDB filter `filt`."""
+    for key, cond in (filt or {}).items():
+        if key == "$and":
+            if not all(matches(doc, f) for f in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, f) for f in cond):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, f) for f in cond):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"memory backend does not support query operator {key}")
+        elif not _match_conditions(_values(doc, key.split(".")), cond):
+            return False
+    return True
+
+
+# -----------------------
+# Updates
+# -----------------------
+def _element_matches(el, name: str, array_filters: List[dict]) -> bool:
+    conds = {}
+    for f in array_filters or []:
+        for key, cond in f.items():
+            if key == name:
+                conds[""] = cond
+            elif key.startswith(name + "."):
+                conds[key[len(name) + 1:]] = cond
+    if not conds:
+        raise ValueError(f"No array filter found for identifier '{name}'")
+    for sub, cond in conds.items():
+        values = [el] if sub == "" else (_values(el, sub.split(".")) if isinstance(el, dict) else [])
+        if not _match_conditions(values, cond):
+            return False
+    return True
+
+
+def _targets(node, parts: List[str], array_filters: List[dict]) -> list:
+    """(container, key) pairs an update path resolves to, creating parents as needed."""
+    head, rest = parts[0], parts[1:]
+    if head == "$":
+        raise NotImplementedError("memory backend does not support the positional $ operator; use $[name]")
+    if head.startswith("$["):
+        name = head[2:-1]
+        if not isinstance(node, list):
+            return []
+        idxs = [i for i, el in enumerate(node) if not name or _element_matches(el, name, array_filters)]
+        if not rest:
+            return [(node, i) for i in idxs]
+        return [t for i in idxs for t in _targets(node[i], rest, array_filters)]
+    if isinstance(node, list):
+        key = int(head)
+        while len(node) <= key:
+            node.append(None)
+    else:
+        key = head
+    if not rest:
+        return [(node, key)]
+    child = node[key] if isinstance(node, list) else node.get(key)
+    if child is None:
+        child = {}
+        node[key] = child
+    return _targets(child, rest, array_filters)
+
+
+def _get(container, key):
+    if isinstance(container, list):
+        return container[key] if key < len(container) else _MISSING
+    return container.get(key, _MISSING)
+
+
+def _array(container, key, op: str) -> list:
+    current = _get(container, key)
+    if current is _MISSING or current is None:
+        current = []
+        container[key] = current
+    if not isinstance(current, list):
+        raise ValueError(f"{op} requires an array at '{key}'")
+    return current
+
+
+def _op_set(container, key, arg):
+    container[key] = copy.deepcopy(arg)
+
+
+def _op_unset(container, key, arg):
+    if isinstance(container, list):
+        if key < len(container):
+            container[key] = None
+    else:
+        container.pop(key, None)
+
+
+def _op_inc(container, key, arg):
+    current = _get(container, key)
+    container[key] = arg if current is _MISSING or current is None else current + arg
+
+
+def _op_min(container, key, arg):
+    current = _get(container, key)
+    if current is _MISSING or (_compare(arg, current) or 0) < 0:
+        container[key] = copy.deepcopy(arg)
+
+
+def _op_max(container, key, arg):
+    current = _get(container, key)
+    if current is _MISSING or (_compare(arg, current) or 0) > 0:
+        container[key] = copy.deepcopy(arg)
+
+
+def _op_push(container, key, arg):
+    arr = _array(container, key, "$push")
+    if _is_operator_dict(arg):
+        arr.extend(copy.deepcopy(arg.get("$each", [])))
+        if "$slice" in arg:
+            n = arg["$slice"]
+            arr[:] = arr[:n] if n >= 0 else arr[n:] if n else []
+    else:
+        arr.append(copy.deepcopy(arg))
+
+
+def _op_add_to_set(container, key, arg):
+    arr = _array(container, key, "$addToSet")
+    items = arg["$each"] if _is_operator_dict(arg) else [arg]
+    for item in items:
+        if not any(_equal(el, item) for el in arr):
+            arr.append(copy.deepcopy(item))
+
+
+def _op_pull(container, key, arg):
+    arr = _get(container, key)
+    if not isinstance(arr, list):
+        return
+    if _is_operator_dict(arg) or hasattr(arg, "search"):
+        keep = [el for el in arr if not _match_conditions([el], arg)]
+    elif isinstance(arg, dict):
+        keep = [el for el in arr if not (isinstance(el, dict) and matches(el, arg))]
+    else:
+        keep = [el for el in arr if not _equal(el, arg)]
+    arr[:] = keep
+
+
+_UPDATE_OPS: Dict[str, Callable] = {
+    "$set": _op_set,
+    "$unset": _op_unset,
+    "$inc": _op_inc,
+    "$min": _op_min,
+    "$max": _op_max,
+    "$push": _op_push,
+    "$addToSet": _op_add_to_set,
+    "$pull": _op_pull,
+}
+
+
+def apply_update(doc: dict, update: dict, array_filters: List[dict] = None, inserting: bool = False) -> None:
+    """Apply a MongoDB update document to `doc` in place."""
+    if not _is_operator_dict(update):
+        raise ValueError("update only works with $ operators")
+    for op, fields in update.items():
+        if op == "$setOnInsert":
+            if not inserting:
+                continue
+            handler = _op_set
+        else:
+            handler = _UPDATE_OPS.get(op)
+        if handler is None:
+            raise NotImplementedError(f"memory backend does not support update operator {op}")
+        for path, arg in fields.items():
+            if path == "_id" and op != "$setOnInsert" and "_id" in doc and doc["_id"] != arg:
+                raise ValueError("Performing an update on the path '_id' would modify the immutable field '_id'")
+            for container, key in _targets(doc, path.split("."), array_filters):
+                handler(container, key, arg)
+
+
+def _upsert_seed(filt: dict) -> dict:
+    """Equality fields of a filter, which MongoDB copies into an upserted document."""
+    doc: dict = {}
+    for key, cond in (filt or {}).items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(cond):
+            if "$eq" not in cond:
+                continue
+            cond = cond["$eq"]
+        for container, k in _targets(doc, key.split("."), []):
+            container[k] = copy.deepcopy(cond)
+    return doc
+
+
+# -----------------------
+# Projection
+# -----------------------
+def _slice(value, spec):
+    if not isinstance(value, list):
+        return value
+    if isinstance(spec, list):
+        skip, limit = spec
+        start = skip if skip >= 0 else max(0, len(value) + skip)
+        return value[start:start + limit]
+    return value[:spec] if spec >= 0 else value[spec:]
+
+
+def _copy_path(src: dict, dst: dict, parts: List[str]) -> None:
+    head, rest = parts[0], parts[1:]
+    if head not in src:
+        return
+    if not rest:
+        dst[head] = copy.deepcopy(src[head])
+    elif isinstance(src[head], dict):
+        _copy_path(src[head], dst.setdefault(head, {}), rest)
+    elif isinstance(src[head], list):
+        # {"items.name": 1} keeps only `name` of each embedded document
+        dst[head] = []
+        for el in src[head]:
+            if isinstance(el, dict):
+                sub: dict = {}
+                _copy_path(el, sub, rest)
+                dst[head].append(sub)
+
+
+def _drop_path(doc: dict, parts: List[str]) -> None:
+    node = doc
+    for part in parts[:-1]:
+        node = node.get(part) if isinstance(node, dict) else None
+    if isinstance(node, dict):
+        node.pop(parts[-1], None)
+
+
+def _is_slice_projection(v) -> bool:
+    """{"$slice": n} / {"$slice": [skip, n]}, as opposed to the $slice expression."""
+    if not isinstance(v, dict) or list(v) != ["$slice"]:
+        return False
+    spec = v["$slice"]
+    return isinstance(spec, int) or isinstance(spec, list) and all(isinstance(n, int) for n in spec)
+
+
+def project(doc: dict, projection) -> dict:
+    """Apply a find() projection: inclusion, exclusion, $slice and computed fields."""
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    slices = {k: v["$slice"] for k, v in projection.items() if _is_slice_projection(v)}
+    computed = {k: v for k, v in projection.items() if isinstance(v, dict) and k not in slices}
+    flags = {k: v for k, v in projection.items() if k not in slices and k not in computed}
+    include = [k for k, v in flags.items() if v and k != "_id"]
+    if include or computed:
+        out: dict = {}
+        if flags.get("_id", 1) and "_id" in doc:
+            out["_id"] = copy.deepcopy(doc["_id"])
+        for path in include + list(slices):
+            _copy_path(doc, out, path.split("."))
+    else:
+        out = copy.deepcopy(doc)
+        for path, flag in flags.items():
+            if not flag:
+                _drop_path(out, path.split("."))
+    for path, spec in slices.items():
+        parts = path.split(".")
+        node = out
+        for part in parts[:-1]:
+            node = node.get(part, {}) if isinstance(node, dict) else {}
+        if isinstance(node, dict) and parts[-1] in node:
+            node[parts[-1]] = _slice(node[parts[-1]], spec)
+    for path, e in computed.items():
+        if "." in path:
+            raise NotImplementedError(f"memory backend does not support computed projection of {path}")
+        out[path] = copy.deepcopy(_expr(doc, e))
+    return out
+
+
+def _sort_spec(key_or_list, direction=None) -> List[tuple]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(pair) for pair in key_or_list]
+
+
+def _sorted(docs: list, spec: List[tuple]) -> list:
+    docs = list(docs)
+    for field, direction in reversed(spec):
+        parts = field.split(".")
+        docs.sort(key=lambda d: _sort_key((_values(d, parts) or [None])[0]), reverse=direction in (-1, "descending"))
+    return docs
+
+
+# -----------------------
+# Cursors
+# -----------------------
+class MemoryCursor:
+    """Lazy find() cursor: sort/skip/limit chain, then iterate."""
+
+    def __init__(self, fetch: Callable[[], list], projection=None):
+        self._fetch = fetch
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[Iterable[dict]] = None
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, n: int) -> "MemoryCursor":
+        self._skip = n
+        return self
+
+    def limit(self, n: int) -> "MemoryCursor":
+        self._limit = n
+        return self
+
+    def _run(self) -> list:
+        docs = self._fetch()
+        if self._sort:
+            docs = _sorted(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:abs(self._limit)]
+        return [project(d, self._projection) for d in docs]
+
+    def __iter__(self):
+        if self._results is None:
+            self._results = iter(self._run())
+        return self._results
+
+    def __next__(self):
+        return next(iter(self))
+
+    def to_list(self, length: Optional[int] = None) -> list:
+        docs = list(self)
+        return docs if length is None else docs[:length]
+
+    def close(self) -> None:
+        self._results = iter(())
+
+
+class AsyncMemoryCursor:
+    """Async face of MemoryCursor (`await cursor.to_list(None)`, `async for`)."""
+
+    def __init__(self, cursor: MemoryCursor):
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction=None) -> "AsyncMemoryCursor":
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, n: int) -> "AsyncMemoryCursor":
+        self._cursor.skip(n)
+        return self
+
+    def limit(self, n: int) -> "AsyncMemoryCursor":
+        self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        return self._cursor.to_list(length)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(iter(self._cursor))
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self) -> None:
+        self._cursor.close()
+
+
+# -----------------------
+# Aggregation
+# -----------------------
+def _expr(doc: dict, e):
+    if isinstance(e, str) and e.startswith("$"):
+        found = _values(doc, e[1:].split("."))
+        return found[0] if found else None
+    if isinstance(e, list):
+        return [_expr(doc, x) for x in e]
+    if not isinstance(e, dict):
+        return e
+    if not _is_operator_dict(e):
+        return {k: _expr(doc, v) for k, v in e.items()}
+    (op, arg), = e.items()
+    if op == "$literal":
+        return arg
+    if op == "$toLower":
+        return str(_expr(doc, arg) or "").lower()
+    if op == "$toUpper":
+        return str(_expr(doc, arg) or "").upper()
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return _expr(doc, arg[1]) if _expr(doc, arg[0]) else _expr(doc, arg[2])
+    if op == "$ifNull":
+        value = _expr(doc, arg[0])
+        return _expr(doc, arg[1]) if value is None else value
+    if op == "$size":
+        value = _expr(doc, arg)
+        return len(value) if isinstance(value, list) else 0
+    if op == "$add":
+        return sum(_expr(doc, x) or 0 for x in arg)
+    if op == "$slice":
+        value, *spec = _expr(doc, arg)
+        if value is None:
+            return None
+        return _slice(value, spec if len(spec) == 2 else spec[0])
+    if op == "$objectToArray":
+        value = _expr(doc, arg)
+        return None if value is None else [{"k": k, "v": v} for k, v in value.items()]
+    if op == "$arrayToObject":
+        value = _expr(doc, arg)
+        if value is None:
+            return None
+        pairs = ((el["k"], el["v"]) if isinstance(el, dict) else tuple(el) for el in value)
+        return {k: v for k, v in pairs}
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        a, b = _expr(doc, arg[0]), _expr(doc, arg[1])
+        c = _compare(a, b)
+        if c is None:
+            c = _type_rank(a) - _type_rank(b)
+        return {"$eq": c == 0, "$ne": c != 0, "$gt": c > 0, "$gte": c >= 0, "$lt": c < 0, "$lte": c <= 0}[op]
+    raise NotImplementedError(f"memory backend does not support expression operator {op}")
+
+
+def _group(docs: list, spec: dict) -> list:
+    groups: Dict[str, dict] = {}
+    for doc in docs:
+        key = _expr(doc, spec["_id"])
+        row = groups.setdefault(repr(key), {"_id": key, "_acc": {}})
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = acc.items()
+            value = _expr(doc, arg)
+            state = row["_acc"]
+            if op == "$sum":
+                state[field] = state.get(field, 0) + (value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0)
+            elif op == "$avg":
+                total, count = state.get(field, (0, 0))
+                state[field] = (total + value, count + 1) if isinstance(value, (int, float)) else (total, count)
+            elif op == "$min":
+                if value is not None and (field not in state or (_compare(value, state[field]) or 0) < 0):
+                    state[field] = value
+            elif op == "$max":
+                if value is not None and (field not in state or (_compare(value, state[field]) or 0) > 0):
+                    state[field] = value
+            elif op == "$first":
+                state.setdefault(field, value)
+            elif op == "$last":
+                state[field] = value
+            elif op == "$push":
+                state.setdefault(field, []).append(value)
+            elif op == "$addToSet":
+                bucket = state.setdefault(field, [])
+                if value not in bucket:
+                    bucket.append(value)
+            else:
+                raise NotImplementedError(f"memory backend does not support accumulator {op}")
+    out = []
+    for row in groups.values():
+        result = {"_id": row["_id"]}
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            value = row["_acc"].get(field)
+            if "$avg" in acc:
+                total, count = value or (0, 0)
+                value = total / count if count else None
+            elif "$sum" in acc and value is None:
+                value = 0
+            result[field] = value
+        out.append(result)
+    return out
+
+
+def aggregate_docs(docs: list, pipeline: List[dict]) -> list:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif name == "$sort":
+            docs = _sorted(docs, _sort_spec(spec))
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$project":
+            computed = {k: v for k, v in spec.items() if not isinstance(v, (int, bool))}
+            docs = [
+                {**project(d, {k: v for k, v in spec.items() if k not in computed}),
+                 **{k: _expr(d, v) for k, v in computed.items()}}
+                for d in docs
+            ]
+        elif name == "$unwind":
+            path = spec if isinstance(spec, str) else spec["path"]
+            field = path[1:]
+            unwound = []
+            for d in docs:
+                for item in d.get(field) or []:
+                    unwound.append({**d, field: item})
+            docs = unwound
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        else:
+            raise NotImplementedError(f"memory backend does not support aggregation stage {name}")
+    return docs
+
+
+# -----------------------
+# Collections
+# -----------------------
+def _key(_id):
+    try:
+        hash(_id)
+        return _id
+    except TypeError:
+        return repr(_id)
+
+
+def _index_name(keys: List[tuple]) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+class MemoryCollection:
+    """
+    A collection held in a dict of documents keyed by _id. The leading field
+    of every created index gets a hash lookup, so equality and $in filters
+    on it read only the matching documents instead of scanning, as they
+    would use the index on MongoDB.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, dict] = {}
+        self._indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)]}}
+        # field -> hash key of value -> ordered set of document keys
+        self._lookups: Dict[str, Dict[tuple, Dict[Any, None]]] = {}
+        self._lock = threading.RLock()
+
+    # --- internals ---
+    @staticmethod
+    def _field_keys(doc: dict, field: str) -> set:
+        values = _values(doc, field.split("."))
+        return {_hash_key(v) for v in _candidates(values)} if values else {_hash_key(None)}
+
+    def _index_doc(self, doc: dict, add: bool = True) -> None:
+        k = _key(doc["_id"])
+        for field, lookup in self._lookups.items():
+            for hk in self._field_keys(doc, field):
+                bucket = lookup.setdefault(hk, {})
+                if add:
+                    bucket[k] = None
+                else:
+                    bucket.pop(k, None)
+
+    def _plan(self, filt) -> Optional[List[Any]]:
+        """Document keys that can match `filt` via a lookup, or None to scan."""
+        if not filt:
+            return None
+        for field, cond in filt.items():
+            if field != "_id" and field not in self._lookups:
+                continue
+            if _is_operator_dict(cond):
+                if set(cond) == {"$eq"}:
+                    values = [cond["$eq"]]
+                elif set(cond) == {"$in"}:
+                    values = list(cond["$in"])
+                else:
+                    continue
+            elif isinstance(cond, dict) or hasattr(cond, "search"):
+                continue
+            else:
+                values = [cond]
+            if field == "_id":
+                return [_key(v) for v in values]
+            lookup = self._lookups[field]
+            keys: Dict[Any, None] = {}
+            for v in values:
+                keys.update(lookup.get(_hash_key(v), {}))
+            return list(keys)
+        return None
+
+    def _matching(self, filt) -> List[dict]:
+        keys = self._plan(filt)
+        docs = self._docs.values() if keys is None else (self._docs[k] for k in keys if k in self._docs)
+        return [d for d in docs if matches(d, filt)]
+
+    def _first(self, filt, sort=None) -> Optional[dict]:
+        docs = self._matching(filt)
+        if sort:
+            docs = _sorted(docs, _sort_spec(sort))
+        return docs[0] if docs else None
+
+    def _check_unique(self, doc: dict) -> None:
+        for name, info in self._indexes.items():
+            if not info.get("unique"):
+                continue
+            fields = [field for field, _direction in info["key"]]
+
+            def unique_key(d):
+                return [_hash_key((_values(d, f.split(".")) or [None])[0]) for f in fields]
+
+            key = unique_key(doc)
+            for other_key in self._lookups[fields[0]].get(key[0], {}):
+                other = self._docs.get(other_key)
+                if other is not None and other["_id"] != doc["_id"] and unique_key(other) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+
+    def _store(self, doc: dict) -> None:
+        self._check_unique(doc)
+        k = _key(doc["_id"])
+        old = self._docs.get(k)
+        if old is not None:
+            self._index_doc(old, add=False)
+        self._docs[k] = doc
+        self._index_doc(doc)
+
+    def _remove(self, doc: dict) -> None:
+        self._index_doc(doc, add=False)
+        del self._docs[_key(doc["_id"])]
+
+    def _insert(self, document: dict) -> Any:
+        doc = copy.deepcopy(document)
+        doc.setdefault("_id", ObjectId())
+        if _key(doc["_id"]) in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+        self._store(doc)
+        if "_id" not in document:
+            # pymongo sets the generated _id on the caller's document
+            document["_id"] = doc["_id"]
+        return doc["_id"]
+
+    def _update(self, filt, update, upsert, array_filters, many, sort=None) -> tuple:
+        """(matched, modified, upserted_id, before, after) for the first/all matches."""
+        targets = self._matching(filt)
+        if sort:
+            targets = _sorted(targets, _sort_spec(sort))
+        if not many:
+            targets = targets[:1]
+        if not targets:
+            if not upsert:
+                return 0, 0, None, None, None
+            doc = _upsert_seed(filt)
+            apply_update(doc, update, array_filters, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._store(doc)
+            return 0, 0, doc["_id"], None, doc
+        modified = 0
+        before = after = None
+        for doc in targets:
+            updated = copy.deepcopy(doc)
+            apply_update(updated, update, array_filters)
+            if updated != doc:
+                self._store(updated)
+                modified += 1
+            before, after = doc, updated
+        return len(targets), modified, None, before, after
+
+    def _replace(self, filt, replacement, upsert, sort=None) -> tuple:
+        if _is_operator_dict(replacement):
+            raise ValueError("replacement can not include $ operators")
+        current = self._first(filt, sort)
+        if current is None:
+            if not upsert:
+                return 0, 0, None, None, None
+            doc = {**_upsert_seed(filt), **copy.deepcopy(replacement)}
+            doc.setdefault("_id", ObjectId())
+            self._store(doc)
+            return 0, 0, doc["_id"], None, doc
+        doc = copy.deepcopy(replacement)
+        doc["_id"] = current["_id"]
+        self._store(doc)
+        return 1, int(doc != current), None, current, doc
+
+    # --- reads ---
+    def find(self, filter=None, projection=None, skip=0, limit=0, sort=None) -> MemoryCursor:
+        def fetch():
+            with self._lock:
+                return self._matching(filter)
+        cursor = MemoryCursor(fetch, projection).skip(skip).limit(limit)
+        if sort:
+            cursor.sort(sort)
+        return cursor
+
+    def find_one(self, filter=None, projection=None, sort=None) -> Optional[dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        with self._lock:
+            doc = self._first(filter, sort)
+            return project(doc, projection) if doc is not None else None
+
+    def count_documents(self, filter=None) -> int:
+        with self._lock:
+            return len(self._matching(filter))
+
+    def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    def distinct(self, key: str, filter=None) -> list:
+        out: list = []
+        with self._lock:
+            for doc in self._matching(filter):
+                for value in _candidates(_values(doc, key.split("."))):
+                    if isinstance(value, list):
+                        continue
+                    if not any(_equal(value, seen) for seen in out):
+                        out.append(copy.deepcopy(value))
+        return out
+
+    def aggregate(self, pipeline: List[dict]) -> MemoryCursor:
+        pipeline = list(pipeline)
+        with self._lock:
+            if pipeline and "$match" in pipeline[0]:
+                docs = self._matching(pipeline.pop(0)["$match"])
+            else:
+                docs = list(self._docs.values())
+        # Stages build new documents and never mutate their input
+        results = copy.deepcopy(aggregate_docs(docs, pipeline))
+        return MemoryCursor(lambda: results)
+
+    # --- writes ---
+    def insert_one(self, document: dict) -> InsertOneResult:
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True) -> InsertManyResult:
+        with self._lock:
+            return InsertManyResult([self._insert(d) for d in documents], True)
+
+    def update_one(self, filter, update, upsert=False, array_filters=None, sort=None) -> UpdateResult:
+        with self._lock:
+            n, modified, upserted, _b, _a = self._update(filter, update, upsert, array_filters, many=False, sort=sort)
+        return _update_result(n, modified, upserted)
+
+    def update_many(self, filter, update, upsert=False, array_filters=None) -> UpdateResult:
+        with self._lock:
+            n, modified, upserted, _b, _a = self._update(filter, update, upsert, array_filters, many=True)
+        return _update_result(n, modified, upserted)
+
+    def replace_one(self, filter, replacement, upsert=False, sort=None) -> UpdateResult:
+        with self._lock:
+            n, modified, upserted, _b, _a = self._replace(filter, replacement, upsert, sort)
+        return _update_result(n, modified, upserted)
+
+    def delete_one(self, filter) -> DeleteResult:
+        with self._lock:
+            doc = self._first(filter)
+            if doc is not None:
+                self._remove(doc)
+            return DeleteResult({"n": int(doc is not None)}, True)
+
+    def delete_many(self, filter) -> DeleteResult:
+        with self._lock:
+            docs = self._matching(filter)
+            for doc in docs:
+                self._remove(doc)
+            return DeleteResult({"n": len(docs)}, True)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, array_filters=None) -> Optional[dict]:
+        with self._lock:
+            _n, _m, _u, before, after = self._update(filter, update, upsert, array_filters, many=False, sort=sort)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return project(doc, projection) if doc is not None else None
+
+    def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                             return_document=ReturnDocument.BEFORE) -> Optional[dict]:
+        with self._lock:
+            _n, _m, _u, before, after = self._replace(filter, replacement, upsert, sort)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return project(doc, projection) if doc is not None else None
+
+    def find_one_and_delete(self, filter, projection=None, sort=None) -> Optional[dict]:
+        with self._lock:
+            doc = self._first(filter, sort)
+            if doc is None:
+                return None
+            self._remove(doc)
+        return project(doc, projection)
+
+    def bulk_write(self, requests: list, ordered: bool = True) -> BulkWriteResult:
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        with self._lock:
+            for index, op in enumerate(requests):
+                if isinstance(op, InsertOne):
+                    self._insert(op._doc)
+                    result["nInserted"] += 1
+                    continue
+                if isinstance(op, (DeleteOne, DeleteMany)):
+                    res = (self.delete_one if isinstance(op, DeleteOne) else self.delete_many)(op._filter)
+                    result["nRemoved"] += res.deleted_count
+                    continue
+                if isinstance(op, ReplaceOne):
+                    n, modified, upserted, _b, _a = self._replace(op._filter, op._doc, op._upsert)
+                elif isinstance(op, (UpdateOne, UpdateMany)):
+                    n, modified, upserted, _b, _a = self._update(
+                        op._filter, op._doc, op._upsert, op._array_filters, many=isinstance(op, UpdateMany))
+                else:
+                    raise NotImplementedError(f"memory backend does not support bulk operation {type(op).__name__}")
+                result["nMatched"] += n
+                result["nModified"] += modified
+                if upserted is not None:
+                    result["nUpserted"] += 1
+                    result["upserted"].append({"index": index, "_id": upserted})
+        return BulkWriteResult(result, True)
+
+    # --- indexes ---
+    def create_index(self, keys, name: str = None, unique: bool = False, **kwargs) -> str:
+        keys = _sort_spec(keys, 1)
+        name = name or _index_name(keys)
+        info: dict = {"key": keys}
+        if unique:
+            info["unique"] = True
+        if "expireAfterSeconds" in kwargs:
+            info["expireAfterSeconds"] = kwargs["expireAfterSeconds"]
+        with self._lock:
+            existing = self._indexes.get(name)
+            if existing is not None:
+                if existing != info:
+                    raise ValueError(f"An index with the same name but different options already exists: {name}")
+                return name
+            field = keys[0][0]
+            if field not in self._lookups:
+                lookup = self._lookups[field] = {}
+                for doc in self._docs.values():
+                    for hk in self._field_keys(doc, field):
+                        lookup.setdefault(hk, {})[_key(doc["_id"])] = None
+            self._indexes[name] = info
+            try:
+                for doc in self._docs.values():
+                    self._check_unique(doc)
+            except DuplicateKeyError:
+                del self._indexes[name]
+                raise
+        return name
+
+    def index_information(self) -> Dict[str, dict]:
+        with self._lock:
+            return copy.deepcopy(self._indexes)
+
+    def drop_index(self, name: str) -> None:
+        with self._lock:
+            self._indexes.pop(name, None)
+            # Lookups only speed up reads, so one left behind is harmless
+
+    def drop(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._indexes = {"_id_": {"key": [("_id", 1)]}}
+            self._lookups = {}
+
+
+def _update_result(matched: int, modified: int, upserted) -> UpdateResult:
+    raw = {"n": matched + int(upserted is not None), "nModified": modified}
+    if upserted is not None:
+        raw["upserted"] = upserted
+    return UpdateResult(raw, True)
+
+
+class AsyncMemoryCollection:
+    """Awaitable face of a MemoryCollection, mirroring pymongo's AsyncCollection."""
+
+    def __init__(self, collection: MemoryCollection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline: List[dict]) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.aggregate(pipeline))
+
+    def __getattr__(self, attr):
+        method = getattr(self._collection, attr)
+        if not callable(method):
+            return method
+
+        # Every other collection method is a coroutine on AsyncCollection
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+# -----------------------
+# Databases
+# -----------------------
+class MemoryDatabase:
+    """Collections by name, created on first access like a MongoDB database."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(name)
+            return self._collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def drop_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def load(self, data: Dict[str, List[dict]]) -> Dict[str, int]:
+        """Insert {"collection": [docs]} (e.g. a seed file); returns counts per collection."""
+        counts = {}
+        for name, docs in data.items():
+            counts[name] = len(self[name].insert_many(docs).inserted_ids)
+        return counts
+
+    def load_json(self, path: str) -> Dict[str, int]:
+        with open(path, encoding="utf-8") as f:
+            return self.load(json_util.loads(f.read()))
+
+
+class AsyncMemoryDatabase:
+    def __init__(self, database: MemoryDatabase):
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self._database[name])
+
+
+_databases: Dict[str, MemoryDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_memory_db(name: str) -> MemoryDatabase:
+    """The process-wide in-memory database `name`, seeded from MEMORY_DB_SEED on creation."""
+    with _databases_lock:
+        database = _databases.get(name)
+        if database is None:
+            database = _databases[name] = MemoryDatabase(name)
+            if MEMORY_DB_SEED:
+                counts = database.load_json(MEMORY_DB_SEED)
+                logger.info("In-memory database seeded", extra={"db_name": name, "seed": MEMORY_DB_SEED, "counts": counts})
+        return database
+
+
+def get_async_memory_db(name: str) -> AsyncMemoryDatabase:
+    return AsyncMemoryDatabase(get_memory_db(name))
+
+
+def reset_memory_dbs() -> None:
+    """Forget every in-memory database (tests, benchmark reruns)."""
+    with _databases_lock:
+        _databases.clear()
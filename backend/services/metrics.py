@@ -0,0 +1,329 @@
+"""backend/services/metrics.py
+
+Purpose
+-------
+In-process metrics (counters, gauges, fixed-bucket histograms) exposed in
+the Prometheus text exposition format at GET /metrics, so capacity planning
+and regression detection can use numbers instead of grepping app.log.
+
+No client library is needed: metrics are plain Python objects guarded by a
+lock, cheap enough to update on every request.
+
+Metrics
+-------
+http_request_duration_seconds{method,route,status}   histogram
+ollama_request_duration_seconds{endpoint,outcome}    histogram
+ollama_errors_total{endpoint}                        counter
+google_request_duration_seconds{outcome}             histogram
+query_cache_lookups_total{result}                    counter (HIT, MISS, ...)
+query_cache_evictions_total{reason}                  counter
+query_cache_entries                                  gauge
+profile_rebuild_duration_seconds                     histogram
+profile_rebuild_users                                gauge (users in last cycle)
+mongo_command_duration_seconds{command,outcome}      histogram (pymongo CommandListener)
+llm_queue_wait_seconds{priority}                     histogram (wait for an LLM scheduler slot)
+llm_queue_depth                                      gauge (calls waiting for a slot)
+llm_active_calls                                     gauge (calls holding a slot)
+llm_shed_total                                       counter (expansions skipped, queue too deep)
+llm_queue_dropped_total                              counter (queued calls past their deadline)
+circuit_breaker_state{breaker,state}                 gauge (1 for the current state)
+ollama_endpoint_outstanding{endpoint}                gauge (in-flight calls per endpoint)
+ollama_endpoint_ejected{endpoint}                    gauge (1 while passively ejected)
+ollama_endpoint_requests_total{endpoint}             counter (calls leased to the endpoint)
+
+Env vars
+--------
+METRICS_ENABLED
+    "1" (default) to serve /metrics and record request latency.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+METRICS_ENABLED = (os.getenv("METRICS_ENABLED", "1") or "1").strip() == "1"
+
+# Seconds; covers cache hits (sub-ms) through slow LLM calls (tens of seconds).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Set explicitly, or computed at scrape time from `callback`. A labelled
+    gauge's callback returns {label values tuple: value}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def set_function(self, callback: Callable[[], object]) -> None:
+        """Compute the value at scrape time (for state owned by another module)."""
+        self.callback = callback
+
+    def _collect(self) -> Dict[Tuple[str, ...], float]:
+        if self.callback is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.callback()
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in k): float(n) for k, n in value.items()}
+        return {(): float(value)}
+
+    def value(self, **labels) -> float:
+        if self.callback is not None and not self.labelnames:
+            return float(self.callback())
+        return self._collect().get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        try:
+            items = sorted(self._collect().items())
+        except Exception:
+            return self.header()
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, row in items:
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += row[i]
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# -----------------------
+# Application metrics
+# -----------------------
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+ollama_request_duration = registry.histogram(
+    "ollama_request_duration_seconds", "Ollama /api/generate latency per endpoint.", ("endpoint", "outcome"))
+ollama_errors = registry.counter(
+    "ollama_errors_total", "Failed Ollama calls per endpoint.", ("endpoint",))
+google_request_duration = registry.histogram(
+    "google_request_duration_seconds", "Google Custom Search API latency.", ("outcome",))
+query_cache_lookups = registry.counter(
+    "query_cache_lookups_total", "Expansion cache lookups by result tier.", ("result",))
+query_cache_evictions = registry.counter(
+    "query_cache_evictions_total", "Expansion cache entries removed.", ("reason",))
+profile_rebuild_duration = registry.histogram(
+    "profile_rebuild_duration_seconds", "Duration of background profile rebuild cycles.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+profile_rebuild_users = registry.gauge(
+    "profile_rebuild_users", "Users rebuilt in the last profile rebuild cycle.")
+mongo_command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency.", ("command", "outcome"))
+
+# LLM scheduler (services/semantic_expansion.py)
+llm_queue_wait = registry.histogram(
+    "llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot.", ("priority",))
+llm_queue_depth = registry.gauge(
+    "llm_queue_depth", "LLM calls waiting for a scheduler slot.")
+llm_active_calls = registry.gauge(
+    "llm_active_calls", "LLM calls currently holding a scheduler slot.")
+llm_shed = registry.counter(
+    "llm_shed_total", "Expansions that skipped the LLM because its queue was too deep.")
+llm_queue_dropped = registry.counter(
+    "llm_queue_dropped_total", "Queued LLM calls dropped because their deadline passed.")
+
+# Circuit breakers (services/circuit_breaker.py) and the Ollama pool (services/ollama_pool.py)
+circuit_breaker_state = registry.gauge(
+    "circuit_breaker_state", "1 for each breaker's current state (closed, open, half_open).", ("breaker", "state"))
+ollama_endpoint_outstanding = registry.gauge(
+    "ollama_endpoint_outstanding", "In-flight calls per Ollama endpoint.", ("endpoint",))
+ollama_endpoint_ejected = registry.gauge(
+    "ollama_endpoint_ejected", "1 while an Ollama endpoint is passively ejected.", ("endpoint",))
+ollama_endpoint_requests = registry.counter(
+    "ollama_endpoint_requests_total", "Calls leased to each Ollama endpoint.", ("endpoint",))
+
+
+# -----------------------
+# Mongo command listener
+# -----------------------
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo CommandListener feeding mongo_command_duration_seconds."""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="ok")
+
+    def failed(self, event) -> None:
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name, outcome="error")
+
+
+# -----------------------
+# ASGI middleware
+# -----------------------
+class MetricsMiddleware:
+    """Record http_request_duration_seconds per route template (not raw path)."""
+
+    def __init__(self, app, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message.get("status", 500)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot blow up cardinality.
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=route_path,
+                status=str(status["code"]),
+            )
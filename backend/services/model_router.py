@@ -0,0 +1,96 @@
+"""backend/services/model_router.py
+
+Purpose
+-------
+Pick which Ollama model expands a query, so most traffic can run on a small,
+fast model and only hard queries pay for the large one.
+
+Routing rules (first match wins)
+--------------------------------
+- no small model configured          -> large ("single_model")
+- clarify_and_personalize mode       -> large ("personalized")
+- more than SE_MODEL_SMALL_MAX_WORDS -> large ("long_query")
+- ambiguity signals (questions,
+  comparisons, alternatives)         -> large ("ambiguous")
+- otherwise                          -> small ("simple_query")
+
+If the small model returns a degenerate expansion (empty, chatty preamble,
+runaway length) the caller retries once with the large model.
+
+Env vars
+--------
+SE_MODEL_SMALL
+    Fast model for easy queries, e.g. "llama3.2:3b". Unset disables routing.
+
+SE_MODEL_LARGE
+    Model for everything else (default: OLLAMA_MODEL).
+
+SE_MODEL_SMALL_MAX_WORDS
+    Longest query (in words) routed to the small model (default: 4).
+
+SE_MODEL_MAX_OUTPUT_WORDS
+    Expansions longer than this are treated as degenerate (default: 32).
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Tuple
+
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+MODEL_SMALL = (os.getenv("SE_MODEL_SMALL", "") or "").strip()
+MODEL_LARGE = (os.getenv("SE_MODEL_LARGE", "") or os.getenv("OLLAMA_MODEL", "llama3.1")).strip()
+MODEL_SMALL_MAX_WORDS = int(os.getenv("SE_MODEL_SMALL_MAX_WORDS", "4"))
+MODEL_MAX_OUTPUT_WORDS = int(os.getenv("SE_MODEL_MAX_OUTPUT_WORDS", "32"))
+
+# Words that usually mean the query needs real disambiguation / reasoning
+_AMBIGUITY_WORDS = {
+    "what", "why", "how", "which", "who", "whom", "whose", "when", "where",
+    "should", "could", "would", "vs", "versus", "or", "difference", "compare",
+    "better", "meaning", "mean",
+}
+_PREAMBLE_REGEX = re.compile(
+    r"^(here\s+is|here's|sure|certainly|expanded\s+query|the\s+expanded|i\s+(would|will|can|think)|as\s+an\s+ai)\b",
+    re.IGNORECASE,
+)
+
+
+def route_model(seed: str, semantic_mode: str) -> Tuple[str, str]:
+    """
+    Choose the model for expanding `seed`.
+
+    Returns:
+      (model_name, reason) — reason is recorded in the insight trace.
+    """
+    if not MODEL_SMALL or MODEL_SMALL == MODEL_LARGE:
+        return MODEL_LARGE, "single_model"
+
+    if semantic_mode == "clarify_and_personalize":
+        return MODEL_LARGE, "personalized"
+
+    words = (seed or "").lower().split()
+    if len(words) > MODEL_SMALL_MAX_WORDS:
+        return MODEL_LARGE, "long_query"
+
+    if "?" in (seed or "") or any(w.strip("?,.!") in _AMBIGUITY_WORDS for w in words):
+        return MODEL_LARGE, "ambiguous"
+
+    return MODEL_SMALL, "simple_query"
+
+
+def is_degenerate(expanded: str, seed: str) -> bool:
+    """
+    True when an expansion is unusable: empty, a chatty preamble instead of a
+    query, or far longer than any keyword query should be.
+    """
+    text = (expanded or "").strip()
+    if not text:
+        return True
+    if _PREAMBLE_REGEX.match(text):
+        return True
+    if MODEL_MAX_OUTPUT_WORDS > 0 and len(text.split()) > max(MODEL_MAX_OUTPUT_WORDS, 3 * len((seed or "").split())):
+        return True
+    return False
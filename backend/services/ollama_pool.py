@@ -0,0 +1,191 @@
+"""backend/services/ollama_pool.py
+
+Purpose
+-------
+Spread LLM calls over several Ollama hosts so expansion throughput scales
+with inference nodes.
+
+Routing
+-------
+- Least outstanding requests: each call goes to the healthy endpoint with the
+  fewest in-flight calls (recent consecutive failures count as extra load, so
+  a fast-failing host does not attract traffic). Ties rotate.
+- Model affinity: a call for a given model prefers endpoints pinned to that
+  model (or unpinned ones) before falling back to any endpoint.
+- Passive ejection: an endpoint that fails `OLLAMA_EJECT_AFTER_FAILURES`
+  times in a row is skipped for `OLLAMA_EJECT_SECONDS`.
+- Active health checks: `health_check()` probes `/api/tags` on every endpoint,
+  ejecting unreachable ones and reinstating recovered ones early.
+
+Env vars
+--------
+OLLAMA_URLS
+    Comma-separated endpoints, each "<url>" or "<url>|<model>" to pin a model
+    to that host, e.g. "http://gpu1:11434|llama3.1,http://gpu2:11434".
+    Falls back to OLLAMA_URL when unset.
+
+OLLAMA_EJECT_AFTER_FAILURES
+    Consecutive failures before an endpoint is ejected (default: 3).
+
+OLLAMA_EJECT_SECONDS
+    How long an ejected endpoint is skipped (default: 30).
+
+OLLAMA_HEALTH_CHECK_SECONDS
+    Interval of the background health check loop; 0 disables it (default: 30).
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import httpx
+
+from backend.services.logger import AppLogger
+from backend.services.metrics import ollama_endpoint_requests
+
+logger = AppLogger.get_logger(__name__)
+
+OLLAMA_URLS = os.getenv("OLLAMA_URLS", "")
+OLLAMA_EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+OLLAMA_HEALTH_CHECK_SECONDS = int(os.getenv("OLLAMA_HEALTH_CHECK_SECONDS", "30"))
+HEALTH_CHECK_TIMEOUT = 2.0
+
+
+class OllamaEndpoint:
+    """One Ollama host plus its live load/health counters."""
+
+    def __init__(self, url: str, model: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.model = model or None
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "model": self.model,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": not self.is_healthy(time.monotonic()),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+def parse_endpoints(spec: str, default_url: str) -> List[OllamaEndpoint]:
+    """Parse OLLAMA_URLS ("url[|model],...") into endpoints; falls back to `default_url`."""
+    endpoints = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, model = item.partition("|")
+        endpoints.append(OllamaEndpoint(url.strip(), model.strip() or None))
+    return endpoints or [OllamaEndpoint(default_url)]
+
+
+class OllamaPool:
+    """
+    Least-outstanding-requests router over Ollama endpoints with passive
+    ejection. Thread-safe; leases are cheap enough for every call.
+    """
+
+    def __init__(
+            self,
+            endpoints: List[OllamaEndpoint],
+            eject_after: int = OLLAMA_EJECT_AFTER_FAILURES,
+            eject_seconds: float = OLLAMA_EJECT_SECONDS,
+    ):
+        self.endpoints = endpoints
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def _pick(self, exclude: tuple = (), model: Optional[str] = None) -> OllamaEndpoint:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude] or list(self.endpoints)
+        if model:
+            candidates = [e for e in candidates if e.model in (None, model)] or candidates
+        healthy = [e for e in candidates if e.is_healthy(now)]
+        if not healthy:
+            # Everything is ejected: try the one that comes back first rather
+            # than failing outright (the circuit breaker handles full outages).
+            return min(candidates, key=lambda e: e.ejected_until)
+
+        offset = next(self._rr)
+        n = len(healthy)
+        rotated = [healthy[(i + offset) % n] for i in range(n)]
+        return min(rotated, key=lambda e: e.outstanding + e.consecutive_failures)
+
+    @contextmanager
+    def lease(self, exclude: tuple = (), model: Optional[str] = None) -> Iterator[OllamaEndpoint]:
+        """
+        Reserve the least-loaded endpoint for one call, preferring endpoints
+        that serve `model`. An exception inside the block counts as a failure
+        for that endpoint.
+        """
+        with self._lock:
+            endpoint = self._pick(exclude, model)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        ollama_endpoint_requests.inc(endpoint=endpoint.url)
+        try:
+            yield endpoint
+        except Exception:
+            with self._lock:
+                endpoint.outstanding -= 1
+                self._mark_failure(endpoint)
+            raise
+        else:
+            with self._lock:
+                endpoint.outstanding -= 1
+                endpoint.consecutive_failures = 0
+
+    def _mark_failure(self, endpoint: OllamaEndpoint) -> None:
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_after and endpoint.is_healthy(time.monotonic()):
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            logger.warning(
+                "[OllamaPool] ejecting %s for %.0fs after %d consecutive failures",
+                endpoint.url, self.eject_seconds, endpoint.consecutive_failures,
+            )
+
+    async def health_check(self) -> None:
+        """Probe every endpoint's /api/tags; eject unreachable ones, reinstate recovered ones."""
+        async with httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT) as client:
+            for endpoint in self.endpoints:
+                try:
+                    resp = await client.get(f"{endpoint.url}/api/tags")
+                    resp.raise_for_status()
+                except Exception as e:
+                    with self._lock:
+                        if endpoint.is_healthy(time.monotonic()):
+                            logger.warning("[OllamaPool] health check failed for %s: %s", endpoint.url, e)
+                        endpoint.consecutive_failures = max(endpoint.consecutive_failures, self.eject_after)
+                        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                else:
+                    with self._lock:
+                        if not endpoint.is_healthy(time.monotonic()):
+                            logger.info("[OllamaPool] %s healthy again, reinstating", endpoint.url)
+                        endpoint.ejected_until = 0.0
+                        endpoint.consecutive_failures = 0
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
@@ -0,0 +1,104 @@
+"""backend/services/personalization_context.py
+
+Purpose
+-------
+Memoize the per-user "personalization context" used by semantic expansion:
+the interest snippet appended to the system prompt plus the trace fields
+that explain it (top_explicit, top_implicit, used_interests).
+
+Building it means extracting explicit/implicit maps from the profile,
+running interest selection, classifying and filtering tiers and formatting
+the snippet. None of that changes until the profile does, so contexts are
+keyed by (user, profile revision, verbosity, mode, selection algorithm).
+A profile rebuild bumps the revision, so stale entries are simply never
+looked up again and age out of the LRU.
+
+With hybrid selection the chosen interests also depend on the query, so
+the seed joins the key; with non-deterministic hybrid sampling nothing is
+memoized.
+
+Env vars
+--------
+SE_PERSONALIZATION_CACHE_SIZE
+    Max contexts kept in memory (LRU); 0 disables the cache (default: 2048).
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from backend.services.interest_selection import (
+    selection_algo,
+    selection_depends_on_seed,
+    selection_is_deterministic,
+)
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+PERSONALIZATION_CACHE_SIZE = int(os.getenv("SE_PERSONALIZATION_CACHE_SIZE", "2048"))
+
+
+def context_key(user_id: str, profile_rev: int, verbosity: str, semantic_mode: str, seed: str) -> Optional[tuple]:
+    """
+    Key for a personalization context, or None when the context must not be
+    memoized (random interest sampling).
+    """
+    if not selection_is_deterministic():
+        return None
+    query = " ".join((seed or "").lower().split()) if selection_depends_on_seed() else ""
+    return (
+        user_id,
+        int(profile_rev or 0),
+        (verbosity or "medium").lower(),
+        (semantic_mode or "clarify_only").lower(),
+        selection_algo(),
+        query,
+    )
+
+
+class PersonalizationContextCache:
+    """Thread-safe LRU of personalization contexts (plain dicts)."""
+
+    def __init__(self, max_size: int = PERSONALIZATION_CACHE_SIZE):
+        self.max_size = max_size
+        self._store: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Optional[tuple]) -> Optional[dict]:
+        """Return a copy of the cached context (callers may mutate it), or None."""
+        if key is None or self.max_size <= 0:
+            return None
+        with self._lock:
+            ctx = self._store.get(key)
+            if ctx is None:
+                self.misses += 1
+                return None
+            self._store.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(ctx)
+
+    def set(self, key: Optional[tuple], ctx: dict) -> None:
+        if key is None or self.max_size <= 0:
+            return
+        ctx = copy.deepcopy(ctx)
+        with self._lock:
+            self._store[key] = ctx
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+personalization_cache = PersonalizationContextCache()
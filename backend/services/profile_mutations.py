@@ -0,0 +1,382 @@
+"""backend/services/profile_mutations.py
+
+Purpose
+-------
+Reads and in-place edits of a stored user profile for the /profiles endpoints.
+
+Editing one interest used to rebuild the whole profile (re-aggregating the
+user's entire query and click history) and then overwrite the document with
+`$set: profile`, which also raced with the background rebuild. Each edit is
+now a single atomic MongoDB update on the stored document:
+
+- explicit interests: `$push` guarded by a "keyword not present" filter,
+  `$pull`, and `$set` through array filters (`explicit_interests.$[e]`)
+- implicit exclusions: guarded `$push` / `$pull`; the excluded or promoted
+  keyword is `$unset` from `implicit_interests`
+- every change bumps `profile_revision` with `$inc`, so expansion-cache
+  entries keyed on the old revision are no longer used
+
+The updated document comes back from `find_one_and_update`, so an edit is
+one indexed round trip (two for the read-modify-write edits, which retry on
+a revision conflict). Keywords match case-insensitively, as before.
+
+Scores are not recomputed here. Un-excluding a keyword brings it back into
+`implicit_interests` at the next scheduled rebuild
+(background_tasks/background_tasks.py). Only a user with no stored profile
+yet gets a full build, once, so there is a document to edit.
+
+Reads serve the stored document as-is (see get_stored_profile); the
+endpoints use `profile_revision` as the ETag so unchanged profiles can be
+answered with 304 Not Modified. A read can select fields and page through
+the history lists and `implicit_interests` (which only ever grow) with a
+find() projection, so large profiles are trimmed by MongoDB rather than
+after loading the whole document.
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+
+from backend.services.async_db import async_user_profiles_col
+from backend.services.user_profile_service import build_user_profile_async
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+# Attempts for edits that read the profile before writing it
+MAX_CONFLICT_RETRIES = 3
+
+# Top-level fields a read can select with `fields`
+PROFILE_FIELDS = (
+    "user_id", "explicit_interests", "implicit_interests", "implicit_exclusions",
+    "query_history", "click_history", "last_updated", "profile_revision", "embedding", "settings",
+)
+# Fields paged by `limit` / `cursor` (implicit_interests in stored, highest-score-first order)
+PAGED_FIELDS = ("query_history", "click_history", "implicit_interests")
+
+_NO_ID = {"_id": 0}
+
+
+class KeywordExistsError(ValueError):
+    """The keyword is already an explicit interest."""
+
+
+def _keyword_regex(keyword: str) -> re.Pattern:
+    """Case-insensitive exact match (explicit keywords keep the case they were added with)."""
+    return re.compile(f"^{re.escape(keyword)}$", re.IGNORECASE)
+
+
+def _implicit_paths(keyword: str) -> List[str]:
+    """
+    `implicit_interests.<key>` paths to unset for a keyword. Keys containing
+    dots (click domains) cannot be addressed by a field path; those stay in
+    the stored map until the next rebuild and are hidden by _visible() meanwhile.
+    """
+    keys = {keyword, keyword.lower()}
+    return [f"implicit_interests.{k}" for k in sorted(keys) if k and "." not in k and not k.startswith("$")]
+
+
+def _explicit_entry(keyword: str, weight: float) -> dict:
+    return {
+        "keyword": keyword,
+        "weight": weight,
+        "last_updated": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _promote_update(entries: List[dict]) -> dict:
+    """Add explicit entries and drop their keywords from the implicit lists."""
+    update = {
+        "$push": {"explicit_interests": {"$each": entries}},
+        "$inc": {"profile_revision": 1},
+    }
+    pulls = [_keyword_regex(e["keyword"]) for e in entries]
+    update["$pull"] = {"implicit_exclusions": {"$in": pulls}}
+    unset = {path: "" for e in entries for path in _implicit_paths(e["keyword"])}
+    if unset:
+        update["$unset"] = unset
+    return update
+
+
+def _visible(profile: Optional[dict]) -> Optional[dict]:
+    """Hide implicit interests that are explicit or excluded, as a rebuild would."""
+    if not profile or not isinstance(profile.get("implicit_interests"), dict):
+        return profile
+    hidden = {e.lower() for e in profile.get("implicit_exclusions", []) or []}
+    for item in profile.get("explicit_interests", []) or []:
+        if isinstance(item, dict) and "keyword" in item:
+            hidden.add(item["keyword"].lower())
+        elif isinstance(item, str):
+            hidden.add(item.lower())
+    profile["implicit_interests"] = {
+        k: v for k, v in profile["implicit_interests"].items() if k.lower() not in hidden
+    }
+    return profile
+
+
+async def _stored(user_id: str, projection: dict = None) -> Optional[dict]:
+    return await async_user_profiles_col.find_one({"user_id": user_id}, projection or _NO_ID)
+
+
+async def _update(user_id: str, update: dict, condition: dict = None, array_filters: list = None) -> Optional[dict]:
+    """
+    Apply `update` to the user's profile if it also matches `condition`.
+    Returns the updated profile, or None when the condition did not hold.
+    """
+    filt = {"user_id": user_id, **(condition or {})}
+    kwargs = {"projection": _NO_ID, "return_document": ReturnDocument.AFTER}
+    if array_filters:
+        kwargs["array_filters"] = array_filters
+
+    doc = await async_user_profiles_col.find_one_and_update(filt, update, **kwargs)
+    if doc is None and await _stored(user_id, {"_id": 1}) is None:
+        # First edit for a user without a stored profile: build it once
+        await build_user_profile_async(user_id)
+        doc = await async_user_profiles_col.find_one_and_update(filt, update, **kwargs)
+    return _visible(doc)
+
+
+# -----------------------
+# Reads
+# -----------------------
+# Documents created by the settings endpoints hold no interests until the first build
+_BUILT = {"implicit_interests": {"$exists": True}}
+
+
+def profile_projection(fields: Optional[List[str]] = None, limit: Optional[int] = None, cursor: int = 0) -> dict:
+    """
+    find() projection for a profile read.
+
+    `fields` selects top-level fields (profile_revision is always kept for the
+    ETag). With `limit`, each paged field holds entries [cursor, cursor+limit]:
+    one more than asked for, so page_profile() can tell whether a next page exists.
+    """
+    if not fields and not limit:
+        return dict(_NO_ID)
+    selected = list(fields or PROFILE_FIELDS)
+    projection = {"_id": 0, "profile_revision": 1}
+    for field in selected:
+        projection[field] = 1
+    if "implicit_interests" in selected:
+        # Needed by _visible(); dropped again by page_profile() unless selected
+        if "explicit_interests" not in selected:
+            projection["explicit_interests.keyword"] = 1
+        if "implicit_exclusions" not in selected:
+            projection["implicit_exclusions"] = 1
+    if limit:
+        for field in ("query_history", "click_history"):
+            if field in selected:
+                projection[field] = {"$slice": [cursor, limit + 1]}
+        if "implicit_interests" in selected:
+            # $slice does not apply to objects: page through the key/value pairs
+            projection["implicit_interests"] = {"$arrayToObject": {
+                "$slice": [{"$objectToArray": "$implicit_interests"}, cursor, limit + 1]
+            }}
+    return projection
+
+
+def page_profile(profile: Optional[dict], fields: Optional[List[str]] = None,
+                 limit: Optional[int] = None, cursor: int = 0) -> Optional[dict]:
+    """
+    Shape a profile read with profile_projection(): hide explicit/excluded
+    interests, trim paged fields to `limit` and add `next_cursor` (None on
+    the last page). Hidden interests still count towards the cursor, so a
+    page may come back shorter than `limit`.
+    """
+    if profile is None:
+        return None
+    more = False
+    if limit:
+        # Trim before hiding so the cursor stays a position in the stored lists
+        for field in PAGED_FIELDS:
+            value = profile.get(field)
+            if isinstance(value, (list, dict)):
+                more = more or len(value) > limit
+                profile[field] = value[:limit] if isinstance(value, list) else dict(list(value.items())[:limit])
+            elif field in profile:
+                profile[field] = {} if field == "implicit_interests" else []
+    profile = _visible(profile)
+    if fields:
+        for helper in ("explicit_interests", "implicit_exclusions"):
+            if helper not in fields:
+                profile.pop(helper, None)
+    if limit:
+        profile["next_cursor"] = cursor + limit if more else None
+    return profile
+
+
+def shape_profile(profile: Optional[dict], fields: Optional[List[str]] = None,
+                  limit: Optional[int] = None, cursor: int = 0) -> Optional[dict]:
+    """profile_projection() + page_profile() for a profile already in memory (e.g. just built)."""
+    if profile is None or (not fields and not limit):
+        return profile
+    selected = set(fields or PROFILE_FIELDS) | {"profile_revision"}
+    if "implicit_interests" in selected:
+        selected |= {"explicit_interests", "implicit_exclusions"}
+    out = {k: v for k, v in profile.items() if k in selected}
+    if limit:
+        for field in PAGED_FIELDS:
+            value = out.get(field)
+            if isinstance(value, list):
+                out[field] = value[cursor:cursor + limit + 1]
+            elif isinstance(value, dict):
+                out[field] = dict(list(value.items())[cursor:cursor + limit + 1])
+    return page_profile(out, fields, limit, cursor)
+
+
+async def get_stored_profile(user_id: str, fields: Optional[List[str]] = None,
+                             limit: Optional[int] = None, cursor: int = 0) -> Optional[dict]:
+    """The stored profile without rebuilding it, or None if the user has none yet."""
+    projection = profile_projection(fields, limit, cursor)
+    stored = await async_user_profiles_col.find_one({"user_id": user_id, **_BUILT}, projection)
+    return page_profile(stored, fields, limit, cursor)
+
+
+async def get_profile_revision(user_id: str) -> Optional[int]:
+    """Only the revision of the stored profile (None if there is no profile)."""
+    stored = await async_user_profiles_col.find_one({"user_id": user_id, **_BUILT},
+                                                    {"_id": 0, "profile_revision": 1})
+    if stored is None:
+        return None
+    return int(stored.get("profile_revision", 0))
+
+
+# -----------------------
+# Explicit interests
+# -----------------------
+async def add_explicit_interest(user_id: str, keyword: str, weight: float = 1.0) -> dict:
+    """Add an explicit interest (removing it from the implicit lists). Raises KeywordExistsError."""
+    profile = await _update(
+        user_id,
+        _promote_update([_explicit_entry(keyword, weight)]),
+        condition={"explicit_interests.keyword": {"$not": _keyword_regex(keyword)}},
+    )
+    if profile is None:
+        raise KeywordExistsError(keyword)
+    return profile
+
+
+async def remove_explicit_interest(user_id: str, keyword: str) -> dict:
+    return await _update(user_id, {
+        "$pull": {"explicit_interests": {"keyword": _keyword_regex(keyword)}},
+        "$inc": {"profile_revision": 1},
+    })
+
+
+async def clear_explicit_interests(user_id: str) -> dict:
+    return await _update(user_id, {
+        "$set": {"explicit_interests": []},
+        "$inc": {"profile_revision": 1},
+    })
+
+
+async def update_explicit_interests(user_id: str, updates: list) -> dict:
+    """
+    Set the weight of existing explicit interests and add the new ones.
+    `updates` is a list of {"keyword", "weight"}; a keyword listed twice
+    keeps its last weight.
+    """
+    wanted = {}
+    for item in updates:
+        wanted[item["keyword"].lower()] = (item["keyword"], float(item.get("weight", 1.0)))
+
+    profile = None
+    for _attempt in range(MAX_CONFLICT_RETRIES):
+        stored = await _stored(user_id, {"_id": 0, "explicit_interests.keyword": 1, "profile_revision": 1})
+        if stored is None:
+            await build_user_profile_async(user_id)
+            continue
+        existing = {e["keyword"].lower() for e in stored.get("explicit_interests", []) if isinstance(e, dict)}
+        rev = {"profile_revision": stored.get("profile_revision", 0)} if "profile_revision" in stored else \
+            {"profile_revision": {"$exists": False}}
+
+        changed = [kw for kw in wanted if kw in existing]
+        added = [kw for kw in wanted if kw not in existing]
+        if not changed and not added:
+            return _visible(await _stored(user_id))
+
+        if changed:
+            now = datetime.now(timezone.utc).isoformat()
+            update = {"$set": {}, "$inc": {"profile_revision": 1}}
+            array_filters = []
+            for i, kw in enumerate(changed):
+                update["$set"][f"explicit_interests.$[e{i}].weight"] = wanted[kw][1]
+                update["$set"][f"explicit_interests.$[e{i}].last_updated"] = now
+                array_filters.append({f"e{i}.keyword": _keyword_regex(kw)})
+            profile = await _update(user_id, update, condition=rev, array_filters=array_filters)
+            if profile is None:
+                continue  # Changed underneath us: re-read and retry
+            rev = {"profile_revision": profile.get("profile_revision")}
+
+        if added:
+            entries = [_explicit_entry(*wanted[kw]) for kw in added]
+            profile = await _update(user_id, _promote_update(entries), condition=rev)
+            if profile is None:
+                continue
+        return profile
+
+    logger.warning("Explicit interest update kept conflicting; returning stored profile", extra={
+        "user_id": user_id,
+        "update_count": len(updates),
+    })
+    return _visible(await _stored(user_id))
+
+
+# -----------------------
+# Implicit interests
+# -----------------------
+async def promote_implicit_interest(user_id: str, keyword: str) -> dict:
+    """Turn an implicit interest into an explicit one (weight 1.0)."""
+    return await add_explicit_interest(user_id, keyword, weight=1.0)
+
+
+async def exclude_implicit_interest(user_id: str, keyword: str) -> dict:
+    """Hide an implicit interest now and from future rebuilds."""
+    update = {"$push": {"implicit_exclusions": keyword}, "$inc": {"profile_revision": 1}}
+    unset = {path: "" for path in _implicit_paths(keyword)}
+    if unset:
+        update["$unset"] = unset
+    profile = await _update(user_id, update, condition={"implicit_exclusions": {"$not": _keyword_regex(keyword)}})
+    # Already excluded: nothing to change
+    return profile or _visible(await _stored(user_id))
+
+
+async def remove_implicit_exclusion(user_id: str, keyword: str) -> dict:
+    """Stop excluding a keyword; its score returns with the next scheduled rebuild."""
+    return await _update(user_id, {
+        "$pull": {"implicit_exclusions": _keyword_regex(keyword)},
+        "$inc": {"profile_revision": 1},
+    })
+
+
+async def clear_implicit_interests(user_id: str) -> dict:
+    """Exclude every current implicit interest."""
+    for _attempt in range(MAX_CONFLICT_RETRIES):
+        stored = await _stored(user_id, {"_id": 0, "implicit_interests": 1, "implicit_exclusions": 1,
+                                         "profile_revision": 1})
+        if stored is None:
+            await build_user_profile_async(user_id)
+            continue
+        excluded = {e.lower() for e in stored.get("implicit_exclusions", []) or []}
+        new = []
+        for key in (stored.get("implicit_interests") or {}):
+            if key.lower() not in excluded:
+                new.append(key)
+                excluded.add(key.lower())
+        rev = {"profile_revision": stored.get("profile_revision", 0)} if "profile_revision" in stored else \
+            {"profile_revision": {"$exists": False}}
+        profile = await _update(user_id, {
+            "$push": {"implicit_exclusions": {"$each": new}},
+            "$set": {"implicit_interests": {}},
+            "$inc": {"profile_revision": 1},
+        }, condition=rev)
+        if profile is not None:
+            return profile
+
+    logger.warning("Clearing implicit interests kept conflicting; returning stored profile", extra={
+        "user_id": user_id,
+    })
+    return _visible(await _stored(user_id))
@@ -0,0 +1,172 @@
+"""backend/services/profiling.py
+
+Purpose
+-------
+Opt-in cProfile capture for live requests, so a slow /search can be
+explained in production without restarting under a profiler.
+
+How it works
+------------
+- `ProfilingMiddleware` is only installed when PROFILING_ENABLED=1, so a
+  disabled deployment pays nothing.
+- A request is profiled when it carries `X-Profile: <PROFILING_ADMIN_TOKEN>`,
+  or at random with probability PROFILING_SAMPLE_RATE.
+- cProfile can only run once per process at a time and, in an async server,
+  also sees other requests interleaved on the event loop. Profiles are
+  therefore taken one at a time (a request arriving while another is being
+  profiled is simply not profiled), and are best read with that in mind.
+- The pstats dump is written to PROFILING_DIR, which is bounded to
+  PROFILING_MAX_FILES (oldest deleted first). The response carries
+  `X-Profile-Id: <file name>`; api/profiling_routes.py lists and serves them.
+
+Env vars
+--------
+PROFILING_ENABLED
+    "1" to install the middleware and admin endpoints (default: "0").
+
+PROFILING_ADMIN_TOKEN
+    Secret for the X-Profile trigger header and the /admin/profiles endpoints.
+    Without it only sampling works and the endpoints reject every request.
+
+PROFILING_SAMPLE_RATE
+    Fraction of requests profiled without the header (default: 0).
+
+PROFILING_DIR / PROFILING_MAX_FILES
+    Where profiles are written and how many are kept (default: backend/logs/profiles, 50).
+"""
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from backend.services.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+PROFILING_ENABLED = (os.getenv("PROFILING_ENABLED", "0") or "0").strip() == "1"
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "") or ""
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", "") or Path(__file__).parent.parent / "logs" / "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "50"))
+
+PROFILE_HEADER = b"x-profile"
+_NAME_REGEX = re.compile(r"^[\w.-]+\.prof$")
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """Constant-time check against PROFILING_ADMIN_TOKEN (never true when unset)."""
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_ADMIN_TOKEN.encode())
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^\w]+", "_", path).strip("_")[:40] or "root"
+
+
+def list_profiles(directory: Path = None) -> List[dict]:
+    """Stored profiles, newest first."""
+    directory = directory or PROFILING_DIR
+    if not directory.is_dir():
+        return []
+    files = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [
+        {"name": p.name, "size_bytes": p.stat().st_size, "created": p.stat().st_mtime}
+        for p in files
+    ]
+
+
+def profile_path(name: str, directory: Path = None) -> Optional[Path]:
+    """Resolve a profile file name inside the profile directory (None if invalid or missing)."""
+    directory = directory or PROFILING_DIR
+    if not _NAME_REGEX.match(name or ""):
+        return None
+    path = directory / name
+    return path if path.is_file() else None
+
+
+def render_text(path: Path, limit: int = 50) -> str:
+    """Top functions by cumulative time, as pstats prints them."""
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _prune(directory: Path, max_files: int) -> None:
+    files = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+    for old in files[:max(0, len(files) - max_files)]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Profile selected requests with cProfile and store the pstats dump."""
+
+    def __init__(
+            self,
+            app,
+            directory: Path = None,
+            sample_rate: float = None,
+            max_files: int = None,
+    ):
+        self.app = app
+        self.directory = Path(directory or PROFILING_DIR)
+        self.sample_rate = PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_files = PROFILING_MAX_FILES if max_files is None else max_files
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        for key, value in scope.get("headers", []):
+            if key == PROFILE_HEADER:
+                return token_matches(value.decode("latin-1"))
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            # Another request is being profiled; cProfile cannot nest.
+            await self.app(scope, receive, send)
+            return
+
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope.get('method', '')}-{_slug(scope.get('path', ''))}-{uuid.uuid4().hex[:8]}.prof"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(b"x-profile-id", name.encode())]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profiler.disable()
+            self._save(profiler, name)
+        finally:
+            self._busy.release()
+
+    def _save(self, profiler: cProfile.Profile, name: str) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(self.directory / name))
+            _prune(self.directory, self.max_files)
+            logger.info("Request profile saved", extra={"profile": name})
+        except Exception as e:
+            logger.warning("Failed to save request profile", extra={"profile": name, "error": str(e)})
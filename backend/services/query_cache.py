@@ -1,42 +1,111 @@
 import os
+import re
 import time
-import logging
-from typing import Optional, Dict, Tuple
+import unicodedata
+from typing import Optional, Dict, Tuple, Any
+
+from backend.services.logger import AppLogger
+from backend.services.metrics import registry, query_cache_lookups, query_cache_evictions
 
 CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL", "3600"))  # default: 1 hour
+# TTL for fallback results written when the LLM call failed, so an outage is
+# not masked for a full CACHE_TTL_SECONDS once the backend recovers.
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_NEGATIVE_TTL", "30"))
+
+# Namespace for expansions that do not depend on the user (clarify_only prompts
+# contain no profile data), so they can be shared across users and prewarmed.
+SHARED_NAMESPACE = "_shared"
+# Verbosity only filters profile interests, so shared entries are keyed with
+# this placeholder: one (prewarmed) expansion serves every verbosity level.
+SHARED_VERBOSITY = "any"
+
+# When a canonical (filler-insensitive) cache hit may be reused:
+#   off          -> exact (normalized) matches only
+#   clarify_only -> reuse canonical hits for non-personalized expansions only
+#   always       -> reuse canonical hits for every semantic mode
+CANONICAL_POLICY = (os.getenv("QUERY_CACHE_CANONICAL_POLICY", "clarify_only") or "clarify_only").strip().lower()
 
-logger = logging.getLogger(__name__)
-if not logger.handlers:
-    import sys
+logger = AppLogger.get_logger(__name__)
+# Cache HIT/MISS/STORED lines fire on every search; they go through the
+# sampled, rate-limited hot-path logger (see LOG_SAMPLE_RATES / LOG_RATE_LIMIT_PER_SECOND).
+hot_logger = AppLogger.get_hot_path_logger(__name__)
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    ))
-    logger.addHandler(handler)
-logger.setLevel(logging.INFO)
-logger.propagate = False
+
+# Words that never change what a query asks for. Deliberately small: the
+# profile STOP_WORDS also drop negations, directions and words like
+# "tutorial" / "best", which would merge different searches.
+_FILLER_WORDS = {"a", "an", "the", "for", "of", "and", "please", "some", "my", "me", "i", "is", "are"}
+# Relational words whose meaning depends on word order ("to paris from london")
+_ORDER_WORDS = {
+    "to", "from", "in", "into", "on", "at", "by", "with", "without", "over", "under",
+    "before", "after", "than", "vs", "versus",
+}
 
 
 def _normalize_query(q: str) -> str:
     return " ".join((q or "").lower().split())
 
 
+def _canonicalize_query(q: str) -> str:
+    """
+    Filler-insensitive form of a query, used as a secondary cache key.
+
+    NFKC + casefold first (so full-width / ligature / case variants collapse),
+    then punctuation and _FILLER_WORDS are dropped and the remaining tokens
+    are sorted, so "python tutorial for beginners" and "Beginners: the Python
+    tutorial" share a key. Negations, numbers, 1-char tokens and content words
+    are kept ("recipes with no eggs" / "recipes with eggs", "iphone 15" /
+    "iphone 12", "best laptops" / "laptops" stay apart). When a query holds one
+    of _ORDER_WORDS, word order is kept too ("flights paris to london" /
+    "flights london to paris"). Returns "" when nothing meaningful is left.
+    """
+    text = unicodedata.normalize("NFKC", q or "").casefold()
+    tokens = [t for t in re.sub(r"[^\w\s]", " ", text).split() if t not in _FILLER_WORDS]
+    if not _ORDER_WORDS.intersection(tokens):
+        tokens = sorted(set(tokens))
+    return " ".join(tokens)
+
+
 class QueryCache:
     """
     In-memory cache for semantic expansions.
     Cache keys are namespaced by user_id to prevent cross-account
-    data leakage. Cache is cleared on logout.
+    data leakage. Cache is cleared on logout. Expansions whose prompt holds
+    no user data are stored under SHARED_NAMESPACE instead.
 
     Why caching helps:
     - Avoids repeated LLM calls for common queries (major speedup).
     - Reduces cost and CPU load on Ollama.
     - Allows instant replays during debugging or UI reloads.
+
+    Canonical tier:
+    - Besides the exact key, every write is also indexed under a canonical
+      (filler-insensitive) key, so punctuation / stopword variants of a query can
+      reuse an existing expansion instead of calling the LLM again.
+    - Whether a canonical hit may be served is controlled by `canonical_policy`.
+
+    Negative entries:
+    - Fallback results (LLM failed, seed returned as-is) are written with
+      `negative=True` and live only `negative_ttl` seconds. They are never
+      indexed in the canonical tier.
+
+    Insight:
+    - Each entry may carry the insight fields (personalization, model) that
+      produced it, so cache hits can return the same trace as the miss did.
     """
 
-    def __init__(self, ttl: int = CACHE_TTL_SECONDS):
+    def __init__(
+            self,
+            ttl: int = CACHE_TTL_SECONDS,
+            canonical_policy: str = CANONICAL_POLICY,
+            negative_ttl: int = NEGATIVE_CACHE_TTL_SECONDS,
+    ):
         self.ttl = ttl
-        self._store: Dict[str, Tuple[str, float]] = {}
+        self.canonical_policy = canonical_policy
+        self.negative_ttl = negative_ttl
+        # key -> (value, stored_at, ttl, negative, insight)
+        self._store: Dict[str, Tuple[str, float, float, bool, Optional[dict]]] = {}
+        self._canonical: Dict[str, Tuple[str, float, float, bool, Optional[dict]]] = {}
 
     def _make_key(
             self,
@@ -47,8 +116,9 @@ class QueryCache:
             semantic_mode: str,
             verbosity: str,
             profile_rev: int = 0,
+            canonical: bool = False,
     ) -> str:
-        norm_query = _normalize_query(query)
+        norm_query = _canonicalize_query(query) if canonical else _normalize_query(query)
         sem_mode = (semantic_mode or "clarify_only").lower()
         verb = (verbosity or "medium").lower()
 
@@ -59,15 +129,48 @@ class QueryCache:
             f"{sem_mode}:"
             f"{verb}:"
             f"rev{profile_rev}:"
+            f"{'canon:' if canonical else ''}"
             f"{norm_query}"
         )
 
+    def _canonical_allowed(self, semantic_mode: str) -> bool:
+        if self.canonical_policy == "always":
+            return True
+        if self.canonical_policy == "clarify_only":
+            return (semantic_mode or "clarify_only").lower() == "clarify_only"
+        return False
+
     def clear(self) -> None:
         size = len(self._store)
         logger.info("[Cache] CleARED %d entries", size)
+        query_cache_evictions.inc(size, reason="clear")
         self._store.clear()
+        self._canonical.clear()
 
-    def get(
+    def _fresh(
+            self,
+            store: Dict[str, Tuple[str, float, float, bool, Optional[dict]]],
+            key: str,
+    ) -> Optional[Tuple[str, float, bool, Optional[dict]]]:
+        """Return (value, age, negative, insight) for a non-expired entry, evicting it if expired."""
+        item = store.get(key)
+        if not item:
+            return None
+
+        value, ts, ttl, negative, insight = item
+        age = time.time() - ts
+
+        if age > ttl:
+            hot_logger.info(
+                "[Cache] EXPIRED key='%s' (age=%.1fs > ttl=%ds)",
+                key, age, ttl
+            )
+            store.pop(key, None)
+            query_cache_evictions.inc(reason="expired")
+            return None
+        return value, age, negative, insight
+
+    def lookup(
             self,
             user_id: str,
             query: str,
@@ -76,33 +179,91 @@ class QueryCache:
             semantic_mode: str,
             verbosity: str,
             profile_rev: int = 0,
-    ) -> Optional[str]:
+    ) -> Tuple[Optional[str], str]:
+        """
+        Like `get`, but also reports which tier answered:
+          ("...", "HIT")            exact normalized match
+          ("...", "NEGATIVE_HIT")   short-lived fallback stored after an LLM failure
+          ("...", "CANONICAL_HIT")  filler-insensitive match (policy permitting)
+          (None, "MISS")
+        """
+        value, tier, _insight = self.lookup_entry(
+            user_id, query, model, temp, semantic_mode, verbosity, profile_rev
+        )
+        return value, tier
+
+    def lookup_entry(
+            self,
+            user_id: str,
+            query: str,
+            model: str,
+            temp: float,
+            semantic_mode: str,
+            verbosity: str,
+            profile_rev: int = 0,
+    ) -> Tuple[Optional[str], str, Optional[Dict[str, Any]]]:
+        """Like `lookup`, plus the insight stored with the entry (or None)."""
+        value, tier, insight = self._lookup_entry(
+            user_id, query, model, temp, semantic_mode, verbosity, profile_rev
+        )
+        query_cache_lookups.inc(result=tier)
+        return value, tier, insight
+
+    def _lookup_entry(
+            self,
+            user_id: str,
+            query: str,
+            model: str,
+            temp: float,
+            semantic_mode: str,
+            verbosity: str,
+            profile_rev: int = 0,
+    ) -> Tuple[Optional[str], str, Optional[Dict[str, Any]]]:
         if not self.ttl:
-            logger.info("[Cache] Disabled (TTL=0)")
-            return None
+            hot_logger.info("[Cache] Disabled (TTL=0)")
+            return None, "MISS", None
 
         key = self._make_key(
             user_id, query, model, temp, semantic_mode, verbosity, profile_rev
         )
 
-        item = self._store.get(key)
-        if not item:
-            logger.info("[Cache] MISS for key='%s'", key)
-            return None
+        found = self._fresh(self._store, key)
+        if found:
+            value, age, negative, insight = found
+            if negative:
+                hot_logger.info("[Cache] NEGATIVE HIT key='%s' (age=%.1fs)", key, age)
+                return value, "NEGATIVE_HIT", insight
+            hot_logger.info("[Cache] HIT key='%s' (age=%.1fs)", key, age)
+            return value, "HIT", insight
 
-        value, ts = item
-        age = time.time() - ts
-
-        if age > self.ttl:
-            logger.info(
-                "[Cache] EXPIRED key='%s' (age=%.1fs > ttl=%ds)",
-                key, age, self.ttl
+        if self._canonical_allowed(semantic_mode) and _canonicalize_query(query):
+            canon_key = self._make_key(
+                user_id, query, model, temp, semantic_mode, verbosity, profile_rev, canonical=True
             )
-            self._store.pop(key, None)
-            return None
+            found = self._fresh(self._canonical, canon_key)
+            if found:
+                value, age, _negative, insight = found
+                hot_logger.info("[Cache] CANONICAL HIT key='%s' (age=%.1fs)", canon_key, age)
+                return value, "CANONICAL_HIT", insight
+
+        hot_logger.info("[Cache] MISS for key='%s'", key)
+        return None, "MISS", None
 
-        logger.info("[Cache] HIT key='%s' (age=%.1fs)", key, age)
+    def get(
+            self,
+            user_id: str,
+            query: str,
+            model: str,
+            temp: float,
+            semantic_mode: str,
+            verbosity: str,
+            profile_rev: int = 0,
+    ) -> Optional[str]:
+        value, _tier = self.lookup(
+            user_id, query, model, temp, semantic_mode, verbosity, profile_rev
+        )
         return value
+
     def set(
             self,
             user_id: str,
@@ -113,15 +274,36 @@ class QueryCache:
             verbosity: str,
             expanded: str,
             profile_rev: int = 0,
+            negative: bool = False,
+            insight: Optional[Dict[str, Any]] = None,
     ) -> None:
         if not self.ttl:
-            logger.info("[Cache] Skipped write (TTL=0)")
+            hot_logger.info("[Cache] Skipped write (TTL=0)")
             return
 
         self.key = self._make_key(user_id, query, model, temp, semantic_mode, verbosity, profile_rev)
         key = self.key
 
-        self._store[key] = (expanded, time.time())
-        logger.info("[Cache] STORED key='%s'", key)
+        now = time.time()
+        if negative:
+            ttl = min(self.negative_ttl, self.ttl)
+            if ttl <= 0:
+                hot_logger.info("[Cache] Skipped negative write (NEGATIVE_TTL=0) key='%s'", key)
+                return
+            self._store[key] = (expanded, now, ttl, True, insight)
+            hot_logger.info("[Cache] STORED negative key='%s' (ttl=%ds)", key, ttl)
+            return
+
+        self._store[key] = (expanded, now, self.ttl, False, insight)
+        hot_logger.info("[Cache] STORED key='%s'", key)
+
+        if self._canonical_allowed(semantic_mode) and _canonicalize_query(query):
+            canon_key = self._make_key(
+                user_id, query, model, temp, semantic_mode, verbosity, profile_rev, canonical=True
+            )
+            self._canonical[canon_key] = (expanded, now, self.ttl, False, insight)
 
 query_cache = QueryCache()
+
+registry.gauge("query_cache_entries", "Entries in the expansion cache (exact tier).",
+               callback=lambda: len(query_cache._store))
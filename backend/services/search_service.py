@@ -1,6 +1,11 @@
+import asyncio
+
 from backend.services.google_api import search_google
 from backend.services.user_profile_service import preprocess, normalize_url
 from backend.services.db import user_profiles_col
+from backend.services.async_db import async_user_profiles_col
+from backend.services.guest_sessions import is_guest
+from backend.services.tracing import span
 from backend.services.logger import AppLogger
 
 logger = AppLogger.get_logger(__name__)
@@ -42,38 +47,91 @@ def _score_result(result: dict, profile: dict):
     return base
 
 
-def search(query: str, user_id: str = None):
+def search(query: str, user_id: str = None, session_profile: dict = None):
     """
     Search pipeline:
     - proxy to Google Custom Search
     - optionally re-rank ONLY the top N results using the user's profile
+      (for guests: only their in-memory `session_profile`, never a stored profile)
+    """
+    _log_search_started(query, user_id)
+    with span("google"):
+        results = search_google(query)
+    _log_google_results(query, results)
+
+    profile = None
+    if not is_guest(user_id):
+        # Fetch cached profile from DB (no rebuild to reduce overhead)
+        try:
+            with span("profile_fetch"):
+                profile = user_profiles_col.find_one({"user_id": user_id})
+        except Exception as e:
+            _log_profile_fetch_failure(user_id, e)
+
+    return _personalize(results, query, user_id, profile, session_profile)
+
+
+async def search_async(query: str, user_id: str = None, session_profile: dict = None):
     """
+    Async version of search() for request handlers: the profile is read via
+    the async client, and the blocking Google HTTP call runs in a worker
+    thread so the event loop keeps serving other requests.
+    """
+    _log_search_started(query, user_id)
+    with span("google"):
+        results = await asyncio.to_thread(search_google, query)
+    _log_google_results(query, results)
+
+    profile = None
+    if not is_guest(user_id):
+        try:
+            with span("profile_fetch"):
+                profile = await async_user_profiles_col.find_one({"user_id": user_id})
+        except Exception as e:
+            _log_profile_fetch_failure(user_id, e)
+
+    return _personalize(results, query, user_id, profile, session_profile)
+
+
+# Shared, I/O-free halves of search() and search_async().
+
+def _log_search_started(query: str, user_id: str = None) -> None:
     logger.debug("Search initiated", extra={
         "user_id": user_id,
         "query": query
     })
 
-    results = search_google(query)
+
+def _log_google_results(query: str, results: list) -> None:
     logger.debug("Google API results received", extra={
         "query": query,
         "result_count": len(results)
     })
 
-    # No personalization without a user
-    if not user_id:
-        logger.debug("Skipping personalization: no user_id", extra={"query": query})
-        return results
 
-    # Fetch cached profile from DB (no rebuild to reduce overhead)
-    try:
-        profile = user_profiles_col.find_one({"user_id": user_id})
-    except Exception as e:
-        logger.warning("Failed to fetch user profile", extra={
-            "user_id": user_id,
-            "error": str(e)
-        })
-        profile = None
+def _log_profile_fetch_failure(user_id: str, error: Exception) -> None:
+    logger.warning("Failed to fetch user profile", extra={
+        "user_id": user_id,
+        "error": str(error)
+    })
+
+
+def _personalize(results: list, query: str, user_id: str = None, stored_profile: dict = None,
+                 session_profile: dict = None):
+    """
+    Rerank `results` for the caller: guests share one user id, so only their
+    own `session_profile` may personalize; signed-in users use their stored profile.
+    """
+    if is_guest(user_id):
+        if not session_profile:
+            logger.debug("Skipping personalization: guest without session profile", extra={"query": query})
+            return results
+        return _rerank(results, session_profile, user_id)
+    return _rerank(results, stored_profile, user_id)
+
 
+def _rerank(results: list, profile: dict, user_id: str = None):
+    """Re-rank the top RERANK_TOP_N results against `profile`; the tail is untouched."""
     if not profile:
         logger.debug("No profile found, returning unranked results", extra={"user_id": user_id})
         return results
@@ -82,17 +140,18 @@ def search(query: str, user_id: str = None):
     head = results[:RERANK_TOP_N]
     tail = results[RERANK_TOP_N:]
 
-    scored = []
-    for idx, r in enumerate(head):
-        # positional bias within head only
-        pos_score = max(0.0, (len(head) - idx)) / max(1.0, len(head))
-        personal_score = _score_result(r, profile)
-        total = pos_score + personal_score
-        scored.append((total, r))
-
-    # sort by total descending
-    scored.sort(key=lambda x: -x[0])
-    reranked_head = [r for (_s, r) in scored]
+    with span("rerank"):
+        scored = []
+        for idx, r in enumerate(head):
+            # positional bias within head only
+            pos_score = max(0.0, (len(head) - idx)) / max(1.0, len(head))
+            personal_score = _score_result(r, profile)
+            total = pos_score + personal_score
+            scored.append((total, r))
+
+        # sort by total descending
+        scored.sort(key=lambda x: -x[0])
+        reranked_head = [r for (_s, r) in scored]
 
     final_results = reranked_head + tail
 
@@ -22,16 +22,40 @@ Design principles
 """
 
 from __future__ import annotations
+import asyncio
+import copy
+import heapq
+import itertools
 import os
 import re
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from backend.services.interest_selection import select_interests
 
 import httpx
 import unicodedata
 
-from backend.services.query_cache import query_cache
-from backend.services.db import user_profiles_col
+from backend.services.query_cache import query_cache, SHARED_NAMESPACE, SHARED_VERBOSITY
+from backend.services.personalization_context import personalization_cache, context_key
+from backend.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from backend.services.ollama_pool import OllamaPool, parse_endpoints, OLLAMA_URLS
+from backend.services.expansion_gate import should_expand
+from backend.services.model_router import route_model, is_degenerate, MODEL_LARGE
+from backend.services.async_db import async_user_profiles_col
+from backend.services.tracing import span
+from backend.services.metrics import (
+    ollama_request_duration,
+    ollama_errors,
+    llm_queue_wait,
+    llm_queue_depth,
+    llm_active_calls,
+    llm_shed,
+    llm_queue_dropped,
+    circuit_breaker_state,
+    ollama_endpoint_outstanding,
+    ollama_endpoint_ejected,
+)
 from backend.services.logger import AppLogger
 
 logger = AppLogger.get_logger(__name__)
@@ -54,6 +78,32 @@ MAX_SYSTEM_PROMPT_CHARS = int(os.getenv("SE_MAX_SYSTEM_PROMPT_CHARS", "1200"))
 MAX_USER_PROMPT_CHARS = int(os.getenv("SE_MAX_USER_PROMPT_CHARS", "600"))
 # time out for ollama response
 TIME_OUT = 60
+# Per-request latency budget for expansion. When exceeded, /search proceeds with
+# the raw query and the in-flight LLM call finishes in the background, filling
+# the cache for the next identical search. 0 disables the budget (wait up to TIME_OUT).
+EXPANSION_BUDGET_MS = int(os.getenv("SE_EXPANSION_BUDGET_MS", "400"))
+
+# LLM scheduler: at most this many Ollama calls run at once; the rest queue by priority.
+LLM_MAX_CONCURRENCY = int(os.getenv("SE_LLM_MAX_CONCURRENCY", "2"))
+# Queued calls older than this are dropped instead of being sent to Ollama.
+LLM_QUEUE_DEADLINE_MS = int(os.getenv("SE_LLM_QUEUE_DEADLINE_MS", "10000"))
+# When this many calls are already waiting, new searches skip expansion
+# (same as use_enhanced=False). 0 disables shedding.
+LLM_SHED_QUEUE_DEPTH = int(os.getenv("SE_LLM_SHED_QUEUE_DEPTH", "8"))
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREWARM = 10
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_PREWARM: "prewarm"}
+
+# Ollama hosts (OLLAMA_URLS, or just OLLAMA_URL); calls go to the least-loaded healthy one.
+ollama_pool = OllamaPool(parse_endpoints(OLLAMA_URLS, OLLAMA_URL))
+# With several hosts, a failed call is retried once on a different host.
+OLLAMA_MAX_ATTEMPTS = min(2, len(ollama_pool))
+
+# Trips after repeated Ollama failures so requests fall back to the raw query
+# immediately instead of each waiting up to TIME_OUT on a dead backend.
+ollama_breaker = CircuitBreaker("ollama")
 # NOTE/TODO:
 # User interests are provided as a soft bias signal only.
 # The system prompt explicitly instructs the LLM not to infer or invent
@@ -341,6 +391,400 @@ def _strip_wrapping_quotes(text: str) -> str:
     return text
 
 
+# -----------------------
+# Personalization context
+# -----------------------
+def _prompt_uses_profile(semantic_mode: str, user_id: Optional[str], verbosity: str) -> bool:
+    """
+    True when the system prompt depends on the user's profile: personalized
+    mode, a signed-in user and a verbosity that lets interests through.
+    """
+    if semantic_mode != "clarify_and_personalize":
+        return False
+    if not user_id or user_id == "guest":
+        return False
+    return (verbosity or "medium").lower() != "off"
+
+
+# Trace fields produced by personalization (also stored with cache entries).
+_PERSONALIZATION_TRACE_FIELDS = ("personalization_snippet", "top_explicit", "top_implicit", "used_interests")
+
+
+def _build_personalization_context(profile: dict, user_id: str, seed: str, verbosity: str) -> dict:
+    """
+    Select the user's interests for this expansion and format the snippet.
+
+    Returns the personalization trace fields (see _PERSONALIZATION_TRACE_FIELDS).
+    """
+    explicit_map = _extract_explicit(profile)
+    implicit_map = _extract_implicit(profile)
+
+    # ---- NEW: Pluggable interest selection algorithm ----
+    top_explicit, top_implicit = select_interests(
+        explicit_map,
+        implicit_map,
+        TOP_K_EXPLICIT,
+        TOP_K_IMPLICIT,
+        user_id,
+        seed,
+    )
+
+    # Reduce maps to selected interests only
+    selected_explicit = {k: explicit_map[k] for k in top_explicit if k in explicit_map}
+    selected_implicit = {k: implicit_map[k] for k in top_implicit if k in implicit_map}
+
+    # Normalize verbosity
+    verbosity = (verbosity or "medium").lower()
+    if verbosity not in {"off", "low", "medium", "high"}:
+        verbosity = "medium"
+
+    # Tier classification + verbosity filtering
+    explicit_tiers = _filter_tiers_by_verbosity(_classify_explicit(selected_explicit), verbosity)
+    implicit_tiers = _filter_tiers_by_verbosity(_classify_implicit(selected_implicit), verbosity)
+
+    return {
+        "personalization_snippet": _format_personalization_snippet(explicit_tiers, implicit_tiers),
+        "top_explicit": [{"interest": k, "score": explicit_map[k]} for k in top_explicit],
+        "top_implicit": [{"interest": k, "score": implicit_map[k]} for k in top_implicit],
+        "used_interests": {"explicit": explicit_tiers, "implicit": implicit_tiers},
+    }
+
+
+# -----------------------
+# LLM request scheduler
+# -----------------------
+class SchedulerDeadlineExceeded(Exception):
+    """Raised to a queued caller whose deadline passed before it got a slot."""
+
+
+class LLMScheduler:
+    """
+    Bounded-concurrency, priority-ordered gate in front of the LLM backend.
+
+    - At most `max_concurrency` calls run at once; further callers wait in a
+      heap ordered by (priority, arrival).
+    - A waiter whose deadline has passed when its turn comes is dropped with
+      SchedulerDeadlineExceeded rather than sent to Ollama.
+    - `should_shed()` tells callers to skip the LLM entirely while the queue
+      is deeper than `shed_queue_depth`.
+
+    Single event loop only (like the rest of the request path).
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = LLM_MAX_CONCURRENCY,
+            shed_queue_depth: int = LLM_SHED_QUEUE_DEPTH,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.shed_queue_depth = shed_queue_depth
+        self._active = 0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+
+        # metrics
+        self._started = 0
+        self._dropped_stale = 0
+        self._shed = 0
+        self._wait_ms = deque(maxlen=500)
+        self._max_wait_ms = 0.0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._heap)
+
+    def is_idle(self) -> bool:
+        return self._active < self.max_concurrency and not self._heap
+
+    def should_shed(self) -> bool:
+        if 0 < self.shed_queue_depth <= self.queue_depth:
+            self._shed += 1
+            llm_shed.inc()
+            return True
+        return False
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_ms)
+        return {
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "started": self._started,
+            "dropped_stale": self._dropped_stale,
+            "shed": self._shed,
+            "wait_ms_p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+            "wait_ms_max": round(self._max_wait_ms, 2),
+        }
+
+    def _record_wait(self, enqueued_at: float, priority: int) -> None:
+        waited = (time.monotonic() - enqueued_at) * 1000
+        llm_queue_wait.observe(waited / 1000, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+        self._started += 1
+        self._wait_ms.append(waited)
+        self._max_wait_ms = max(self._max_wait_ms, waited)
+        if waited > 0:
+            logger.debug(
+                "[LLMScheduler] slot granted after %.1fms (active=%d, queued=%d)",
+                waited, self._active, self.queue_depth,
+            )
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._heap and self._active < self.max_concurrency:
+            _prio, _seq, deadline, _enq, fut = heapq.heappop(self._heap)
+            if fut.done():
+                # waiter went away (cancelled)
+                continue
+            if deadline is not None and now > deadline:
+                self._dropped_stale += 1
+                llm_queue_dropped.inc()
+                fut.set_exception(SchedulerDeadlineExceeded())
+                continue
+            self._active += 1
+            fut.set_result(None)
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    async def _acquire(self, priority: int, deadline: Optional[float]) -> None:
+        enqueued_at = time.monotonic()
+        if self.is_idle():
+            self._active += 1
+            self._record_wait(enqueued_at, priority)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), deadline, enqueued_at, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Slot was granted just before we were cancelled: hand it on.
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self._release()
+            raise
+        self._record_wait(enqueued_at, priority)
+
+    async def run(
+            self,
+            call: Callable[[], Awaitable],
+            priority: int = PRIORITY_INTERACTIVE,
+            deadline: Optional[float] = None,
+    ):
+        """
+        Run `call()` once a slot is free. `deadline` is a time.monotonic()
+        value after which the call is dropped if it is still queued.
+        """
+        await self._acquire(priority, deadline)
+        try:
+            return await call()
+        finally:
+            self._release()
+
+
+llm_scheduler = LLMScheduler()
+
+
+
+def _breaker_states() -> dict:
+    current = ollama_breaker.state
+    return {(ollama_breaker.name, state): int(state == current) for state in (CLOSED, OPEN, HALF_OPEN)}
+
+
+# Scrape-time gauges over the module singletons (services/metrics.py)
+llm_queue_depth.set_function(lambda: llm_scheduler.queue_depth)
+llm_active_calls.set_function(lambda: llm_scheduler.active)
+circuit_breaker_state.set_function(_breaker_states)
+ollama_endpoint_outstanding.set_function(lambda: {(e["url"],): e["outstanding"] for e in ollama_pool.stats()})
+ollama_endpoint_ejected.set_function(lambda: {(e["url"],): int(e["ejected"]) for e in ollama_pool.stats()})
+
+
+# -----------------------
+# LLM call + deferred cache fill
+# -----------------------
+# In-flight expansions keyed like the cache, so concurrent identical searches
+# share one LLM call instead of each starting their own.
+_inflight: Dict[tuple, asyncio.Task] = {}
+# Strong references to expansions that outlived their request's budget.
+_background: Set[asyncio.Task] = set()
+
+
+async def _post_generate(payload: dict) -> dict:
+    """
+    POST the generate payload to the least-loaded Ollama endpoint serving
+    payload["model"], retrying on another endpoint if one fails. An endpoint
+    with a pinned model overrides payload["model"]. Raises the last error if every attempt fails.
+    """
+    tried = ()
+    last_error: Optional[Exception] = None
+    for _ in range(OLLAMA_MAX_ATTEMPTS):
+        start = time.perf_counter()
+        endpoint = None
+        try:
+            with ollama_pool.lease(exclude=tried, model=payload.get("model")) as endpoint:
+                tried = tried + (endpoint,)
+                body = dict(payload, model=endpoint.model) if endpoint.model else payload
+                async with httpx.AsyncClient(timeout=TIME_OUT) as client:
+                    resp = await client.post(f"{endpoint.url}/api/generate", json=body)
+                resp.raise_for_status()
+                data = resp.json()
+            ollama_request_duration.observe(time.perf_counter() - start, endpoint=endpoint.url, outcome="ok")
+            return data
+        except Exception as e:
+            if endpoint is not None:
+                ollama_request_duration.observe(time.perf_counter() - start, endpoint=endpoint.url, outcome="error")
+                ollama_errors.inc(endpoint=endpoint.url)
+            last_error = e
+            if len(tried) < OLLAMA_MAX_ATTEMPTS:
+                logger.warning("Ollama call to %s failed (%s), retrying on another endpoint", tried[-1].url, e)
+    raise last_error
+
+
+async def _call_ollama(payload: dict, seed: str) -> str:
+    """
+    Call Ollama and clean up the single-line response. The result may be
+    empty; the caller decides what to do with a degenerate answer.
+    Raises on transport/HTTP errors.
+    """
+    data = await _post_generate(payload)
+
+    raw = (data.get("response") or "").strip()
+
+    # collapse whitespace first
+    collapsed = " ".join(raw.split())
+
+    # normalize to NFC for characters like é
+    normalized = unicodedata.normalize("NFC", collapsed)
+
+    # remove wrapping quotes if present
+    return _strip_wrapping_quotes(normalized)
+
+
+def _queue_deadline() -> Optional[float]:
+    """time.monotonic() deadline for one trip through the LLM queue (None: no limit)."""
+    return time.monotonic() + LLM_QUEUE_DEADLINE_MS / 1000 if LLM_QUEUE_DEADLINE_MS > 0 else None
+
+
+async def _expand_and_cache(
+        payload: dict,
+        seed: str,
+        cache_args: tuple,
+        priority: int = PRIORITY_INTERACTIVE,
+        insight: Optional[dict] = None,
+) -> Tuple[str, Optional[str], dict]:
+    """
+    Run the LLM call through the scheduler, update the circuit breaker and
+    write the result to the cache. A degenerate answer from the small model
+    is retried once on MODEL_LARGE, with a queue deadline of its own; a final
+    answer that is still empty or degenerate falls back to the seed
+    ("empty_output" / "degenerate_output") and is cached as a negative entry.
+
+    `insight` holds the trace fields that describe how the prompt was built
+    (personalization); it is stored with the cache entry so hits can report it.
+
+    Returns (expanded_query, fallback_reason, insight); fallback_reason is
+    None on success and insight gains `model` / `model_fallback`.
+    Never raises: failures fall back to the seed.
+    """
+    model = payload["model"]
+    try:
+        expanded = await llm_scheduler.run(
+            lambda: _call_ollama(payload, seed),
+            priority=priority,
+            deadline=_queue_deadline(),
+        )
+        ollama_breaker.record_success()
+        if model != MODEL_LARGE and is_degenerate(expanded, seed):
+            logger.info("Model %s gave a degenerate expansion for seed='%s', retrying with %s", model, seed, MODEL_LARGE)
+            model = MODEL_LARGE
+            large_payload = dict(payload, model=MODEL_LARGE)
+            expanded = await llm_scheduler.run(
+                lambda: _call_ollama(large_payload, seed),
+                priority=priority,
+                deadline=_queue_deadline(),
+            )
+            ollama_breaker.record_success()
+        fallback_reason = None
+        if not expanded:
+            logger.warning("Model %s returned an empty expansion, using original seed='%s'", model, seed)
+            expanded = seed
+            fallback_reason = "empty_output"
+        elif is_degenerate(expanded, seed):
+            logger.warning("Model %s gave a degenerate expansion, using original seed='%s'", model, seed)
+            expanded = seed
+            fallback_reason = "degenerate_output"
+    except SchedulerDeadlineExceeded:
+        # Not a backend failure: nothing to cache, but a half-open probe that
+        # never reached Ollama must give its slot back.
+        ollama_breaker.release_probe()
+        logger.info("Query expansion dropped after waiting %dms in LLM queue, seed='%s'", LLM_QUEUE_DEADLINE_MS, seed)
+        return seed, "queue_deadline", dict(insight or {}, model=model, model_fallback=False)
+    except asyncio.CancelledError:
+        ollama_breaker.release_probe()
+        raise
+    except Exception as e:
+        logger.warning("Query expansion failed, using original seed='%s', error=%s", seed, e)
+        expanded = seed
+        fallback_reason = "llm_error"
+        ollama_breaker.record_failure()
+
+    insight = dict(insight or {}, model=model, model_fallback=model != payload["model"])
+
+    # ---------------- Cache result ----------------
+    # Fallbacks are cached only briefly (negative TTL) so recovery is visible quickly.
+    # Keyed by the routed model, even when the large model answered instead.
+    user_id, semantic_mode, verbosity, profile_rev, routed_model = cache_args
+    try:
+        query_cache.set(
+            user_id, seed, routed_model, OLLAMA_TEMP, semantic_mode, verbosity, expanded, profile_rev,
+            negative=fallback_reason is not None,
+            insight=insight,
+        )
+    except Exception:
+        logger.exception("Failed to write expansion result to cache.")
+
+    return expanded, fallback_reason, insight
+
+
+def _start_expansion(
+        key: tuple,
+        payload: dict,
+        seed: str,
+        cache_args: tuple,
+        priority: int = PRIORITY_INTERACTIVE,
+        insight: Optional[dict] = None,
+) -> asyncio.Task:
+    task = asyncio.ensure_future(_expand_and_cache(payload, seed, cache_args, priority, insight))
+    _inflight[key] = task
+
+    def _done(t: asyncio.Task) -> None:
+        if _inflight.get(key) is t:
+            _inflight.pop(key, None)
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def _await_within_budget(task: asyncio.Task, budget_ms: int) -> Optional[Tuple[str, Optional[str], dict]]:
+    """
+    Wait for `task` up to `budget_ms`. Returns its result, or None if the
+    budget ran out; in that case the task keeps running in the background.
+    """
+    if budget_ms <= 0:
+        return await task
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=budget_ms / 1000)
+    except asyncio.TimeoutError:
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+        return None
+
+
 # -----------------------
 # Main expansion entrypoint
 # -----------------------
@@ -349,6 +793,7 @@ async def expand_query(
         user_id: str,
         verbosity: str = "medium",
         semantic_mode: str = "clarify_only",
+        priority: int = PRIORITY_INTERACTIVE,
 ) -> dict:
     """
     Expand the user's `seed` query using the configured LLM, optionally biasing
@@ -360,16 +805,22 @@ async def expand_query(
       - medium → strong explicit + top implicit
       - high   → all explicit + all implicit
 
+    `priority` orders the call in the LLM scheduler queue: PRIORITY_INTERACTIVE
+    for user searches (latency budgeted), PRIORITY_PREWARM for background work
+    (waits for the result).
+
     Steps:
       1. Normalize and truncate seed query.
-      2. Return cached expansion (if present).
-      3. If user_id provided and profile exists:
+      2. Skip expansion for queries the pre-expansion gate rejects.
+      3. Return cached expansion (if present).
+      4. If user_id provided and profile exists (memoized per profile revision):
            - extract explicit + implicit interests
            - take top-K lists
            - filter interests according to verbosity
            - create personalization snippet
-      4. Build system prompt and call LLM
-      5. Cache result and return
+      5. Build system prompt and call LLM (bounded by EXPANSION_BUDGET_MS;
+         on overrun the seed is returned and the call finishes in the background)
+      6. Cache result and return
 
     Returns:
       both the expanded query and an insight object for frontend transparency.
@@ -378,6 +829,9 @@ async def expand_query(
     semantic_mode = (semantic_mode or "clarify_only").lower()
 #     logger.info(semantic_mode)
 
+    # Only interactive searches are latency-budgeted; background work waits.
+    budget_ms = EXPANSION_BUDGET_MS if priority == PRIORITY_INTERACTIVE else 0
+
     if semantic_mode not in {"clarify_only", "clarify_and_personalize"}:
         semantic_mode = "clarify_only"
 
@@ -392,18 +846,17 @@ async def expand_query(
     if not seed:
         return {"expanded_query": seed, "insight": {"original_query": "", "semantic_mode": semantic_mode}}
 
-    profile_rev = 0
-    if user_id:
-        prof = user_profiles_col.find_one({"user_id": user_id}, {"profile_revision": 1})
-        if prof:
-            profile_rev = int(prof.get("profile_revision", 0))
-
     trace = {
         "original_query": seed,
         "semantic_mode": semantic_mode,
         "verbosity": verbosity,
         "personalization_snippet": "",
         "cache_status": "MISS",
+        "fallback_reason": None,
+        "gate_decision": None,
+        "model": None,
+        "model_route_reason": None,
+        "model_fallback": False,
         "expanded_query": "",
         "top_explicit": [],
         "top_implicit": [],
@@ -413,92 +866,121 @@ async def expand_query(
         },
     }
 
+    # ---------------- Pre-expansion gate ----------------
+    # URLs, quoted phrases, navigational / very long / keyword-dense queries
+    # gain nothing from the LLM: skip it before any DB or cache work.
+    expand, gate_reason = should_expand(seed)
+    trace["gate_decision"] = gate_reason
+    if not expand:
+        logger.info("Expansion gate skipped seed='%s' (reason=%s)", seed, gate_reason)
+        trace["cache_status"] = "BYPASS"
+        trace["fallback_reason"] = "gate"
+        trace["expanded_query"] = seed
+        return {"expanded_query": seed, "insight": trace}
+
+    # Fast path: clarify_only, guests and verbosity "off" build a prompt with
+    # no user data, so skip the profile read entirely and cache the expansion
+    # once for everyone (it can be prewarmed) under a shared namespace. Such a
+    # prompt ignores verbosity too, so it is left out of the shared key.
+    uses_profile = _prompt_uses_profile(semantic_mode, user_id, verbosity)
+
+    profile_rev = 0
+    if uses_profile:
+        with span("expand.profile_rev"):
+            prof = await async_user_profiles_col.find_one({"user_id": user_id}, {"profile_revision": 1})
+        if prof:
+            profile_rev = int(prof.get("profile_revision", 0))
+        cache_user, cache_rev, cache_verbosity = user_id, profile_rev, verbosity
+    else:
+        cache_user, cache_rev, cache_verbosity = SHARED_NAMESPACE, 0, SHARED_VERBOSITY
+
+    # Easy queries go to the small model, hard / personalized ones to the large one.
+    model, route_reason = route_model(seed, semantic_mode)
+    trace["model"] = model
+    trace["model_route_reason"] = route_reason
 
     # ---------------- Cache check ----------------
-    cached = query_cache.get(
-        user_id,
-        seed,
-        OLLAMA_MODEL,
-        OLLAMA_TEMP,
-        semantic_mode,
-        verbosity,
-        profile_rev,
-    )
+    # Exact match first, then the canonical (filler-insensitive) tier if the cache
+    # policy allows it for this mode.
+    with span("expand.cache"):
+        cached, cache_status, cached_insight = query_cache.lookup_entry(
+            cache_user,
+            seed,
+            model,
+            OLLAMA_TEMP,
+            semantic_mode,
+            cache_verbosity,
+            cache_rev,
+        )
 
     if cached:
+        if cached_insight:
+            trace.update(copy.deepcopy(cached_insight))
         trace["expanded_query"] = cached
-        trace["cache_status"] = "HIT"
+        trace["cache_status"] = cache_status
         return {"expanded_query": cached, "insight": trace}
 
+    # ---------------- In-flight dedupe ----------------
+    # An identical expansion is already running (possibly deferred from an
+    # earlier request): wait on it within this request's budget.
+    inflight_key = (cache_user, _normalize_single_line(seed).lower(), model, semantic_mode, cache_verbosity, cache_rev)
+    inflight = _inflight.get(inflight_key)
+    if inflight is not None:
+        trace["cache_status"] = "INFLIGHT"
+        with span("expand.llm"):
+            outcome = await _await_within_budget(inflight, budget_ms)
+        if outcome is None:
+            trace["fallback_reason"] = "latency_budget"
+            trace["expanded_query"] = seed
+            return {"expanded_query": seed, "insight": trace}
+        trace["expanded_query"], trace["fallback_reason"], insight = outcome
+        trace.update(copy.deepcopy(insight))
+        return {"expanded_query": outcome[0], "insight": trace}
+
+    # ---------------- Load shedding ----------------
+    # LLM queue is already backed up: behave like use_enhanced=False.
+    if llm_scheduler.should_shed():
+        logger.warning(
+            "[LLMScheduler] shedding expansion (queue_depth=%d >= %d), using original seed='%s'",
+            llm_scheduler.queue_depth, LLM_SHED_QUEUE_DEPTH, seed,
+        )
+        trace["cache_status"] = "BYPASS"
+        trace["fallback_reason"] = "load_shed"
+        trace["expanded_query"] = seed
+        return {"expanded_query": seed, "insight": trace}
+
+    # ---------------- Circuit breaker ----------------
+    # Backend is known to be down: skip prompt building and the HTTP call.
+    if not ollama_breaker.allow_request():
+        logger.info("[Breaker] ollama open, using original seed='%s'", seed)
+        trace["cache_status"] = "BYPASS"
+        trace["fallback_reason"] = "circuit_open"
+        trace["expanded_query"] = seed
+        return {"expanded_query": seed, "insight": trace}
+
     # ---------------- Personalization ----------------
     system_prompt = SYSTEM_PROMPT_CLARIFY_ONLY
-    logger.info("using SYSTEM_PROMPT_CLARIFY_ONLY.")
+    logger.debug("using SYSTEM_PROMPT_CLARIFY_ONLY.")
 
     if semantic_mode == "clarify_and_personalize":
         system_prompt = SYSTEM_PROMPT_CLARIFY_AND_PERSONALIZE
-        logger.info("using SYSTEM_PROMPT_CLARIFY_AND_PERSONALIZE.")
+        logger.debug("using SYSTEM_PROMPT_CLARIFY_AND_PERSONALIZE.")
         try:
-            if user_id:
-                profile = user_profiles_col.find_one({"user_id": user_id})
-                if profile:
-                    explicit_map = _extract_explicit(profile)
-                    implicit_map = _extract_implicit(profile)
-
-                    # ---- NEW: Pluggable interest selection algorithm ----
-                    top_explicit, top_implicit = select_interests(
-                        explicit_map,
-                        implicit_map,
-                        TOP_K_EXPLICIT,
-                        TOP_K_IMPLICIT,
-                        user_id,
-                        seed,
-                    )
-
-                    trace["top_explicit"] = [
-                        {"interest": k, "score": explicit_map[k]} for k in top_explicit
-                    ]
-                    trace["top_implicit"] = [
-                        {"interest": k, "score": implicit_map[k]} for k in top_implicit
-                    ]
-
-                    # Reduce maps to selected interests only
-                    explicit_map = {
-                        k: explicit_map[k]
-                        for k in top_explicit
-                        if k in explicit_map
-                    }
-                    implicit_map = {
-                        k: implicit_map[k]
-                        for k in top_implicit
-                        if k in implicit_map
-                    }
-
-                    # Normalize verbosity
-                    verbosity = (verbosity or "medium").lower()
-                    if verbosity not in {"off", "low", "medium", "high"}:
-                        verbosity = "medium"
-
-                    # Tier classification
-                    explicit_tiers = _classify_explicit(explicit_map)
-                    implicit_tiers = _classify_implicit(implicit_map)
-
-                    # Verbosity filtering
-                    explicit_tiers = _filter_tiers_by_verbosity(explicit_tiers, verbosity)
-                    implicit_tiers = _filter_tiers_by_verbosity(implicit_tiers, verbosity)
-
-                    # Build personalization snippet
-                    snippet = _format_personalization_snippet(
-                        explicit_tiers,
-                        implicit_tiers,
-                    )
-
-                    trace["used_interests"] = {
-                        "explicit": explicit_tiers,
-                        "implicit": implicit_tiers,
-                    }
-
-                    trace["personalization_snippet"] = snippet
-
+            if uses_profile:
+                # The context only changes with the profile revision, so it is
+                # memoized instead of re-selecting and re-formatting interests.
+                ctx_key = context_key(user_id, profile_rev, verbosity, semantic_mode, seed)
+                context = personalization_cache.get(ctx_key)
+                if context is None:
+                    with span("expand.personalize"):
+                        profile = await async_user_profiles_col.find_one({"user_id": user_id})
+                        if profile:
+                            context = _build_personalization_context(profile, user_id, seed, verbosity)
+                            personalization_cache.set(ctx_key, context)
+
+                if context:
+                    trace.update(context)
+                    snippet = context["personalization_snippet"]
                     if snippet:
                         system_prompt = (
                             f"{system_prompt} "
@@ -521,40 +1003,35 @@ async def expand_query(
             context="System prompt",
         )
     payload = {
-        "model": OLLAMA_MODEL,
+        "model": model,
         "stream": False,
         "options": {"temperature": OLLAMA_TEMP},
         "system": system_prompt,
         "prompt": seed,
     }
-
-    try:
-        async with httpx.AsyncClient(timeout=TIME_OUT) as client:
-            resp = await client.post(f"{OLLAMA_URL.rstrip('/')}/api/generate", json=payload)
-        resp.raise_for_status()
-
-        raw = (resp.json().get("response") or "").strip()
-
-        # collapse whitespace first
-        collapsed = " ".join(raw.split()) or seed
-
-        # normalize to NFC for characters like é
-        normalized = unicodedata.normalize("NFC", collapsed)
-
-        # remove wrapping quotes if present
-        stripped = _strip_wrapping_quotes(normalized)
-        expanded = stripped
-    except Exception as e:
-        logger.warning("Query expansion failed, using original seed='%s', error=%s", seed, e)
-        expanded = seed
-
-    # ---------------- Cache result ----------------
-    try:
-        query_cache.set(user_id, seed, OLLAMA_MODEL, OLLAMA_TEMP, semantic_mode, verbosity, expanded, profile_rev)
-    except Exception:
-        logger.exception("Failed to write expansion result to cache.")
-
+    cache_args = (cache_user, semantic_mode, cache_verbosity, cache_rev, model)
+    insight = {field: trace[field] for field in _PERSONALIZATION_TRACE_FIELDS}
+
+    # ---------------- LLM call (latency budgeted) ----------------
+    # The call runs as its own task so that, if it outlives the request's
+    # budget, it keeps going in the background and still fills the cache.
+    task = _start_expansion(inflight_key, payload, seed, cache_args, priority, insight)
+    with span("expand.llm"):
+        outcome = await _await_within_budget(task, budget_ms)
+
+    if outcome is None:
+        logger.info(
+            "Expansion exceeded %dms budget, using original seed='%s' (cache fill deferred)",
+            budget_ms, seed,
+        )
+        trace["cache_status"] = "DEFERRED"
+        trace["fallback_reason"] = "latency_budget"
+        trace["expanded_query"] = seed
+        return {"expanded_query": seed, "insight": trace}
+
+    expanded, fallback_reason, insight = outcome
+    trace.update(copy.deepcopy(insight))
+    trace["fallback_reason"] = fallback_reason
     trace["expanded_query"] = expanded
 
-
     return {"expanded_query": expanded, "insight": trace}
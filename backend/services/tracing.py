@@ -0,0 +1,210 @@
+"""backend/services/tracing.py
+
+Purpose
+-------
+Lightweight per-request span tracing, so we can see where /search latency
+goes (expansion cache vs. LLM, query logging, Google, profile fetch,
+reranking, profile insight) without attaching a profiler.
+
+How it works
+------------
+- `TracingMiddleware` (pure ASGI) starts a `RequestTrace` in a contextvar for
+  every HTTP request.
+- Code wraps a stage in `with span("google"):`. Outside a request (background
+  tasks, scripts, tests) `span` is a no-op.
+- When the response starts, the middleware adds a `Server-Timing` header
+  (`expand;dur=12.1, google;dur=180.4, total;dur=201.0`); repeated spans with
+  the same name are summed. After the response it logs one structured timing
+  record and, for a sampled fraction of requests, appends a JSON line to the
+  trace sink.
+
+Env vars
+--------
+TRACE_ENABLED
+    "1" (default) to trace requests and send Server-Timing headers.
+
+TRACE_SINK_PATH
+    JSON-lines file for sampled traces, e.g. "backend/logs/traces.jsonl".
+    Unset disables the sink. Writes go through a background thread.
+
+TRACE_SAMPLE_RATE
+    Fraction of requests written to the sink (default: 0.01).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.services.logger import AppLogger, AsyncLogPipeline
+
+logger = AppLogger.get_logger(__name__)
+
+TRACE_ENABLED = (os.getenv("TRACE_ENABLED", "1") or "1").strip() == "1"
+TRACE_SINK_PATH = (os.getenv("TRACE_SINK_PATH", "") or "").strip()
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+
+class RequestTrace:
+    """Spans recorded for one request. Spans added after `finish()` are ignored."""
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        # (name, offset_ms, duration_ms)
+        self.spans: List[Tuple[str, float, float]] = []
+        self.total_ms: Optional[float] = None
+
+    def add(self, name: str, start: float, end: float) -> None:
+        if self.total_ms is None:
+            self.spans.append((name, (start - self.started) * 1000, (end - start) * 1000))
+
+    def finish(self) -> float:
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self.started) * 1000
+        return self.total_ms
+
+    def durations(self) -> Dict[str, float]:
+        """Total milliseconds per span name, in first-seen order."""
+        out: Dict[str, float] = {}
+        for name, _offset, dur in self.spans:
+            out[name] = out.get(name, 0.0) + dur
+        return out
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={dur:.1f}" for name, dur in self.durations().items()]
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.started) * 1000
+        parts.append(f"total;dur={total:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "total_ms": round(self.finish(), 2),
+            "spans": [
+                {"name": name, "offset_ms": round(offset, 2), "duration_ms": round(dur, 2)}
+                for name, offset, dur in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage `name` of the current request (no-op outside one)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter())
+
+
+# -----------------------
+# JSON-lines sink
+# -----------------------
+_sink_logger: Optional[logging.Logger] = None
+_sink_pipeline: Optional[AsyncLogPipeline] = None
+
+
+def _get_sink() -> Optional[logging.Logger]:
+    global _sink_logger, _sink_pipeline
+    if not TRACE_SINK_PATH:
+        return None
+    if _sink_logger is None:
+        os.makedirs(os.path.dirname(os.path.abspath(TRACE_SINK_PATH)), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(TRACE_SINK_PATH, maxBytes=50 * 1024 * 1024, backupCount=3)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _sink_pipeline = AsyncLogPipeline([handler])
+        _sink_pipeline.start()
+        sink = logging.getLogger("backend.traces")
+        sink.handlers = [_sink_pipeline.handler]
+        sink.setLevel(logging.INFO)
+        sink.propagate = False
+        _sink_logger = sink
+    return _sink_logger
+
+
+def shutdown_sink() -> None:
+    """Flush sampled traces still queued for the sink."""
+    if _sink_pipeline is not None:
+        _sink_pipeline.stop()
+
+
+def _record(trace: RequestTrace, status: Optional[int]) -> None:
+    durations = {name: round(dur, 1) for name, dur in trace.durations().items()}
+    logger.info("Request timing", extra={
+        "request_id": trace.request_id,
+        "path": trace.path,
+        "status": status,
+        "total_ms": round(trace.finish(), 1),
+        "spans": durations,
+    })
+
+    if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+        sink = _get_sink()
+        if sink is not None:
+            record = trace.to_dict()
+            record["status"] = status
+            record["ts"] = time.time()
+            sink.info(json.dumps(record, separators=(",", ":")))
+
+
+# -----------------------
+# ASGI middleware
+# -----------------------
+class TracingMiddleware:
+    """Start a RequestTrace per HTTP request and add the Server-Timing header."""
+
+    def __init__(self, app, enabled: bool = TRACE_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope.get("method", ""), scope.get("path", ""))
+        token = _current.set(trace)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message.get("status")
+                trace.finish()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            trace.finish()
+            try:
+                _record(trace, status)
+            except Exception:
+                logger.exception("Failed to record request trace")
@@ -4,7 +4,23 @@ from datetime import datetime, timedelta, timezone
 import re
 import math
 from urllib.parse import urlparse
-from backend.services.db import queries_col, interactions_col, user_profiles_col, discarded_tokens_col
+from backend.services.db import (
+    queries_col,
+    interactions_col,
+    user_profiles_col,
+    discarded_tokens_col,
+    event_rollups_col,
+    rollup_watermarks_col,
+)
+from backend.services.async_db import (
+    async_queries_col,
+    async_interactions_col,
+    async_user_profiles_col,
+    async_discarded_tokens_col,
+    async_event_rollups_col,
+    async_rollup_watermarks_col,
+)
+from backend.models.data_models import to_datetime, utc_now, timestamp_filter
 from backend.services.logger import AppLogger
 
 logger = AppLogger.get_logger(__name__)
@@ -14,6 +30,13 @@ logger = AppLogger.get_logger(__name__)
 SESSION_DECAY_MINUTES = int(os.getenv("SESSION_DECAY_MINUTES", 480))
 SESSION_BOOST_MULTIPLIER = float(os.getenv("SESSION_BOOST_MULTIPLIER", 1.5))
 
+# Fields a rebuild derives from the event history. explicit_interests and
+# implicit_exclusions belong to the profile edits (services/profile_mutations.py)
+# and are never written back by a rebuild.
+DERIVED_FIELDS = ("implicit_interests", "query_history", "click_history", "last_updated", "embedding")
+# Rebuild writes retried after an edit landed between the read and the write
+PROFILE_WRITE_RETRIES = 3
+
 # Expanded stopword list (common English stopwords + some domain-specific tokens)
 STOP_WORDS = {
     "the", "a", "an", "and", "or", "but", "if", "then", "than", "is", "are", "was", "were",
@@ -82,21 +105,16 @@ def normalize_url(url: str) -> str:
         return f"{domain}/{top_path}"
     return domain or url
 
-def _parse_iso(ts: str) -> datetime:
-    try:
-        dt = datetime.fromisoformat(ts)
-        if dt.tzinfo is None:
-            # Assume UTC for naive timestamps
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt
-    except Exception:
-        return datetime.now(timezone.utc)
+def _parse_iso(ts) -> datetime:
+    """Stored timestamp (native datetime or legacy ISO string) as aware UTC; now if missing/invalid."""
+    return to_datetime(ts) or datetime.now(timezone.utc)
 
 def aggregate_queries(user_id: str,
                       session_window_minutes: int = 30,
                       recency_decay_days: float = 30.0,
                       session_decay_minutes: int = None,
-                      discarded_counter: Counter = None):
+                      discarded_counter: Counter = None,
+                      since: datetime = None):
     """
     Aggregate and score tokens from user's past queries.
 
@@ -105,35 +123,25 @@ def aggregate_queries(user_id: str,
     - Applies a session boost when tokens appear in the current session (within session_decay_minutes).
     - Applies a session boost when tokens are repeated within a session.
     Returns a dict[token] -> score and list of unique tokens (for history).
+    With `since`, only queries at or after it are read (older ones are rolled up).
     """
+    docs = list(queries_col.find(_events_filter(user_id, since)))
+    return _score_queries(docs, session_window_minutes, recency_decay_days, session_decay_minutes, discarded_counter)
+
+
+def _score_queries(docs: list,
+                   session_window_minutes: int = 30,
+                   recency_decay_days: float = 30.0,
+                   session_decay_minutes: int = None,
+                   discarded_counter: Counter = None):
+    """Scoring half of aggregate_queries(), on already-fetched query documents."""
     if session_decay_minutes is None:
         session_decay_minutes = SESSION_DECAY_MINUTES
-    
-    docs = list(queries_col.find({"user_id": user_id}))
+
     if not docs:
         return {}, []
 
-    # sort by timestamp
-    docs_sorted = sorted(docs, key=lambda d: d.get("timestamp", ""))
-
-    # build sessions
-    sessions = []  # list of list of (tokens, ts)
-    current_session = []
-    last_ts = None
-    for doc in docs_sorted:
-        ts = _parse_iso(doc.get("timestamp", datetime.now(timezone.utc).isoformat()))
-        if last_ts is None:
-            current_session = [(doc, ts)]
-        else:
-            gap = (ts - last_ts).total_seconds() / 60.0
-            if gap <= session_window_minutes:
-                current_session.append((doc, ts))
-            else:
-                sessions.append(current_session)
-                current_session = [(doc, ts)]
-        last_ts = ts
-    if current_session:
-        sessions.append(current_session)
+    sessions = _group_sessions(docs, session_window_minutes)
 
     token_scores = defaultdict(float)
     token_seen = set()
@@ -141,17 +149,10 @@ def aggregate_queries(user_id: str,
     session_cutoff = now - timedelta(minutes=session_decay_minutes)
 
     for session in sessions:
-        # collect per-session counts
-        session_counter = Counter()
+        # per-session token weights (count with repetition boost)
+        session_weights = _session_token_weights(session, discarded_counter)
         # session recency mean (use average of contained queries)
-        session_age_days = 0.0
-        for doc, ts in session:
-            qs = preprocess(doc.get("raw_text", ""), discarded_counter)
-            for t in qs:
-                session_counter[t] += 1
-            session_age_days += (now - ts).total_seconds() / 86400.0
-        if len(session) > 0:
-            session_age_days /= len(session)
+        session_age_days = sum((now - ts).total_seconds() for _doc, ts in session) / 86400.0 / len(session)
 
         # recency multiplier (exponential decay)
         recency_mult = math.exp(- (session_age_days / max(1.0, recency_decay_days)))
@@ -162,21 +163,71 @@ def aggregate_queries(user_id: str,
         session_mult = SESSION_BOOST_MULTIPLIER if in_current_session else 1.0
 
         # apply per-token scoring within the session
-        for token, cnt in session_counter.items():
-            # session boost if repeated within session
-            s_boost = 1.0 + (0.5 * (cnt - 1)) if cnt > 1 else 1.0
-            token_scores[token] += cnt * s_boost * recency_mult * session_mult
+        for token, weight in session_weights.items():
+            token_scores[token] += weight * recency_mult * session_mult
             token_seen.add(token)
 
     return dict(token_scores), list(token_seen)
 
 
-def aggregate_clicks(user_id: str, recency_decay_days: float = 30.0, session_decay_minutes: int = None):
+def _group_sessions(docs: list, session_window_minutes: int = 30) -> list:
+    """
+    Sort query documents by time and split them into sessions wherever the
+    gap between consecutive queries exceeds session_window_minutes.
+    Returns a list of sessions, each a list of (doc, timestamp).
+    """
+    # sort by timestamp (parsed: stored values may be datetimes or legacy strings)
+    docs_sorted = sorted(((doc, _parse_iso(doc.get("timestamp"))) for doc in docs), key=lambda pair: pair[1])
+
+    sessions = []
+    current_session = []
+    last_ts = None
+    for doc, ts in docs_sorted:
+        if last_ts is None:
+            current_session = [(doc, ts)]
+        else:
+            gap = (ts - last_ts).total_seconds() / 60.0
+            if gap <= session_window_minutes:
+                current_session.append((doc, ts))
+            else:
+                sessions.append(current_session)
+                current_session = [(doc, ts)]
+        last_ts = ts
+    if current_session:
+        sessions.append(current_session)
+    return sessions
+
+
+def _session_token_weights(session: list, discarded_counter: Counter = None) -> dict:
+    """Token -> count within the session, boosted when a token repeats (1x, 2x1.5, 3x2, ...)."""
+    session_counter = Counter()
+    for doc, _ts in session:
+        for t in preprocess(doc.get("raw_text", ""), discarded_counter):
+            session_counter[t] += 1
+    return {
+        token: cnt * (1.0 + (0.5 * (cnt - 1)) if cnt > 1 else 1.0)
+        for token, cnt in session_counter.items()
+    }
+
+
+def _click_rank_weight(doc: dict) -> float:
+    """Soft rank weight: higher rank (1) => higher weight (rank 1 -> 1.0, rank 10 -> 0.1)."""
+    rank = doc.get("rank", 1) or 1
+    return max(0.1, (11 - float(rank)) / 10.0)
+
+
+def aggregate_clicks(user_id: str, recency_decay_days: float = 30.0, session_decay_minutes: int = None,
+                     since: datetime = None):
     """Aggregate and score clicked domains with recency and session weighting."""
+    docs = list(interactions_col.find(_events_filter(user_id, since)))
+    return _score_clicks(docs, recency_decay_days, session_decay_minutes)
+
+
+def _score_clicks(docs: list, recency_decay_days: float = 30.0, session_decay_minutes: int = None):
+    """Scoring half of aggregate_clicks(), on already-fetched interaction documents."""
     if session_decay_minutes is None:
         session_decay_minutes = SESSION_DECAY_MINUTES
-    
-    docs = list(interactions_col.find({"user_id": user_id}))
+
     domain_counts = defaultdict(float)
     if not docs:
         return {}
@@ -186,13 +237,12 @@ def aggregate_clicks(user_id: str, recency_decay_days: float = 30.0, session_dec
     
     for doc in docs:
         domain = normalize_url(doc.get("clicked_url", ""))
-        rank = doc.get("rank", 1) or 1
-        ts = _parse_iso(doc.get("timestamp", datetime.now(timezone.utc).isoformat()))
+        ts = _parse_iso(doc.get("timestamp"))
         age_days = (now - ts).total_seconds() / 86400.0
         recency_mult = math.exp(- (age_days / max(1.0, recency_decay_days)))
 
         # Apply a soft rank weight: higher rank (1) => higher weight
-        rank_weight = max(0.1, (11 - float(rank)) / 10.0)  # rank 1 -> 1.0, rank 10 -> 0.1
+        rank_weight = _click_rank_weight(doc)
         
         # Apply session boost for recent clicks within SESSION_DECAY_MINUTES
         session_mult = SESSION_BOOST_MULTIPLIER if ts >= session_cutoff else 1.0
@@ -202,12 +252,71 @@ def aggregate_clicks(user_id: str, recency_decay_days: float = 30.0, session_dec
     return dict(domain_counts)
 
 
+def _events_filter(user_id: str, since: datetime = None) -> dict:
+    if since is None:
+        return {"user_id": user_id}
+    return {"user_id": user_id, **timestamp_filter(gte=since)}
+
+
+# -----------------------
+# Event rollups
+# -----------------------
+# Events older than a user's rollup watermark have been compacted into daily
+# aggregates by services/event_rollups.py. Recency decay is exponential, so
+# a weight stored relative to the day's anchor time only needs one more
+# factor exp(-(now - anchor) / decay) to equal what the raw events would
+# have scored. Rolled-up events are far outside the current-session window,
+# so no session boost applies to them.
+
+def _load_rollups(user_id: str):
+    """(watermark, rollup docs) for a user; (None, []) if nothing is rolled up."""
+    mark = rollup_watermarks_col.find_one({"user_id": user_id})
+    if not mark:
+        return None, []
+    return to_datetime(mark.get("until")), list(event_rollups_col.find({"user_id": user_id}))
+
+
+async def _load_rollups_async(user_id: str):
+    mark = await async_rollup_watermarks_col.find_one({"user_id": user_id})
+    if not mark:
+        return None, []
+    return to_datetime(mark.get("until")), await async_event_rollups_col.find({"user_id": user_id}).to_list(None)
+
+
+def _merge_rollups(keywords_scores: dict, query_history: list, clicks_scores: dict, rollups: list) -> None:
+    """Add decayed rollup weights to the raw-event scores (in place)."""
+    if not rollups:
+        return
+    now = datetime.now(timezone.utc)
+    seen = set(query_history)
+    for rollup in rollups:
+        anchor = to_datetime(rollup.get("day"))
+        if anchor is None:
+            continue
+        decay_days = max(1.0, float(rollup.get("decay_days", 30.0)))
+        factor = math.exp(-((now - anchor).total_seconds() / 86400.0) / decay_days)
+        for token, weight in rollup.get("tokens", []):
+            keywords_scores[token] = keywords_scores.get(token, 0.0) + weight * factor
+            if token not in seen:
+                seen.add(token)
+                query_history.append(token)
+        for domain, weight in rollup.get("domains", []):
+            clicks_scores[domain] = clicks_scores.get(domain, 0.0) + weight * factor
+
+
 def get_profile_insight(user_id: str):
     """
     Returns a compact explanation of the current user profile.
     """
-    profile = user_profiles_col.find_one({"user_id": user_id})
+    return _profile_insight(user_profiles_col.find_one({"user_id": user_id}))
+
+
+async def get_profile_insight_async(user_id: str):
+    """Async version of get_profile_insight() for request handlers."""
+    return _profile_insight(await async_user_profiles_col.find_one({"user_id": user_id}))
+
 
+def _profile_insight(profile):
     if not profile:
         return None
 
@@ -243,22 +352,179 @@ def build_user_profile(user_id: str,
     Returns the profile document saved in MongoDB.
     """
     logger.debug("Building user profile", extra={"user_id": user_id})
-    
-    if session_decay_minutes is None:
-        session_decay_minutes = SESSION_DECAY_MINUTES
-    
     discarded_counter = Counter()
 
-    keywords_scores, query_history = aggregate_queries(
-        user_id,
+    # Old events may have been compacted into rollups; only newer ones are read raw
+    watermark, rollups = _load_rollups(user_id)
+    query_docs = list(queries_col.find(_events_filter(user_id, watermark)))
+    click_docs = list(interactions_col.find(_events_filter(user_id, watermark)))
+    scores = _score_events(query_docs, click_docs, rollups, session_window_minutes,
+                           recency_decay_days, session_decay_minutes, discarded_counter)
+
+    # Persist profile: conditional on the revision that was read, so an edit
+    # landing in between is re-read instead of overwritten
+    try:
+        for _attempt in range(PROFILE_WRITE_RETRIES):
+            # read existing profile for explicit interests and exclusions
+            existing_profile = user_profiles_col.find_one({"user_id": user_id}) or {}
+            profile_doc, filt, update, upsert = _rebuild_write(
+                user_id, scores, existing_profile, query_weight, click_weight, discarded_counter,
+            )
+            if _written(user_profiles_col.update_one(filt, update, upsert=upsert)):
+                break
+            _log_write_retry(user_id)
+        else:
+            _log_write_conflict(user_id)
+            user_profiles_col.update_one({"user_id": user_id}, update, upsert=True)
+    except Exception as e:
+        _log_save_failure(user_id, e)
+        raise
+
+    # Persist discarded tokens counts for later analysis
+    for filt, update in _discarded_token_updates(discarded_counter):
+        discarded_tokens_col.update_one(filt, update, upsert=True)
+
+    return profile_doc
+
+
+async def build_user_profile_async(user_id: str,
+                                   query_weight: float = 1.0,
+                                   click_weight: float = 2.0,
+                                   session_window_minutes: int = 30,
+                                   recency_decay_days: float = 30.0,
+                                   session_decay_minutes: int = None):
+    """
+    Async version of build_user_profile() for request handlers: same scoring,
+    with every read and write awaited on the async client.
+    """
+    logger.debug("Building user profile", extra={"user_id": user_id})
+    discarded_counter = Counter()
+
+    watermark, rollups = await _load_rollups_async(user_id)
+    query_docs = await async_queries_col.find(_events_filter(user_id, watermark)).to_list(None)
+    click_docs = await async_interactions_col.find(_events_filter(user_id, watermark)).to_list(None)
+    scores = _score_events(query_docs, click_docs, rollups, session_window_minutes,
+                           recency_decay_days, session_decay_minutes, discarded_counter)
+
+    try:
+        for _attempt in range(PROFILE_WRITE_RETRIES):
+            existing_profile = await async_user_profiles_col.find_one({"user_id": user_id}) or {}
+            profile_doc, filt, update, upsert = _rebuild_write(
+                user_id, scores, existing_profile, query_weight, click_weight, discarded_counter,
+            )
+            if _written(await async_user_profiles_col.update_one(filt, update, upsert=upsert)):
+                break
+            _log_write_retry(user_id)
+        else:
+            _log_write_conflict(user_id)
+            await async_user_profiles_col.update_one({"user_id": user_id}, update, upsert=True)
+    except Exception as e:
+        _log_save_failure(user_id, e)
+        raise
+
+    for filt, update in _discarded_token_updates(discarded_counter):
+        await async_discarded_tokens_col.update_one(filt, update, upsert=True)
+
+    return profile_doc
+
+
+# Shared, I/O-free halves of the sync and async builders.
+
+def _score_events(query_docs: list,
+                  click_docs: list,
+                  rollups: list,
+                  session_window_minutes: int,
+                  recency_decay_days: float,
+                  session_decay_minutes: int,
+                  discarded_counter: Counter) -> tuple:
+    """(keyword scores, query history, click scores) from fetched events plus rollups."""
+    keywords_scores, query_history = _score_queries(
+        query_docs,
         session_window_minutes=session_window_minutes,
         recency_decay_days=recency_decay_days,
         session_decay_minutes=session_decay_minutes,
-        discarded_counter=discarded_counter
+        discarded_counter=discarded_counter,
+    )
+    clicks_scores = _score_clicks(click_docs, recency_decay_days=recency_decay_days,
+                                  session_decay_minutes=session_decay_minutes)
+    _merge_rollups(keywords_scores, query_history, clicks_scores, rollups)
+    return keywords_scores, query_history, clicks_scores
+
+
+def _rebuild_write(user_id: str,
+                   scores: tuple,
+                   existing_profile: dict,
+                   query_weight: float,
+                   click_weight: float,
+                   discarded_counter: Counter) -> tuple:
+    """(profile_doc, filter, update, upsert) for one revision-conditional rebuild write."""
+    keywords_scores, query_history, clicks_scores = scores
+    profile_doc = _assemble_profile(
+        user_id, keywords_scores, query_history, clicks_scores, existing_profile,
+        query_weight, click_weight, discarded_counter,
     )
+    return (profile_doc, _revision_filter(user_id, existing_profile), _profile_update(profile_doc),
+            not existing_profile)
 
-    clicks_scores = aggregate_clicks(user_id, recency_decay_days=recency_decay_days, session_decay_minutes=session_decay_minutes)
 
+def _discarded_token_updates(discarded_counter: Counter):
+    """(filter, update) pairs that add this rebuild's discarded-token counts."""
+    now = datetime.now(timezone.utc).isoformat()
+    for token, cnt in discarded_counter.items():
+        if token:
+            yield {"token": token}, {"$inc": {"count": int(cnt)}, "$set": {"last_seen": now}}
+
+
+def _log_write_retry(user_id: str) -> None:
+    logger.info("Profile changed during rebuild, re-reading", extra={"user_id": user_id})
+
+
+def _log_save_failure(user_id: str, error: Exception) -> None:
+    logger.error("Failed to save user profile", extra={
+        "user_id": user_id,
+        "error": str(error)
+    }, exc_info=True)
+
+
+def _revision_filter(user_id: str, existing_profile: dict) -> dict:
+    """Match the profile only if it still has the revision the rebuild read."""
+    if not existing_profile:
+        return {"user_id": user_id}
+    if "profile_revision" in existing_profile:
+        return {"user_id": user_id, "profile_revision": existing_profile["profile_revision"]}
+    return {"user_id": user_id, "profile_revision": {"$exists": False}}
+
+
+def _profile_update(profile_doc: dict) -> dict:
+    """Set the derived fields and bump the revision; edited fields are only seeded on insert."""
+    return {
+        "$set": {field: profile_doc[field] for field in DERIVED_FIELDS},
+        "$inc": {"profile_revision": 1},
+        "$setOnInsert": {
+            "explicit_interests": profile_doc["explicit_interests"],
+            "implicit_exclusions": profile_doc["implicit_exclusions"],
+        },
+    }
+
+
+def _written(result) -> bool:
+    return bool(result.matched_count) or result.upserted_id is not None
+
+
+def _log_write_conflict(user_id: str) -> None:
+    logger.warning("Profile kept changing during rebuild; writing derived fields without revision check",
+                   extra={"user_id": user_id})
+
+
+def _assemble_profile(user_id: str,
+                      keywords_scores: dict,
+                      query_history: list,
+                      clicks_scores: dict,
+                      existing_profile: dict,
+                      query_weight: float,
+                      click_weight: float,
+                      discarded_counter: Counter) -> dict:
+    """Merge query/click scores with the stored explicit interests and exclusions into a profile document."""
     # Merge with tunable weights
     interests = defaultdict(float)
     interest_sources = defaultdict(list)
@@ -277,8 +543,6 @@ def build_user_profile(user_id: str,
             "score": round(weighted, 3)
         })
 
-    # read existing profile for explicit interests and exclusions
-    existing_profile = user_profiles_col.find_one({"user_id": user_id}) or {}
     explicit_interests = existing_profile.get("explicit_interests", [])
     implicit_exclusions_raw = existing_profile.get("implicit_exclusions", [])
     implicit_exclusions = set([e.lower() for e in implicit_exclusions_raw])
@@ -305,43 +569,14 @@ def build_user_profile(user_id: str,
     }
 
     prev_rev = int(existing_profile.get("profile_revision", 0))
-    profile_doc = {
+    return {
         "user_id": user_id,
         "implicit_interests": dict(sorted(filtered_interests.items(), key=lambda x: -x[1])),
         "query_history": query_history,
         "click_history": list(clicks_scores.keys()),
-        "last_updated": datetime.now(timezone.utc).isoformat(),
+        "last_updated": utc_now(),
         "explicit_interests": explicit_interests,
         "implicit_exclusions": implicit_exclusions_raw,
         "profile_revision": prev_rev + 1,
         "embedding": None
     }
-
-    # Persist profile
-    try:
-        user_profiles_col.update_one({"user_id": user_id}, {"$set": profile_doc}, upsert=True)
-#         logger.info("User profile saved", extra={
-#             "user_id": user_id,
-#             "implicit_count": len(filtered_interests),
-#             "explicit_count": len(explicit_interests)
-#         })
-    except Exception as e:
-        logger.error("Failed to save user profile", extra={
-            "user_id": user_id,
-            "error": str(e)
-        }, exc_info=True)
-        raise
-
-    # Persist discarded tokens counts for later analysis
-    now = datetime.now(timezone.utc).isoformat()
-    for token, cnt in discarded_counter.items():
-        if not token:
-            continue
-        discarded_tokens_col.update_one(
-            {"token": token},
-            {"$inc": {"count": int(cnt)}, "$set": {"last_seen": now}},
-            upsert=True
-        )
-
-    return profile_doc
-
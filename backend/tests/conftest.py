@@ -4,7 +4,7 @@ Test configuration and fixtures for the AI Search Engine backend.
 import os
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 
 # Set up test environment variables before importing the app
 os.environ.setdefault("SECRET_KEY", "test_secret_key_for_testing_only")
@@ -20,16 +20,52 @@ mock_profiles_col = MagicMock()
 mock_queries_col = MagicMock()
 mock_interactions_col = MagicMock()
 mock_discarded_tokens_col = MagicMock()
+mock_event_rollups_col = MagicMock()
+mock_rollup_watermarks_col = MagicMock()
 
 # Configure mock return values
 mock_users_col.find_one.return_value = None  # No existing user by default
 mock_queries_col.distinct.return_value = []  # No user IDs by default
+mock_rollup_watermarks_col.find_one.return_value = None  # Nothing rolled up by default
+mock_event_rollups_col.find.return_value = []
+
+
+def make_async_collection():
+    """
+    Mock of a pymongo AsyncCollection: query/write methods are awaitable,
+    `find()` returns a cursor whose `to_list()` is awaitable.
+    """
+    col = MagicMock()
+    for name in ("find_one", "insert_one", "update_one", "delete_many", "find_one_and_update", "count_documents"):
+        setattr(col, name, AsyncMock())
+    col.find_one.return_value = None
+    col.find.return_value.to_list = AsyncMock(return_value=[])
+    return col
+
+
+# Async handles used by request handlers (services/async_db.py)
+mock_async_users_col = make_async_collection()
+mock_async_profiles_col = make_async_collection()
+mock_async_queries_col = make_async_collection()
+mock_async_interactions_col = make_async_collection()
+mock_async_discarded_tokens_col = make_async_collection()
+mock_async_event_rollups_col = make_async_collection()
+mock_async_rollup_watermarks_col = make_async_collection()
 
 with patch("backend.services.db.users_col", mock_users_col), \
      patch("backend.services.db.user_profiles_col", mock_profiles_col), \
      patch("backend.services.db.queries_col", mock_queries_col), \
      patch("backend.services.db.interactions_col", mock_interactions_col), \
      patch("backend.services.db.discarded_tokens_col", mock_discarded_tokens_col), \
+     patch("backend.services.db.event_rollups_col", mock_event_rollups_col), \
+     patch("backend.services.db.rollup_watermarks_col", mock_rollup_watermarks_col), \
+     patch("backend.services.async_db.async_users_col", mock_async_users_col), \
+     patch("backend.services.async_db.async_user_profiles_col", mock_async_profiles_col), \
+     patch("backend.services.async_db.async_queries_col", mock_async_queries_col), \
+     patch("backend.services.async_db.async_interactions_col", mock_async_interactions_col), \
+     patch("backend.services.async_db.async_discarded_tokens_col", mock_async_discarded_tokens_col), \
+     patch("backend.services.async_db.async_event_rollups_col", mock_async_event_rollups_col), \
+     patch("backend.services.async_db.async_rollup_watermarks_col", mock_async_rollup_watermarks_col), \
      patch("backend.background_tasks.background_tasks.start_background_tasks"), \
      patch("backend.background_tasks.background_tasks.stop_background_tasks"):
     from backend.main import app
@@ -71,6 +107,20 @@ def mock_db():
     }
 
 
+@pytest.fixture
+def mock_async_db():
+    """
+    Async counterparts of mock_db, as awaited by request handlers.
+    """
+    return {
+        "users": mock_async_users_col,
+        "profiles": mock_async_profiles_col,
+        "queries": mock_async_queries_col,
+        "interactions": mock_async_interactions_col,
+        "discarded_tokens": mock_async_discarded_tokens_col
+    }
+
+
 @pytest.fixture
 def mock_auth_service():
     """
@@ -78,15 +128,15 @@ def mock_auth_service():
     """
     with patch("backend.api.auth_routes.auth_service") as mock_service:
         # Setup default mock behaviors
-        mock_service.create_user.return_value = {
+        mock_service.create_user_async = AsyncMock(return_value={
             "user_id": "test_user_123",
             "username": "testuser",
             "email": "test@example.com"
-        }
-        mock_service.authenticate_user.return_value = {
+        })
+        mock_service.authenticate_user_async = AsyncMock(return_value={
             "user_id": "test_user_123",
             "username": "testuser"
-        }
+        })
         mock_service.create_access_token.return_value = "mock_token_12345"
         yield mock_service
 
@@ -96,7 +146,7 @@ def mock_search_service():
     """
     Mock search service to avoid making actual API calls during tests.
     """
-    with patch("backend.api.search_routes.search") as mock_search:
+    with patch("backend.api.search_routes.search_async") as mock_search:
         mock_search.return_value = {
             "results": [
                 {
@@ -142,9 +192,13 @@ def mock_logging_service():
     """
     Mock logging service to avoid database writes during tests.
     """
-    with patch("backend.api.search_routes.log_query") as mock_log_query, \
-         patch("backend.api.search_routes.log_interaction") as mock_log_interaction, \
-         patch("backend.api.search_routes.log_feedback") as mock_log_feedback:
+    with patch("backend.api.search_routes.log_query_async") as mock_log_query, \
+         patch("backend.api.search_routes.log_interaction_async") as mock_log_interaction, \
+         patch("backend.api.search_routes.log_feedback_async") as mock_log_feedback:
+        # The async variants are patched with AsyncMocks; give them plain ids
+        mock_log_query.return_value = "mock_query_id"
+        mock_log_interaction.return_value = "mock_interaction_id"
+        mock_log_feedback.return_value = "mock_feedback_id"
         yield {
             "log_query": mock_log_query,
             "log_interaction": mock_log_interaction,
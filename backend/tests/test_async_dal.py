@@ -0,0 +1,108 @@
+"""
+Tests for the async data-access path used by request handlers
+(services/async_db.py and the *_async service variants).
+"""
+import asyncio
+import time
+
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from backend.services import logging_service, search_service, user_profile_service
+
+
+def _async_col(find_docs=None, find_one=None):
+    col = MagicMock()
+    col.find_one = AsyncMock(return_value=find_one)
+    col.insert_one = AsyncMock()
+    col.update_one = AsyncMock()
+    col.delete_many = AsyncMock()
+    col.find.return_value.to_list = AsyncMock(return_value=list(find_docs or []))
+    return col
+
+
+QUERY_DOCS = [
+    {"user_id": "u1", "raw_text": "python asyncio tutorial", "timestamp": "2026-01-01T10:00:00+00:00"},
+    {"user_id": "u1", "raw_text": "python decorators", "timestamp": "2026-01-01T10:05:00+00:00"},
+]
+CLICK_DOCS = [
+    {"user_id": "u1", "clicked_url": "https://docs.python.org/3/", "rank": 1, "timestamp": "2026-01-01T10:06:00+00:00"},
+]
+STORED = {"user_id": "u1", "explicit_interests": [{"keyword": "django", "weight": 1.0}],
+          "implicit_exclusions": ["decorators"], "profile_revision": 4}
+
+
+class TestAsyncServices:
+    """Test cases for the async service variants."""
+
+    async def test_build_profile_async_matches_sync(self):
+        sync_q, sync_i, sync_p, sync_d = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+        sync_q.find.return_value = QUERY_DOCS
+        sync_i.find.return_value = CLICK_DOCS
+        sync_p.find_one.return_value = dict(STORED)
+        with patch.object(user_profile_service, "queries_col", sync_q), \
+             patch.object(user_profile_service, "interactions_col", sync_i), \
+             patch.object(user_profile_service, "user_profiles_col", sync_p), \
+             patch.object(user_profile_service, "discarded_tokens_col", sync_d):
+            expected = user_profile_service.build_user_profile("u1")
+
+        profiles = _async_col(find_one=dict(STORED))
+        with patch.object(user_profile_service, "async_queries_col", _async_col(QUERY_DOCS)), \
+             patch.object(user_profile_service, "async_interactions_col", _async_col(CLICK_DOCS)), \
+             patch.object(user_profile_service, "async_user_profiles_col", profiles), \
+             patch.object(user_profile_service, "async_discarded_tokens_col", _async_col()):
+            profile = await user_profile_service.build_user_profile_async("u1")
+
+        # Scores decay with wall-clock time, so compare them approximately
+        assert profile["implicit_interests"] == pytest.approx(expected["implicit_interests"], rel=1e-3)
+        assert sorted(profile["query_history"]) == sorted(expected["query_history"])
+        for key in ("click_history", "explicit_interests", "profile_revision"):
+            assert profile[key] == expected[key]
+        assert "decorators" not in profile["implicit_interests"]
+        profiles.update_one.assert_awaited_once()
+
+    async def test_log_query_async_inserts(self):
+        queries = _async_col()
+        with patch.object(logging_service, "async_queries_col", queries):
+            query_id = await logging_service.log_query_async("u1", "python", "python language")
+        doc = queries.insert_one.await_args.args[0]
+        assert doc["_id"] == query_id and doc["raw_text"] == "python"
+
+    async def test_search_async_reranks_with_awaited_profile(self):
+        results = [
+            {"title": "Cooking", "link": "https://food.com", "snippet": ""},
+            {"title": "Python docs", "link": "https://docs.python.org/3/", "snippet": "python"},
+        ]
+        profiles = _async_col(find_one={"user_id": "u1", "implicit_interests": {"python": 5.0}})
+        with patch.object(search_service, "search_google", return_value=results), \
+             patch.object(search_service, "async_user_profiles_col", profiles):
+            ranked = await search_service.search_async("q", user_id="u1")
+        assert ranked[0]["title"] == "Python docs"
+        profiles.find_one.assert_awaited_once_with({"user_id": "u1"})
+
+
+class TestHandlerConcurrency:
+    """Handlers await the DB, so slow calls overlap instead of serializing."""
+
+    def test_settings_requests_overlap(self, test_app):
+        import httpx
+
+        async def slow_find_one(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return {"user_id": "u1", "settings": {}}
+
+        profiles = _async_col()
+        profiles.find_one = AsyncMock(side_effect=slow_find_one)
+
+        async def run():
+            transport = httpx.ASGITransport(app=test_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                start = time.perf_counter()
+                responses = await asyncio.gather(*[client.get("/user/settings?user_id=u1") for _ in range(5)])
+                return time.perf_counter() - start, responses
+
+        with patch("backend.api.setting_routes.async_user_profiles_col", profiles):
+            elapsed, responses = asyncio.run(run())
+
+        assert all(r.status_code == 200 for r in responses)
+        assert elapsed < 0.6
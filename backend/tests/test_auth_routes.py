@@ -26,7 +26,7 @@ class TestAuthRoutes:
         assert "user_id" in data
         assert "username" in data
         assert data["username"] == "testuser"
-        mock_auth_service.create_user.assert_called_once()
+        mock_auth_service.create_user_async.assert_called_once()
     
     def test_register_missing_username(self, client, mock_auth_service):
         """Test registration fails when username is missing."""
@@ -61,7 +61,7 @@ class TestAuthRoutes:
     def test_register_duplicate_user(self, client, mock_auth_service):
         """Test registration fails when username already exists."""
         # Arrange
-        mock_auth_service.create_user.side_effect = ValueError("Username already exists")
+        mock_auth_service.create_user_async.side_effect = ValueError("Username already exists")
         payload = {
             "username": "existinguser",
             "email": "existing@example.com",
@@ -91,12 +91,12 @@ class TestAuthRoutes:
         data = response.json()
         assert "access_token" in data
         assert "user_id" in data
-        mock_auth_service.authenticate_user.assert_called_once_with("testuser", "correctpassword")
+        mock_auth_service.authenticate_user_async.assert_called_once_with("testuser", "correctpassword")
     
     def test_login_invalid_credentials(self, client, mock_auth_service):
         """Test login fails with incorrect credentials."""
         # Arrange
-        mock_auth_service.authenticate_user.return_value = None
+        mock_auth_service.authenticate_user_async.return_value = None
         payload = {
             "username": "testuser",
             "password": "wrongpassword"
@@ -9,6 +9,8 @@ from backend.models.data_models import (
     make_query_doc,
     make_interaction_doc,
     make_user_profile_doc,
+    to_datetime,
+    timestamp_filter,
 )
 
 
@@ -47,13 +49,14 @@ class TestMakeQueryDoc:
         ids = {make_query_doc("u1", "q")["_id"] for _ in range(50)}
         assert len(ids) == 50
 
-    def test_timestamp_is_valid_utc_iso(self):
-        """Timestamp should be a parseable ISO-8601 string close to now."""
+    def test_timestamp_is_native_utc_datetime(self):
+        """Timestamp should be a timezone-aware UTC datetime close to now."""
         before = datetime.now(timezone.utc)
         doc = make_query_doc(user_id="u1", raw_text="q")
         after = datetime.now(timezone.utc)
 
-        ts = datetime.fromisoformat(doc["timestamp"])
+        ts = doc["timestamp"]
+        assert isinstance(ts, datetime) and ts.tzinfo is not None
         assert before <= ts <= after
 
     def test_empty_raw_text_accepted(self):
@@ -110,13 +113,14 @@ class TestMakeInteractionDoc:
         ids = {make_interaction_doc("u1", "q1", "https://a.com", 1)["_id"] for _ in range(50)}
         assert len(ids) == 50
 
-    def test_timestamp_is_valid_utc_iso(self):
-        """Timestamp should be a parseable ISO-8601 string close to now."""
+    def test_timestamp_is_native_utc_datetime(self):
+        """Timestamp should be a timezone-aware UTC datetime close to now."""
         before = datetime.now(timezone.utc)
         doc = make_interaction_doc("u1", "q1", "https://a.com", 1)
         after = datetime.now(timezone.utc)
 
-        ts = datetime.fromisoformat(doc["timestamp"])
+        ts = doc["timestamp"]
+        assert isinstance(ts, datetime) and ts.tzinfo is not None
         assert before <= ts <= after
 
     def test_rank_zero(self):
@@ -174,13 +178,14 @@ class TestMakeUserProfileDoc:
         doc = make_user_profile_doc("u1", {}, [], [])
         assert doc["embedding"] is None
 
-    def test_timestamp_is_valid_utc_iso(self):
-        """last_updated should be a parseable ISO-8601 string close to now."""
+    def test_timestamp_is_native_utc_datetime(self):
+        """last_updated should be a timezone-aware UTC datetime close to now."""
         before = datetime.now(timezone.utc)
         doc = make_user_profile_doc("u1", {}, [], [])
         after = datetime.now(timezone.utc)
 
-        ts = datetime.fromisoformat(doc["last_updated"])
+        ts = doc["last_updated"]
+        assert isinstance(ts, datetime) and ts.tzinfo is not None
         assert before <= ts <= after
 
     def test_empty_interests_and_histories(self):
@@ -189,3 +194,29 @@ class TestMakeUserProfileDoc:
         assert doc["implicit_interests"] == {}
         assert doc["query_history"] == []
         assert doc["click_history"] == []
+
+
+class TestTimestampReaders:
+    """Test cases for reading native and legacy ISO-string timestamps."""
+
+    def test_to_datetime_accepts_both_formats(self):
+        aware = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        assert to_datetime(aware) == aware
+        # pymongo returns stored datetimes naive, in UTC
+        assert to_datetime(aware.replace(tzinfo=None)) == aware
+        assert to_datetime(aware.isoformat()) == aware
+        assert to_datetime("2026-01-02T03:04:05") == aware
+
+    def test_to_datetime_rejects_garbage(self):
+        assert to_datetime(None) is None
+        assert to_datetime("") is None
+        assert to_datetime("yesterday") is None
+
+    def test_timestamp_filter_matches_both_formats(self):
+        since = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        filt = timestamp_filter(gte=since)
+        assert filt == {"$or": [
+            {"timestamp": {"$gte": since}},
+            {"timestamp": {"$gte": "2026-01-01T00:00:00+00:00"}},
+        ]}
+
@@ -0,0 +1,60 @@
+"""
+Tests for the lazy MongoDB client factory in services/db.py.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from backend.services import db
+
+
+class TestLazyClient:
+    """Test cases for lazy client creation, options and close."""
+
+    def test_importing_creates_no_client(self):
+        # Fresh interpreter: other tests may legitimately have used the client.
+        code = (
+            "import backend.main\n"
+            "from backend.services import db, async_db\n"
+            "assert db._client is None and async_db._async_client is None\n"
+        )
+        root = Path(__file__).resolve().parents[2]
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, env=dict(os.environ),
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+
+    def test_client_created_once_with_pool_options(self):
+        fake = MagicMock()
+        with patch.object(db, "MongoClient", return_value=fake) as ctor, \
+             patch.object(db, "_client", None), \
+             patch.object(db, "MONGODB_MAX_POOL_SIZE", 7), \
+             patch.object(db, "MONGODB_COMPRESSORS", "zlib"):
+            assert db.get_client() is fake
+            assert db.get_client() is fake
+            ctor.assert_called_once()
+            options = ctor.call_args.kwargs
+            assert options["maxPoolSize"] == 7
+            assert options["compressors"] == "zlib"
+            assert options["appname"] == db.MONGODB_APPNAME
+            assert options["serverSelectionTimeoutMS"] == db.MONGODB_SERVER_SELECTION_TIMEOUT_MS
+            assert "socketTimeoutMS" not in options
+
+            db.close_client()
+            fake.close.assert_called_once()
+            assert db._client is None
+
+    def test_lazy_collection_resolves_on_use(self):
+        database = MagicMock()
+        getter = MagicMock(return_value=database)
+        col = db.LazyCollection("queries", getter)
+        getter.assert_not_called()
+
+        col.find_one({"user_id": "u1"})
+        database.__getitem__.assert_called_with("queries")
+        database.__getitem__.return_value.find_one.assert_called_once_with({"user_id": "u1"})
+
+    def test_close_without_client_is_noop(self):
+        with patch.object(db, "_client", None):
+            db.close_client()
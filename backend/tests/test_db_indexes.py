@@ -0,0 +1,94 @@
+"""
+Tests for services/db_indexes.py.
+"""
+from unittest.mock import MagicMock
+
+from backend.services import db_indexes
+from backend.services.db_indexes import REQUIRED_INDEXES, bootstrap_indexes, ensure_indexes, missing_indexes
+
+
+def _collections(existing=None):
+    """MagicMock collections whose index_information() reflects `existing` specs."""
+    existing = existing or []
+    cols = {}
+    for name in {spec.collection for spec in REQUIRED_INDEXES}:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for spec in existing:
+            if spec.collection == name:
+                info[spec.name] = {"key": list(spec.keys), "unique": spec.unique} if spec.unique else {"key": list(spec.keys)}
+                if spec.expire_after_seconds is not None:
+                    info[spec.name]["expireAfterSeconds"] = spec.expire_after_seconds
+        col = MagicMock()
+        col.index_information.return_value = info
+        cols[name] = col
+    return cols
+
+
+class TestIndexManager:
+    """Test cases for required index detection and creation."""
+
+    def test_all_missing_on_empty_database(self):
+        assert missing_indexes(_collections()) == REQUIRED_INDEXES
+
+    def test_nothing_missing_when_present(self):
+        assert missing_indexes(_collections(REQUIRED_INDEXES)) == []
+
+    def test_non_unique_index_does_not_satisfy_unique_spec(self):
+        profiles = next(s for s in REQUIRED_INDEXES if s.collection == "user_profiles")
+        cols = _collections([s for s in REQUIRED_INDEXES if s is not profiles])
+        cols["user_profiles"].index_information.return_value["user_id_1"] = {"key": [("user_id", 1)]}
+        assert missing_indexes(cols) == [profiles]
+
+    def test_ensure_creates_only_missing(self):
+        present = [s for s in REQUIRED_INDEXES if s.collection != "interactions"]
+        cols = _collections(present)
+        summary = ensure_indexes(cols)
+
+        assert summary == {
+            "created": ["interactions.user_id_1_timestamp_1", "interactions.user_id_1_clicked_url_1_action_type_1"],
+            "failed": [],
+        }
+        cols["interactions"].create_index.assert_any_call(
+            [("user_id", 1), ("clicked_url", 1), ("action_type", 1)],
+            name="user_id_1_clicked_url_1_action_type_1", unique=False,
+        )
+        cols["users"].create_index.assert_not_called()
+
+    def test_failure_does_not_stop_other_indexes(self):
+        cols = _collections()
+        cols["users"].create_index.side_effect = Exception("E11000 duplicate key")
+        summary = ensure_indexes(cols)
+        assert summary["failed"] == ["users.username_1"]
+        assert len(summary["created"]) == len(REQUIRED_INDEXES) - 1
+
+    def test_verify_mode_warns_without_creating(self, monkeypatch):
+        warning = MagicMock()
+        monkeypatch.setattr(db_indexes.logger, "warning", warning)
+        cols = _collections()
+        bootstrap_indexes("verify", cols)
+        assert warning.called
+        for col in cols.values():
+            col.create_index.assert_not_called()
+
+    def test_bootstrap_never_raises(self):
+        cols = _collections()
+        cols["queries"].index_information.side_effect = Exception("connection refused")
+        bootstrap_indexes("create", cols)
+
+    def test_bootstrap_logs_summary(self, monkeypatch):
+        info = MagicMock()
+        monkeypatch.setattr(db_indexes.logger, "info", info)
+        bootstrap_indexes("create", _collections())
+        assert info.call_args.kwargs["extra"]["created_indexes"]
+
+    def test_ttl_index_needs_matching_expiry(self, monkeypatch):
+        ttl = db_indexes.IndexSpec("queries", (("timestamp", 1),), expire_after_seconds=86400)
+        monkeypatch.setattr(db_indexes, "REQUIRED_INDEXES", [ttl])
+        cols = _collections()
+        cols["queries"].index_information.return_value["timestamp_1"] = {"key": [("timestamp", 1)]}
+        assert missing_indexes(cols) == [ttl]
+
+        ensure_indexes(cols)
+        cols["queries"].create_index.assert_called_once_with(
+            [("timestamp", 1)], name="timestamp_1", unique=False, expireAfterSeconds=86400,
+        )
@@ -0,0 +1,157 @@
+"""
+Tests for services/event_rollups.py and the rollup-aware profile builder.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.services import event_rollups
+from backend.services import user_profile_service as ups
+from backend.services.event_rollups import rollup_user, rollup_users
+
+
+def _matches(doc, filt):
+    for key, cond in filt.items():
+        if key == "$or":
+            if not any(_matches(doc, branch) for branch in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, bound in cond.items():
+                if type(value) is not type(bound):
+                    return False
+                if op == "$gte" and not value >= bound:
+                    return False
+                if op == "$lt" and not value < bound:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    """In-memory stand-in for the few pymongo calls the rollup job makes."""
+
+    def __init__(self, docs=None):
+        self.docs = [dict(d) for d in docs or []]
+
+    def find(self, filt=None):
+        return [dict(d) for d in self.docs if _matches(d, filt or {})]
+
+    def find_one(self, filt):
+        found = self.find(filt)
+        return found[0] if found else None
+
+    def replace_one(self, filt, doc, upsert=False):
+        self.docs = [d for d in self.docs if not _matches(d, filt)]
+        self.docs.append({**filt, **doc})
+
+    def update_one(self, filt, update, upsert=False):
+        existing = self.find_one(filt)
+        if existing is None:
+            self.docs.append(dict(update["$set"]))
+            return
+        for d in self.docs:
+            if _matches(d, filt):
+                d.update(update["$set"])
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Fake collections shared by the rollup job and the profile builder."""
+    cols = {
+        "queries": FakeCollection(),
+        "interactions": FakeCollection(),
+        "event_rollups": FakeCollection(),
+        "rollup_watermarks": FakeCollection(),
+    }
+    for module in (event_rollups, ups):
+        monkeypatch.setattr(module, "queries_col", cols["queries"])
+        monkeypatch.setattr(module, "interactions_col", cols["interactions"])
+        monkeypatch.setattr(module, "event_rollups_col", cols["event_rollups"])
+        monkeypatch.setattr(module, "rollup_watermarks_col", cols["rollup_watermarks"])
+    return cols
+
+
+def _history(now):
+    """Old sessions (some straddling day boundaries), a session near the horizon, and recent events."""
+    queries, clicks = [], []
+    spans = [
+        (now - timedelta(days=200, hours=3), ["python asyncio tutorial", "asyncio tutorial examples", "python asyncio"]),
+        (now - timedelta(days=150, minutes=-23 * 60 - 50), ["rust borrow checker", "rust lifetimes"]),
+        (now - timedelta(days=120), ["mongodb index", "mongodb aggregation", "mongodb index"]),
+        # Starts before the 90-day horizon and continues past it
+        (now - timedelta(days=90, minutes=20), ["kubernetes ingress", "kubernetes helm", "helm charts"]),
+        (now - timedelta(days=5), ["python packaging", "pyproject toml"]),
+        (now - timedelta(minutes=5), ["python asyncio"]),
+    ]
+    for start, texts in spans:
+        for i, text in enumerate(texts):
+            ts = start + timedelta(minutes=10 * i)
+            queries.append({"user_id": "alice", "raw_text": text, "timestamp": ts})
+            clicks.append({"user_id": "alice", "clicked_url": f"https://{text.split()[0]}.org/x",
+                           "rank": i + 1, "timestamp": ts + timedelta(seconds=30)})
+    return queries, clicks
+
+
+def _scores(user_id="alice"):
+    """Profile scores the way build_user_profile computes them."""
+    watermark, rollups = ups._load_rollups(user_id)
+    keywords, history = ups.aggregate_queries(user_id, since=watermark)
+    clicks = ups.aggregate_clicks(user_id, since=watermark)
+    ups._merge_rollups(keywords, history, clicks, rollups)
+    return keywords, sorted(history), clicks
+
+
+class TestEventRollups:
+    """Test cases for compacting old events into daily rollups."""
+
+    def test_rollup_scores_match_raw_scores(self, store):
+        queries, clicks = _history(datetime.now(timezone.utc))
+        store["queries"].docs, store["interactions"].docs = queries, clicks
+        raw_keywords, raw_history, raw_clicks = _scores()
+
+        summary = rollup_user("alice", horizon_days=90)
+        assert summary["queries"] == 8
+        keywords, history, clicks_scores = _scores()
+
+        assert keywords == pytest.approx(raw_keywords)
+        assert history == raw_history
+        assert clicks_scores == pytest.approx(raw_clicks)
+
+    def test_session_across_horizon_is_left_raw(self, store):
+        now = datetime.now(timezone.utc)
+        queries, clicks = _history(now)
+        store["queries"].docs, store["interactions"].docs = queries, clicks
+
+        rollup_user("alice", now=now, horizon_days=90)
+
+        mark = store["rollup_watermarks"].find_one({"user_id": "alice"})
+        assert mark["until"] == now - timedelta(days=90, minutes=20)
+        rolled_tokens = {t for r in store["event_rollups"].docs for t, _w in r["tokens"]}
+        assert "kubernetes" not in rolled_tokens
+        assert "rust" in rolled_tokens
+
+    def test_rerun_is_incremental_and_idempotent(self, store):
+        now = datetime.now(timezone.utc)
+        queries, clicks = _history(now)
+        store["queries"].docs, store["interactions"].docs = queries, clicks
+
+        rollup_user("alice", now=now, horizon_days=90)
+        rollups = len(store["event_rollups"].docs)
+        assert rollup_user("alice", now=now, horizon_days=90) == {"queries": 0, "clicks": 0, "days": 0}
+        assert len(store["event_rollups"].docs) == rollups
+
+        # A later run only picks up what crossed the horizon since
+        summary = rollup_user("alice", now=now + timedelta(days=1), horizon_days=90)
+        assert summary["queries"] == 3
+
+    def test_disabled_and_failures(self, store, monkeypatch):
+        assert rollup_users(["alice"], horizon_days=0) == {"users": 0, "queries": 0, "clicks": 0, "failed": 0}
+
+        def boom(user_id, horizon_days=None):
+            raise RuntimeError("mongo down")
+
+        monkeypatch.setattr(event_rollups, "rollup_user", boom)
+        assert rollup_users(["alice", "bob"], horizon_days=90)["failed"] == 2
@@ -0,0 +1,101 @@
+"""
+Tests for services/expansion_gate.py – should_expand and learned rules.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+from backend.services import expansion_gate
+from backend.services.expansion_gate import should_expand
+
+
+class TestShouldExpand:
+    """Test cases for the cheap pre-expansion rules."""
+
+    @pytest.mark.parametrize("query,reason", [
+        ("https://docs.python.org/3/library/asyncio.html", "url"),
+        ("github.com/psf/requests", "url"),
+        ('"to be or not to be"', "quoted_phrase"),
+        ("youtube", "navigational"),
+        ("Gmail login", "navigational"),
+        ("one two three four five six seven eight nine ten eleven twelve thirteen", "long_query"),
+        ("python asyncio gather cancellation", "keyword_dense"),
+    ])
+    def test_skips_queries_that_cannot_benefit(self, query, reason):
+        assert should_expand(query) == (False, reason)
+
+    @pytest.mark.parametrize("query", [
+        "jaguar",
+        "how do i learn python",
+        "best laptop for students",
+    ])
+    def test_expands_ambiguous_or_short_queries(self, query):
+        assert should_expand(query) == (True, "expand")
+
+    def test_disabled_gate_always_expands(self):
+        with patch.object(expansion_gate, "GATE_ENABLED", False):
+            assert should_expand("youtube") == (True, "gate_disabled")
+
+
+class TestLearnedRules:
+    """Test cases for rules learned from past queries."""
+
+    def test_refresh_learns_unchanged_queries(self):
+        mock_col = MagicMock()
+        mock_col.aggregate.return_value = [
+            {"_id": "weather toronto", "total": 6, "unchanged": 6},
+            {"_id": "jaguar", "total": 6, "unchanged": 1},
+            {"_id": "rare query", "total": 1, "unchanged": 1},
+        ]
+
+        with patch.object(expansion_gate, "queries_col", mock_col), \
+             patch.object(expansion_gate, "GATE_LEARNED", True), \
+             patch.object(expansion_gate, "_learned_queries", set()), \
+             patch.object(expansion_gate, "_learned_max_tokens", None):
+            summary = expansion_gate.refresh_learned_rules()
+
+            assert summary["learned_queries"] == 1
+            assert should_expand("weather toronto") == (False, "learned_unchanged")
+            assert should_expand("jaguar") == (True, "expand")
+            assert should_expand("rare query") == (True, "expand")
+
+    def test_refresh_learns_long_query_threshold(self):
+        mock_col = MagicMock()
+        mock_col.aggregate.return_value = [
+            {"_id": "a b c d e f g", "total": 5, "unchanged": 5},
+            {"_id": "a b c d e f", "total": 5, "unchanged": 5},
+            {"_id": "a b c d e", "total": 5, "unchanged": 1},
+        ]
+
+        with patch.object(expansion_gate, "queries_col", mock_col), \
+             patch.object(expansion_gate, "GATE_LEARNED", True), \
+             patch.object(expansion_gate, "_learned_queries", set()), \
+             patch.object(expansion_gate, "_learned_max_tokens", None):
+            summary = expansion_gate.refresh_learned_rules()
+
+            assert summary["learned_max_tokens"] == 5
+            assert should_expand("where can i buy some cheap shoes") == (False, "learned_long_query")
+
+    def test_refresh_learns_only_from_real_llm_rows(self):
+        from datetime import datetime, timezone
+        from backend.services.memory_db import MemoryCollection
+
+        queries = MemoryCollection("queries")
+        now = datetime.now(timezone.utc)
+        rows = [("weather toronto", "llm")] * 5 + [("jaguar", source) for source in
+                ("latency_budget", "load_shed", "circuit_open", "gate", "cache", "disabled")] * 5
+        queries.insert_many([
+            {"raw_text": text, "enhanced_text": text, "expansion_source": source, "timestamp": now}
+            for text, source in rows
+        ])
+        # Rows logged before expansion_source existed are not evidence either
+        queries.insert_many([{"raw_text": "legacy", "enhanced_text": "legacy", "timestamp": now} for _ in range(5)])
+
+        with patch.object(expansion_gate, "queries_col", queries), \
+             patch.object(expansion_gate, "GATE_LEARNED", True), \
+             patch.object(expansion_gate, "_learned_queries", set()), \
+             patch.object(expansion_gate, "_learned_max_tokens", None):
+            summary = expansion_gate.refresh_learned_rules()
+
+            assert summary["learned_queries"] == 1
+            assert should_expand("weather toronto") == (False, "learned_unchanged")
+            assert should_expand("jaguar") == (True, "expand")
@@ -0,0 +1,106 @@
+"""
+Tests for services/guest_sessions.py and guest isolation in search / rebuilds.
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+from backend.services.guest_sessions import GuestSessionStore, purge_guest_history, is_guest
+
+
+class TestGuestSessionStore:
+    """Test cases for per-session guest profiles."""
+
+    def test_sessions_are_isolated(self):
+        store = GuestSessionStore(ttl=60, max_sessions=10)
+        store.record_query("s1", "python decorators")
+        store.record_click("s1", "https://docs.python.org/3/")
+        store.record_query("s2", "sourdough bread")
+
+        s1 = store.profile("s1")["implicit_interests"]
+        assert "python" in s1 and "sourdough" not in s1
+        assert store.insight("s1")["click_history_size"] == 1
+        assert "sourdough" in store.profile("s2")["implicit_interests"]
+
+    def test_no_session_id_is_not_tracked(self):
+        store = GuestSessionStore(ttl=60, max_sessions=10)
+        store.record_query(None, "python")
+        store.record_query("x" * 500, "python")
+        assert len(store) == 0
+        assert store.profile(None) is None
+
+    def test_resolve_id_keeps_valid_and_issues_new(self):
+        store = GuestSessionStore(ttl=60, max_sessions=10)
+        assert store.resolve_id("s1") == "s1"
+        issued = {store.resolve_id(None), store.resolve_id(""), store.resolve_id("x" * 500)}
+        assert len(issued) == 3
+        assert all(store._valid(sid) for sid in issued)
+
+    def test_idle_sessions_expire_and_lru_is_bounded(self):
+        store = GuestSessionStore(ttl=0, max_sessions=2)
+        store.record_query("s1", "python")
+        assert store.profile("s1") is None
+
+        store.ttl = 60
+        for sid in ("a", "b", "c"):
+            store.record_query(sid, "python")
+        assert len(store) == 2
+        assert store.profile("a") is None
+
+
+class TestGuestIsolation:
+    """Test cases for keeping guests out of stored profiles."""
+
+    def test_is_guest(self):
+        assert is_guest("guest") and is_guest(None) and is_guest("")
+        assert not is_guest("u1")
+
+    def test_guest_search_never_reads_stored_profile(self):
+        from backend.services import search_service
+
+        results = [{"title": "a", "link": "https://a.com", "snippet": ""}]
+        profiles = MagicMock()
+        with patch.object(search_service, "search_google", return_value=results), \
+             patch.object(search_service, "user_profiles_col", profiles):
+            assert search_service.search("q", user_id="guest") == results
+        profiles.find_one.assert_not_called()
+
+    def test_guest_search_reranks_with_session_profile(self):
+        from backend.services import search_service
+
+        results = [
+            {"title": "cooking", "link": "https://food.com", "snippet": ""},
+            {"title": "python tutorial", "link": "https://py.org", "snippet": ""},
+        ]
+        session_profile = {"implicit_interests": {"python": 5.0}, "explicit_interests": []}
+        with patch.object(search_service, "search_google", return_value=results):
+            ranked = search_service.search("q", user_id="guest", session_profile=session_profile)
+        assert ranked[0]["link"] == "https://py.org"
+
+    @patch("backend.background_tasks.background_tasks.build_user_profile")
+    @patch("backend.background_tasks.background_tasks.queries_col")
+    def test_rebuild_skips_guest(self, mock_queries_col, mock_build):
+        from backend.background_tasks.background_tasks import ProfileRebuildThread
+
+        mock_queries_col.distinct.return_value = ["guest", "u1", None]
+        ProfileRebuildThread()._rebuild_all_profiles()
+        mock_build.assert_called_once_with("u1")
+
+    def test_purge_deletes_old_guest_rows(self):
+        from backend.services import guest_sessions
+
+        queries, interactions, profiles = MagicMock(), MagicMock(), MagicMock()
+        with patch.object(guest_sessions, "queries_col", queries), \
+             patch.object(guest_sessions, "interactions_col", interactions), \
+             patch.object(guest_sessions, "user_profiles_col", profiles):
+            purge_guest_history(retention_days=7)
+            filt = queries.delete_many.call_args.args[0]
+            assert filt["user_id"] == "guest"
+            native, legacy = (branch["timestamp"]["$lt"] for branch in filt["$or"])
+            assert isinstance(native, datetime) and isinstance(legacy, str)
+            interactions.delete_many.assert_called_once()
+            profiles.delete_many.assert_called_once_with({"user_id": "guest"})
+
+            queries.reset_mock()
+            purge_guest_history(retention_days=0)
+            queries.delete_many.assert_not_called()
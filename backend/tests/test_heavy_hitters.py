@@ -0,0 +1,76 @@
+"""
+Tests for services/heavy_hitters.py and the expansion prewarm loop.
+"""
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from backend.services.heavy_hitters import HeavyHitters, CountMinSketch
+
+
+class TestCountMinSketch:
+    """Test cases for the count-min sketch."""
+
+    def test_never_undercounts(self):
+        sketch = CountMinSketch(width=16, depth=3)
+        for i in range(50):
+            sketch.add(f"q{i}")
+        for _ in range(7):
+            sketch.add("hot")
+        assert sketch.estimate("hot") >= 7
+
+    def test_decay_halves_counts(self):
+        sketch = CountMinSketch(width=64, depth=2)
+        sketch.add("x", 10)
+        sketch.decay()
+        assert sketch.estimate("x") == 5
+
+
+class TestHeavyHitters:
+    """Test cases for the top-K tracker."""
+
+    def test_top_is_ordered_by_frequency(self):
+        hh = HeavyHitters(k=3, width=256, depth=4)
+        for q, n in [("python", 5), ("Rust  ", 3), ("go", 1), ("java", 2)]:
+            for _ in range(n):
+                hh.record(q)
+
+        top = hh.top()
+        assert [q for q, _ in top] == ["python", "rust", "java"]
+
+    def test_new_hitter_evicts_coldest(self):
+        hh = HeavyHitters(k=2, width=256, depth=4)
+        hh.record("a")
+        hh.record("b")
+        for _ in range(3):
+            hh.record("c")
+
+        keys = {q for q, _ in hh.top()}
+        assert "c" in keys
+        assert len(keys) == 2
+
+    def test_empty_query_ignored(self):
+        hh = HeavyHitters(k=2)
+        hh.record("   ")
+        assert hh.top() == []
+
+
+class TestPrewarmHotQueries:
+    """Test cases for the background prewarm pass."""
+
+    async def test_prewarms_hot_queries_within_budget(self):
+        from backend.background_tasks import background_tasks
+
+        hh = HeavyHitters(k=10, width=256, depth=4)
+        for q, n in [("jaguar", 9), ("mercury", 8), ("python", 7), ("rare", 1)]:
+            for _ in range(n):
+                hh.record(q)
+
+        expand = AsyncMock(return_value={"expanded_query": "x", "insight": {"cache_status": "MISS"}})
+        with patch.object(background_tasks, "heavy_hitters", hh), \
+             patch("backend.services.semantic_expansion.expand_query", expand):
+            started = await background_tasks.prewarm_hot_queries(budget=2)
+
+        assert started == 2
+        called = [c.args[0] for c in expand.await_args_list]
+        assert called == ["jaguar", "mercury"]
+        assert all(c.kwargs["semantic_mode"] == "clarify_only" for c in expand.await_args_list)
@@ -0,0 +1,141 @@
+"""
+Tests for services/logger.py – asynchronous logging pipeline.
+"""
+import logging
+
+from backend.services.logger import AsyncLogPipeline
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def _logger(name, pipeline):
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+class TestAsyncLogPipeline:
+    """Test cases for the queue-based logging pipeline."""
+
+    def test_shutdown_flushes_queued_records(self):
+        target = _ListHandler()
+        pipeline = AsyncLogPipeline([target], queue_size=100)
+        pipeline.start()
+        logger = _logger("test.async.flush", pipeline)
+
+        for i in range(20):
+            logger.info("record %d", i)
+        pipeline.stop()
+
+        assert target.messages == [f"record {i}" for i in range(20)]
+
+    def test_full_queue_drops_and_counts(self):
+        target = _ListHandler()
+        pipeline = AsyncLogPipeline([target], queue_size=2, block_ms=0)
+        logger = _logger("test.async.drop", pipeline)
+        pipeline.handler.fallback = None  # enqueue without a running listener
+
+        for i in range(5):
+            logger.info("record %d", i)
+
+        assert pipeline.stats()["dropped"] == {"INFO": 3}
+        assert pipeline.queue.qsize() == 2
+
+    def test_mutable_args_are_formatted_eagerly(self):
+        target = _ListHandler()
+        pipeline = AsyncLogPipeline([target], queue_size=10)
+        logger = _logger("test.async.args", pipeline)
+        pipeline.handler.fallback = None
+
+        items = ["a"]
+        logger.info("items=%s n=%d", items, 1)
+        items.append("b")
+        pipeline.start()
+        pipeline.stop()
+
+        assert target.messages == ["items=['a'] n=1"]
+
+    def test_logging_after_stop_is_synchronous(self):
+        target = _ListHandler()
+        pipeline = AsyncLogPipeline([target], queue_size=10)
+        pipeline.start()
+        pipeline.stop()
+        logger = _logger("test.async.after", pipeline)
+
+        logger.warning("late")
+
+        assert target.messages == ["late"]
+
+
+def _record(level=logging.INFO, lineno=10, name="backend.services.query_cache"):
+    return logging.LogRecord(name, level, "/x.py", lineno, "msg", (), None)
+
+
+class TestHotPathFilter:
+    """Test cases for per-call-site sampling and rate limiting."""
+
+    def test_token_bucket_limits_each_call_site(self):
+        from backend.services.logger import HotPathFilter
+
+        f = HotPathFilter(rate_per_second=0.001, burst=2)
+        passed = [f.filter(_record()) for _ in range(5)]
+        assert passed == [True, True, False, False, False]
+        # a different call site has its own bucket
+        assert f.filter(_record(lineno=11)) is True
+        assert f.total_suppressed == 3
+
+    def test_warnings_and_bypass_always_pass(self):
+        from backend.services.logger import HotPathFilter
+
+        f = HotPathFilter(sample_rates={"backend": 0.0}, rate_per_second=0.001, burst=1)
+        assert f.filter(_record(level=logging.WARNING)) is True
+        assert f.filter(_record()) is False
+        assert HotPathFilter(sample_rates={"backend": 0.0}, bypass=True).filter(_record()) is True
+
+    def test_sample_rate_uses_longest_prefix(self):
+        from backend.services.logger import HotPathFilter
+
+        f = HotPathFilter(sample_rates={"backend": 0.0, "backend.services.query_cache": 1.0}, rate_per_second=0)
+        assert f.filter(_record()) is True
+        assert f.filter(_record(name="backend.services.other")) is False
+
+    def test_suppressed_count_reported_with_extras(self):
+        from backend.services.logger import HotPathFilter, ExtraFormatter
+
+        f = HotPathFilter(sample_rates={"backend": 0.0})
+        f.filter(_record())
+        f.sample_rates = {}
+        record = _record()
+        record.user_id = "u1"
+        assert f.filter(record) is True
+        assert ExtraFormatter("%(message)s").format(record) == "msg (user_id=u1) [+1 suppressed]"
+
+    def test_filter_is_limited_to_hot_path_loggers(self):
+        from backend.services.logger import AppLogger, hot_path_filter
+
+        plain = AppLogger.get_logger("test.hotpath.module")
+        hot = AppLogger.get_hot_path_logger("test.hotpath.module")
+
+        assert hot.name == "test.hotpath.module.hot"
+        assert hot_path_filter in hot.filters and hot.propagate is False
+        assert hot_path_filter not in plain.filters
+        assert AppLogger.get_hot_path_logger("test.hotpath.module") is hot
+
+    def test_debug_level_turns_sampling_off(self):
+        from unittest.mock import patch
+        from backend.services import logger as logger_module
+
+        assert logger_module._bypass_sampling(logging.DEBUG) is True
+        assert logger_module._bypass_sampling(logging.INFO) is False
+        with patch.object(logger_module, "LOG_SAMPLING_DISABLED", True):
+            assert logger_module._bypass_sampling(logging.INFO) is True
+        assert logger_module.hot_path_filter.bypass == logger_module._bypass_sampling(logger_module.LOG_LEVEL)
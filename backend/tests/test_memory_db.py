@@ -0,0 +1,184 @@
+"""
+Tests for the in-memory database backend (services/memory_db.py).
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.models.data_models import timestamp_filter
+from backend.services import db, async_db, memory_db
+from backend.services.memory_db import MemoryDatabase, MemoryCollection
+
+
+@pytest.fixture
+def col():
+    return MemoryCollection("things")
+
+
+class TestMemoryQueries:
+    """Test cases for filters, projections and cursors."""
+
+    def test_filters(self, col):
+        col.insert_many([
+            {"_id": 1, "user_id": "a", "n": 1, "tags": ["x", "y"], "meta": {"lang": "en"}},
+            {"_id": 2, "user_id": "a", "n": 5.0, "tags": ["z"]},
+            {"_id": 3, "user_id": "b", "n": "5"},
+        ])
+        ids = lambda filt: sorted(d["_id"] for d in col.find(filt))
+
+        assert ids({"user_id": "a"}) == [1, 2]
+        assert ids({"tags": "y"}) == [1]
+        assert ids({"meta.lang": "en"}) == [1]
+        assert ids({"n": {"$gte": 2}}) == [2]          # strings never compare with numbers
+        assert ids({"n": 5}) == [2]                    # 5 == 5.0
+        assert ids({"n": {"$type": "string"}}) == [3]
+        assert ids({"meta": {"$exists": False}}) == [2, 3]
+        assert ids({"$or": [{"user_id": "b"}, {"tags": {"$in": ["x"]}}]}) == [1, 3]
+        assert ids({"user_id": {"$ne": "a"}, "tags": None}) == [3]
+
+        with pytest.raises(NotImplementedError):
+            col.find_one({"$where": "this.n > 1"})
+
+    def test_timestamp_filter_matches_only_native_branch_for_datetimes(self, col):
+        now = datetime.now(timezone.utc)
+        col.insert_many([
+            {"_id": "new", "timestamp": now},
+            {"_id": "naive", "timestamp": (now - timedelta(days=3)).replace(tzinfo=None)},
+            {"_id": "legacy", "timestamp": (now - timedelta(days=2)).isoformat()},
+        ])
+        found = {d["_id"] for d in col.find(timestamp_filter(lt=now - timedelta(days=1)))}
+        assert found == {"naive", "legacy"}
+
+    def test_projection_slice_sort_limit(self, col):
+        col.insert_many([{"_id": i, "h": list(range(10)), "x": i % 3} for i in range(5)])
+
+        doc = col.find_one({"_id": 2}, {"h": {"$slice": [2, 3]}})
+        assert doc == {"_id": 2, "h": [2, 3, 4], "x": 2}
+        assert col.find_one({"_id": 2}, {"x": 1, "_id": 0}) == {"x": 2}
+        assert col.find_one({"_id": 2}, {"h": 0}) == {"_id": 2, "x": 2}
+
+        rows = list(col.find({}, {"x": 1}).sort([("x", -1), ("_id", 1)]).skip(1).limit(2))
+        assert [r["_id"] for r in rows] == [1, 4]
+
+    def test_computed_projection_pages_object(self, col):
+        col.insert_one({"_id": 1, "scores": {"a": 3, "b": 2, "c": 1}, "other": True})
+        doc = col.find_one({"_id": 1}, {"_id": 0, "scores": {"$arrayToObject": {
+            "$slice": [{"$objectToArray": "$scores"}, 1, 5]
+        }}})
+        assert doc == {"scores": {"b": 2, "c": 1}}
+
+    def test_results_are_copies(self, col):
+        col.insert_one({"_id": 1, "items": [1]})
+        col.find_one({"_id": 1})["items"].append(2)
+        assert col.find_one({"_id": 1})["items"] == [1]
+
+    def test_aggregate_group_pipeline(self, col):
+        col.insert_many([
+            {"raw_text": "Python", "enhanced_text": "Python", "timestamp": 1},
+            {"raw_text": "python", "enhanced_text": "python tutorial", "timestamp": 2},
+            {"raw_text": "rust", "enhanced_text": None, "timestamp": 3},
+        ])
+        rows = list(col.aggregate([
+            {"$match": {"enhanced_text": {"$ne": None}}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 10},
+            {"$group": {
+                "_id": {"$toLower": "$raw_text"},
+                "total": {"$sum": 1},
+                "unchanged": {"$sum": {"$cond": [{"$eq": ["$enhanced_text", "$raw_text"]}, 1, 0]}},
+            }},
+        ]))
+        assert rows == [{"_id": "python", "total": 2, "unchanged": 1}]
+        assert col.distinct("raw_text", {"timestamp": {"$lt": 3}}) == ["Python", "python"]
+
+
+class TestMemoryUpdates:
+    """Test cases for update operators, upserts and indexes."""
+
+    def test_update_operators_and_upsert(self, col):
+        res = col.update_one({"user_id": "u"}, {"$set": {"a.b": 1}, "$inc": {"rev": 1}}, upsert=True)
+        assert res.upserted_id is not None
+        col.update_one({"user_id": "u"}, {
+            "$push": {"hist": {"$each": [1, 2, 3], "$slice": -2}},
+            "$addToSet": {"tags": {"$each": ["x", "x", "y"]}},
+            "$inc": {"rev": 1},
+        })
+        col.update_one({"user_id": "u"}, {"$pull": {"tags": "x"}, "$unset": {"a": ""}})
+
+        doc = col.find_one({"user_id": "u"}, {"_id": 0})
+        assert doc == {"user_id": "u", "rev": 2, "hist": [2, 3], "tags": ["y"]}
+        assert col.update_one({"user_id": "nobody"}, {"$set": {"x": 1}}).matched_count == 0
+
+    def test_array_filters_and_find_one_and_update(self, col):
+        col.insert_one({"_id": 1, "interests": [{"keyword": "ai", "weight": 1.0}, {"keyword": "ml", "weight": 1.0}]})
+
+        doc = col.find_one_and_update(
+            {"_id": 1},
+            {"$set": {"interests.$[e].weight": 3.0}, "$inc": {"rev": 1}},
+            array_filters=[{"e.keyword": "ml"}],
+            return_document=ReturnDocument.AFTER,
+        )
+        assert doc["interests"][1]["weight"] == 3.0 and doc["interests"][0]["weight"] == 1.0
+        assert doc["rev"] == 1
+
+        col.update_one({"_id": 1}, {"$pull": {"interests": {"keyword": "ai"}}})
+        assert [i["keyword"] for i in col.find_one({"_id": 1})["interests"]] == ["ml"]
+
+    def test_unique_index_and_lookups(self, col):
+        users = MemoryCollection("users")
+        users.create_index([("username", 1)], unique=True)
+        users.insert_one({"username": "alice"})
+        with pytest.raises(DuplicateKeyError):
+            users.insert_one({"username": "alice"})
+
+        col.create_index([("user_id", 1), ("timestamp", 1)], name="user_id_1_timestamp_1")
+        col.insert_many([{"user_id": f"u{i % 10}", "timestamp": i} for i in range(100)])
+        col.update_one({"user_id": "u3"}, {"$set": {"user_id": "moved"}})
+        assert col.count_documents({"user_id": "u3"}) == 9
+        assert col.count_documents({"user_id": {"$in": ["u3", "moved"]}}) == 10
+        col.delete_many({"user_id": "moved"})
+        assert col.count_documents({"user_id": "moved"}) == 0
+        assert "user_id_1_timestamp_1" in col.index_information()
+
+    def test_bulk_write(self, col):
+        col.insert_many([{"_id": 1, "t": "a"}, {"_id": 2, "t": "b"}])
+        result = col.bulk_write([
+            UpdateOne({"_id": 1, "t": "a"}, {"$set": {"t": "A"}}),
+            UpdateOne({"_id": 2, "t": "stale"}, {"$set": {"t": "B"}}),
+            UpdateOne({"_id": 3}, {"$set": {"t": "c"}}, upsert=True),
+        ], ordered=False)
+        assert (result.modified_count, result.upserted_count) == (1, 1)
+        assert [d["t"] for d in col.find({}).sort("_id", 1)] == ["A", "b", "c"]
+
+
+class TestMemoryBackend:
+    """Test cases for DB_BACKEND=memory wiring."""
+
+    async def test_sync_and_async_handles_share_documents(self):
+        database = MemoryDatabase("test")
+        with patch.object(db, "DB_BACKEND", "memory"), \
+             patch.object(async_db, "DB_BACKEND", "memory"), \
+             patch.object(db, "get_memory_db", return_value=database), \
+             patch.object(async_db, "get_async_memory_db", return_value=memory_db.AsyncMemoryDatabase(database)), \
+             patch.object(db, "MongoClient") as mongo_client:
+            queries = db.LazyCollection("queries", db.get_db)
+            async_queries = db.LazyCollection("queries", async_db.get_async_db)
+
+            queries.insert_one({"user_id": "alice", "raw_text": "python"})
+            await async_queries.insert_one({"user_id": "alice", "raw_text": "rust"})
+
+            docs = await async_queries.find({"user_id": "alice"}, {"_id": 0}).sort("raw_text", 1).to_list(None)
+            assert [d["raw_text"] for d in docs] == ["python", "rust"]
+            assert await async_queries.count_documents({}) == 2
+            mongo_client.assert_not_called()
+
+    def test_seed_file(self, tmp_path):
+        from bson import json_util
+        seed = tmp_path / "seed.json"
+        seed.write_text(json_util.dumps({"users": [{"username": "alice", "created": datetime(2026, 1, 1)}]}))
+        with patch.object(memory_db, "MEMORY_DB_SEED", str(seed)), patch.dict(memory_db._databases, clear=True):
+            users = memory_db.get_memory_db("seeded")["users"]
+            assert users.find_one({"username": "alice"})["created"] == datetime(2026, 1, 1)
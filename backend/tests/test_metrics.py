@@ -0,0 +1,89 @@
+"""
+Tests for services/metrics.py and the /metrics endpoint.
+"""
+from unittest.mock import MagicMock
+
+from backend.services.metrics import Registry, MongoCommandMetrics, mongo_command_duration
+
+
+class TestMetricTypes:
+    """Test cases for counters, gauges and histograms in Prometheus text format."""
+
+    def test_counter_and_gauge_render(self):
+        registry = Registry()
+        hits = registry.counter("cache_lookups_total", "Lookups.", ("result",))
+        size = registry.gauge("cache_entries", "Entries.", callback=lambda: 7)
+        hits.inc(result="HIT")
+        hits.inc(2, result="MISS")
+
+        text = registry.render()
+        assert "# TYPE cache_lookups_total counter" in text
+        assert 'cache_lookups_total{result="HIT"} 1' in text
+        assert 'cache_lookups_total{result="MISS"} 2' in text
+        assert "cache_entries 7" in text
+        assert size.value() == 7
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram("op_seconds", "Latency.", ("op",), buckets=(0.1, 1.0))
+        for v in (0.05, 0.5, 5.0):
+            latency.observe(v, op="x")
+
+        text = registry.render()
+        assert 'op_seconds_bucket{op="x",le="0.1"} 1' in text
+        assert 'op_seconds_bucket{op="x",le="1"} 2' in text
+        assert 'op_seconds_bucket{op="x",le="+Inf"} 3' in text
+        assert 'op_seconds_count{op="x"} 3' in text
+
+    def test_labelled_gauge_callback(self):
+        registry = Registry()
+        state = registry.gauge("breaker_state", "State.", ("breaker", "state"))
+        state.set_function(lambda: {("ollama", "open"): 1, ("ollama", "closed"): 0})
+
+        text = registry.render()
+        assert 'breaker_state{breaker="ollama",state="open"} 1' in text
+        assert 'breaker_state{breaker="ollama",state="closed"} 0' in text
+        assert state.value(breaker="ollama", state="open") == 1
+
+    def test_mongo_listener_observes_commands(self):
+        before = mongo_command_duration.count(command="find", outcome="ok")
+        MongoCommandMetrics().succeeded(MagicMock(command_name="find", duration_micros=1500))
+        assert mongo_command_duration.count(command="find", outcome="ok") == before + 1
+
+
+class TestMetricsEndpoint:
+    """Test cases for GET /metrics."""
+
+    def test_metrics_exposes_route_latency(self, client):
+        client.get("/health")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+        assert "query_cache_entries" in response.text
+
+    async def test_metrics_exposes_llm_scheduler_and_backend_state(self, client):
+        from backend.services import semantic_expansion
+        from backend.services.metrics import llm_shed, llm_queue_wait
+
+        scheduler = semantic_expansion.LLMScheduler(max_concurrency=1, shed_queue_depth=1)
+        shed_before = llm_shed.value()
+        waits_before = llm_queue_wait.count(priority="prewarm")
+
+        async def call():
+            return "ok"
+
+        await scheduler.run(call, priority=semantic_expansion.PRIORITY_PREWARM)
+        scheduler._heap.append(object())  # one queued waiter
+        assert scheduler.should_shed()
+
+        assert llm_shed.value() == shed_before + 1
+        assert llm_queue_wait.count(priority="prewarm") == waits_before + 1
+
+        text = client.get("/metrics").text
+        assert "llm_queue_depth " in text
+        assert "llm_active_calls " in text
+        assert 'circuit_breaker_state{breaker="ollama",state="closed"}' in text
+        assert "ollama_endpoint_outstanding{endpoint=" in text
+        assert "ollama_endpoint_ejected{endpoint=" in text
@@ -0,0 +1,86 @@
+"""
+Tests for scripts/migrate_timestamps.py.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from backend.scripts.migrate_timestamps import migrate_collection
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection: string-typed find by _id order and bulk_write."""
+
+    def __init__(self, docs):
+        self.docs = {d["_id"]: dict(d) for d in docs}
+        self.bulk_calls = 0
+
+    def find(self, filt, projection=None):
+        field = next(k for k in filt if k != "_id")
+        after = filt.get("_id", {}).get("$gt")
+        rows = sorted(
+            (d for d in self.docs.values()
+             if isinstance(d.get(field), str) and (after is None or d["_id"] > after)),
+            key=lambda d: d["_id"],
+        )
+        cursor = MagicMock()
+        cursor.sort.return_value.limit.side_effect = lambda n: [dict(r) for r in rows[:n]]
+        return cursor
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_calls += 1
+        modified = 0
+        for op in ops:
+            filt, update = op._filter, op._doc
+            doc = self.docs[filt["_id"]]
+            if all(doc.get(k) == v for k, v in filt.items()):
+                doc.update(update["$set"])
+                for key, step in update.get("$inc", {}).items():
+                    doc[key] = doc.get(key, 0) + step
+                modified += 1
+        return MagicMock(modified_count=modified)
+
+
+class TestMigrateTimestamps:
+    """Test cases for chunked, resumable timestamp migration."""
+
+    def _docs(self):
+        return [
+            {"_id": "a", "timestamp": "2026-01-01T10:00:00+00:00"},
+            {"_id": "b", "timestamp": datetime(2026, 1, 2, tzinfo=timezone.utc)},
+            {"_id": "c", "timestamp": "not a date"},
+            {"_id": "d", "timestamp": "2026-01-03T10:00:00"},
+            {"_id": "e", "timestamp": "2026-01-04T10:00:00+00:00"},
+        ]
+
+    def test_converts_strings_in_batches(self):
+        col = FakeCollection(self._docs())
+        summary = migrate_collection(col, "timestamp", batch_size=2)
+
+        assert summary == {"converted": 3, "unparseable": 1, "batches": 2}
+        assert col.docs["a"]["timestamp"] == datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+        assert col.docs["d"]["timestamp"] == datetime(2026, 1, 3, 10, tzinfo=timezone.utc)
+        assert col.docs["c"]["timestamp"] == "not a date"
+
+    def test_rerun_is_noop(self):
+        col = FakeCollection(self._docs())
+        migrate_collection(col, "timestamp", batch_size=2)
+        calls = col.bulk_calls
+        assert migrate_collection(col, "timestamp", batch_size=2)["converted"] == 0
+        assert col.bulk_calls == calls
+
+    def test_dry_run_writes_nothing(self):
+        col = FakeCollection(self._docs())
+        summary = migrate_collection(col, "timestamp", batch_size=10, dry_run=True)
+        assert summary["converted"] == 3
+        assert col.bulk_calls == 0
+        assert col.docs["a"]["timestamp"] == "2026-01-01T10:00:00+00:00"
+
+    def test_profile_updates_bump_revision(self):
+        col = FakeCollection([
+            {"_id": "p1", "last_updated": "2026-01-01T10:00:00+00:00", "profile_revision": 4},
+            {"_id": "p2", "last_updated": datetime(2026, 1, 2, tzinfo=timezone.utc), "profile_revision": 2},
+        ])
+        migrate_collection(col, "last_updated", revision_field="profile_revision")
+
+        assert col.docs["p1"]["profile_revision"] == 5
+        assert col.docs["p2"]["profile_revision"] == 2
@@ -0,0 +1,154 @@
+"""
+Tests for services/model_router.py and small/large model fallback in expand_query.
+"""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from backend.services import model_router
+from backend.services.model_router import route_model, is_degenerate
+from backend.services.ollama_pool import OllamaEndpoint, OllamaPool
+from backend.services.query_cache import QueryCache
+from backend.services.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def two_models():
+    with patch.object(model_router, "MODEL_SMALL", "small"), \
+         patch.object(model_router, "MODEL_LARGE", "large"):
+        yield
+
+
+class TestRouteModel:
+    """Test cases for route_model."""
+
+    def test_single_model_when_small_unset(self):
+        with patch.object(model_router, "MODEL_SMALL", ""):
+            assert route_model("python", "clarify_only") == (model_router.MODEL_LARGE, "single_model")
+
+    def test_simple_query_goes_small(self, two_models):
+        assert route_model("python decorators", "clarify_only") == ("small", "simple_query")
+
+    def test_hard_queries_go_large(self, two_models):
+        assert route_model("python decorators", "clarify_and_personalize") == ("large", "personalized")
+        assert route_model("python vs rust", "clarify_only") == ("large", "ambiguous")
+        assert route_model("how to learn python fast", "clarify_only") == ("large", "long_query")
+
+
+class TestIsDegenerate:
+    """Test cases for is_degenerate."""
+
+    def test_detects_bad_outputs(self):
+        assert is_degenerate("", "python")
+        assert is_degenerate("Here is the expanded query: python tutorial", "python")
+        assert is_degenerate(" ".join(["word"] * 50), "python")
+
+    def test_accepts_normal_expansion(self):
+        assert not is_degenerate("python programming language tutorial", "python")
+
+
+class TestModelAffinity:
+    """Test cases for model-aware endpoint selection in OllamaPool."""
+
+    def test_prefers_endpoint_pinned_to_model(self):
+        small = OllamaEndpoint("http://a", "small")
+        large = OllamaEndpoint("http://b", "large")
+        pool = OllamaPool([small, large])
+        for _ in range(3):
+            with pool.lease(model="large") as endpoint:
+                assert endpoint is large
+
+    def test_falls_back_when_no_endpoint_serves_model(self):
+        pool = OllamaPool([OllamaEndpoint("http://a", "small")])
+        with pool.lease(model="other") as endpoint:
+            assert endpoint.url == "http://a"
+
+
+def _ollama_client(replies, calls):
+    """httpx.AsyncClient stand-in answering each model with `replies[model]`."""
+    async def post(_url, json):
+        calls.append(json["model"])
+        resp = MagicMock()
+        resp.raise_for_status.return_value = None
+        resp.json.return_value = {"response": replies[json["model"]]}
+        return resp
+
+    client = MagicMock()
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=False)
+    client.post = AsyncMock(side_effect=post)
+    return client
+
+
+async def _expand(seed, replies, cache=None):
+    from backend.services import semantic_expansion
+
+    calls = []
+    profiles = AsyncMock()
+    profiles.find_one.return_value = None
+    with patch("backend.services.semantic_expansion.httpx.AsyncClient", return_value=_ollama_client(replies, calls)), \
+         patch("backend.services.semantic_expansion.MODEL_LARGE", "large"), \
+         patch("backend.services.semantic_expansion.query_cache", cache or QueryCache(ttl=3600, canonical_policy="off")), \
+         patch("backend.services.semantic_expansion.ollama_breaker", CircuitBreaker("t")), \
+         patch("backend.services.semantic_expansion.async_user_profiles_col", profiles):
+        result = await semantic_expansion.expand_query(seed, user_id="u1")
+    return result, calls
+
+
+class TestModelFallback:
+    """Test cases for retrying degenerate small-model output on the large model."""
+
+    async def test_degenerate_small_output_retries_large(self, two_models):
+        result, calls = await _expand("python", {"small": "Sure! Here you go", "large": "python programming tutorial"})
+
+        assert calls == ["small", "large"]
+        assert result["expanded_query"] == "python programming tutorial"
+        assert result["insight"]["model"] == "large"
+        assert result["insight"]["model_route_reason"] == "simple_query"
+        assert result["insight"]["model_fallback"] is True
+
+    async def test_empty_small_output_retries_large(self, two_models):
+        result, calls = await _expand("weather", {"small": "  ", "large": "weather forecast today"})
+
+        assert calls == ["small", "large"]
+        assert result["expanded_query"] == "weather forecast today"
+        assert result["insight"]["fallback_reason"] is None
+
+    async def test_empty_output_from_both_models_falls_back_briefly(self, two_models):
+        cache = QueryCache(ttl=3600, canonical_policy="off", negative_ttl=30)
+        result, calls = await _expand("weather", {"small": "", "large": ""}, cache)
+
+        assert calls == ["small", "large"]
+        assert result["expanded_query"] == "weather"
+        assert result["insight"]["fallback_reason"] == "empty_output"
+        # Cached as a negative entry, not for the full TTL
+        assert all(entry[3] for entry in cache._store.values())
+
+    @pytest.mark.parametrize("small", ["Sure! Here you go", " ".join(["python"] * 80)])
+    async def test_degenerate_large_output_is_cached_negatively(self, two_models, small):
+        cache = QueryCache(ttl=3600, canonical_policy="off", negative_ttl=30)
+        result, _calls = await _expand("python", {"small": small, "large": "Here is the expanded query: python guide"}, cache)
+
+        assert result["expanded_query"] == "python"
+        assert result["insight"]["fallback_reason"] == "degenerate_output"
+        assert all(entry[3] for entry in cache._store.values())
+
+    async def test_large_retry_gets_its_own_queue_deadline(self, two_models):
+        import asyncio
+        import time
+        from backend.services import semantic_expansion
+
+        remaining = []
+        real_run = semantic_expansion.llm_scheduler.run
+
+        async def slow_run(call, priority, deadline):
+            remaining.append(deadline - time.monotonic())
+            await asyncio.sleep(0.08)  # the small model uses up the whole queue budget
+            return await real_run(call, priority=priority, deadline=deadline)
+
+        with patch.object(semantic_expansion, "LLM_QUEUE_DEADLINE_MS", 50), \
+             patch.object(semantic_expansion.llm_scheduler, "run", side_effect=slow_run):
+            result, _calls = await _expand("python", {"small": "", "large": "python programming"})
+
+        assert len(remaining) == 2
+        assert all(r > 0 for r in remaining)
+        assert result["expanded_query"] == "python programming"
@@ -0,0 +1,55 @@
+"""
+Tests for services/ollama_pool.py – endpoint parsing, routing and ejection.
+"""
+import pytest
+
+from backend.services.ollama_pool import OllamaPool, OllamaEndpoint, parse_endpoints
+
+
+class TestParseEndpoints:
+    """Test cases for OLLAMA_URLS parsing."""
+
+    def test_falls_back_to_single_url(self):
+        endpoints = parse_endpoints("", "http://localhost:11434/")
+        assert [(e.url, e.model) for e in endpoints] == [("http://localhost:11434", None)]
+
+    def test_parses_models(self):
+        endpoints = parse_endpoints("http://a:11434|llama3.1, http://b:11434", "http://x")
+        assert [(e.url, e.model) for e in endpoints] == [
+            ("http://a:11434", "llama3.1"),
+            ("http://b:11434", None),
+        ]
+
+
+class TestOllamaPool:
+    """Test cases for least-outstanding routing and passive ejection."""
+
+    def test_routes_to_least_outstanding(self):
+        pool = OllamaPool([OllamaEndpoint("http://a"), OllamaEndpoint("http://b")])
+        with pool.lease() as first:
+            with pool.lease() as second:
+                assert first is not second
+        assert all(e.outstanding == 0 for e in pool.endpoints)
+
+    def test_failures_eject_endpoint(self):
+        a, b = OllamaEndpoint("http://a"), OllamaEndpoint("http://b")
+        pool = OllamaPool([a, b], eject_after=2, eject_seconds=60)
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                with pool.lease(exclude=(b,)):
+                    raise RuntimeError("boom")
+
+        assert a.consecutive_failures == 2
+        for _ in range(4):
+            with pool.lease() as endpoint:
+                assert endpoint is b
+
+    def test_all_ejected_still_returns_endpoint(self):
+        a = OllamaEndpoint("http://a")
+        pool = OllamaPool([a], eject_after=1, eject_seconds=60)
+        with pytest.raises(RuntimeError):
+            with pool.lease():
+                raise RuntimeError("boom")
+        with pool.lease() as endpoint:
+            assert endpoint is a
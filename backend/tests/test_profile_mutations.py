@@ -0,0 +1,181 @@
+"""
+Tests for atomic profile edits (services/profile_mutations.py).
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from backend.services import profile_mutations
+from backend.services.memory_db import AsyncMemoryCollection, MemoryCollection
+from backend.services.profile_mutations import KeywordExistsError
+
+
+@pytest.fixture
+def profiles():
+    col = MemoryCollection("user_profiles")
+    col.insert_one({
+        "user_id": "alice",
+        "explicit_interests": [{"keyword": "Python", "weight": 1.0, "last_updated": "2026-01-01T00:00:00"}],
+        "implicit_interests": {"rust": 2.0, "cooking": 1.5, "docs.rs": 1.0},
+        "implicit_exclusions": ["gardening"],
+        "query_history": ["python", "rust", "cooking"],
+        "profile_revision": 3,
+    })
+    with patch.object(profile_mutations, "async_user_profiles_col", AsyncMemoryCollection(col)), \
+         patch.object(profile_mutations, "build_user_profile_async", new_callable=AsyncMock) as build:
+        yield col, build
+
+
+def _stored(col):
+    return col.find_one({"user_id": "alice"}, {"_id": 0})
+
+
+class TestProfileMutations:
+    """Test cases for in-place explicit/implicit interest edits."""
+
+    async def test_add_promotes_without_rebuilding(self, profiles):
+        col, build = profiles
+        profile = await profile_mutations.add_explicit_interest("alice", "Rust", 2.0)
+
+        assert [e["keyword"] for e in profile["explicit_interests"]] == ["Python", "Rust"]
+        assert "rust" not in profile["implicit_interests"]
+        assert profile["profile_revision"] == 4
+        assert "rust" not in _stored(col)["implicit_interests"]
+        assert "_id" not in profile
+        build.assert_not_awaited()
+
+    async def test_add_existing_keyword_is_rejected_case_insensitively(self, profiles):
+        col, _build = profiles
+        with pytest.raises(KeywordExistsError):
+            await profile_mutations.add_explicit_interest("alice", "PYTHON")
+        assert _stored(col)["profile_revision"] == 3
+
+    async def test_add_clears_exclusion_and_hides_domain_key(self, profiles):
+        col, _build = profiles
+        await profile_mutations.add_explicit_interest("alice", "Gardening")
+        profile = await profile_mutations.add_explicit_interest("alice", "docs.rs")
+
+        assert _stored(col)["implicit_exclusions"] == []
+        # Dotted keys cannot be unset by path; hidden until the next rebuild
+        assert "docs.rs" in _stored(col)["implicit_interests"]
+        assert "docs.rs" not in profile["implicit_interests"]
+
+    async def test_remove_and_clear_explicit(self, profiles):
+        col, _build = profiles
+        profile = await profile_mutations.remove_explicit_interest("alice", "python")
+        assert profile["explicit_interests"] == []
+        assert profile["profile_revision"] == 4
+
+        await profile_mutations.add_explicit_interest("alice", "ml")
+        profile = await profile_mutations.clear_explicit_interests("alice")
+        assert profile["explicit_interests"] == []
+        assert profile["profile_revision"] == 6
+
+    async def test_bulk_update_sets_weights_and_adds_new(self, profiles):
+        col, _build = profiles
+        profile = await profile_mutations.update_explicit_interests("alice", [
+            {"keyword": "python", "weight": 2.5},
+            {"keyword": "cooking", "weight": 0.5},
+            {"keyword": "Cooking", "weight": 0.7},
+        ])
+
+        weights = {e["keyword"]: e["weight"] for e in profile["explicit_interests"]}
+        assert weights == {"Python": 2.5, "Cooking": 0.7}
+        assert "cooking" not in profile["implicit_interests"]
+        assert profile["profile_revision"] == 5
+
+    async def test_bulk_update_retries_on_revision_conflict(self, profiles):
+        col, _build = profiles
+        real_find_one = profile_mutations.async_user_profiles_col.find_one
+        calls = {"n": 0}
+
+        async def racing_find_one(*args, **kwargs):
+            calls["n"] += 1
+            doc = await real_find_one(*args, **kwargs)
+            if calls["n"] == 1:
+                # A rebuild lands between our read and our write
+                col.update_one({"user_id": "alice"}, {"$inc": {"profile_revision": 1}})
+            return doc
+
+        with patch.object(profile_mutations.async_user_profiles_col, "find_one", racing_find_one, create=True):
+            profile = await profile_mutations.update_explicit_interests("alice", [{"keyword": "python", "weight": 9.0}])
+
+        assert profile["explicit_interests"][0]["weight"] == 9.0
+        assert profile["profile_revision"] == 5
+
+    async def test_exclusions(self, profiles):
+        col, _build = profiles
+        profile = await profile_mutations.exclude_implicit_interest("alice", "Cooking")
+        assert "cooking" not in profile["implicit_interests"]
+        assert profile["implicit_exclusions"] == ["gardening", "Cooking"]
+
+        # Excluding again changes nothing
+        again = await profile_mutations.exclude_implicit_interest("alice", "cooking")
+        assert again["profile_revision"] == profile["profile_revision"]
+
+        profile = await profile_mutations.remove_implicit_exclusion("alice", "COOKING")
+        assert profile["implicit_exclusions"] == ["gardening"]
+
+    async def test_clear_implicit_excludes_current_keys(self, profiles):
+        col, _build = profiles
+        profile = await profile_mutations.clear_implicit_interests("alice")
+        assert profile["implicit_interests"] == {}
+        assert profile["implicit_exclusions"] == ["gardening", "rust", "cooking", "docs.rs"]
+
+    async def test_first_edit_builds_missing_profile(self, profiles):
+        col, build = profiles
+
+        async def build_profile(user_id):
+            col.insert_one({"user_id": user_id, "explicit_interests": [], "implicit_interests": {},
+                            "implicit_exclusions": [], "profile_revision": 1})
+        build.side_effect = build_profile
+
+        profile = await profile_mutations.add_explicit_interest("bob", "go")
+        build.assert_awaited_once_with("bob")
+        assert profile["explicit_interests"][0]["keyword"] == "go"
+        assert profile["profile_revision"] == 2
+
+
+class TestRebuildRace:
+    """Test cases for a background rebuild running alongside an edit."""
+
+    async def test_edit_between_rebuild_read_and_write_survives(self):
+        from datetime import datetime, timezone
+        from backend.services import user_profile_service
+
+        profiles = MemoryCollection("user_profiles")
+        profiles.insert_one({"user_id": "alice", "explicit_interests": [], "implicit_interests": {},
+                             "implicit_exclusions": [], "profile_revision": 3})
+        queries = MemoryCollection("queries")
+        queries.insert_many([
+            {"user_id": "alice", "raw_text": text, "timestamp": datetime.now(timezone.utc)}
+            for text in ("python asyncio", "rust lifetimes")
+        ])
+        async_profiles = AsyncMemoryCollection(profiles)
+        real_find_one = async_profiles.find_one
+        reads = {"n": 0}
+
+        async def find_one_then_edit(*args, **kwargs):
+            doc = await real_find_one(*args, **kwargs)
+            reads["n"] += 1
+            if reads["n"] == 1:
+                # The user edits their profile while the rebuild is scoring
+                await profile_mutations.add_explicit_interest("alice", "rust")
+                await profile_mutations.exclude_implicit_interest("alice", "python")
+            return doc
+
+        with patch.object(async_profiles, "find_one", find_one_then_edit, create=True), \
+             patch.object(profile_mutations, "async_user_profiles_col", async_profiles), \
+             patch.object(user_profile_service, "async_user_profiles_col", async_profiles), \
+             patch.object(user_profile_service, "async_queries_col", AsyncMemoryCollection(queries)), \
+             patch.object(user_profile_service, "async_interactions_col",
+                          AsyncMemoryCollection(MemoryCollection("interactions"))):
+            built = await user_profile_service.build_user_profile_async("alice")
+
+        stored = profiles.find_one({"user_id": "alice"}, {"_id": 0})
+        assert [e["keyword"] for e in stored["explicit_interests"]] == ["rust"]
+        assert stored["implicit_exclusions"] == ["python"]
+        assert "python" not in stored["implicit_interests"] and "rust" not in stored["implicit_interests"]
+        assert "asyncio" in stored["implicit_interests"]
+        # 3 -> 4 (add) -> 5 (exclude) -> 6 (rebuild); no two versions share a revision
+        assert stored["profile_revision"] == 6
+        assert built["profile_revision"] == 6
@@ -2,8 +2,16 @@
 Tests for user profile routes (/profiles/*).
 """
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 from backend.api.utils import get_user_id_from_auth, require_user_id_from_auth
+from backend.services.memory_db import AsyncMemoryCollection, MemoryCollection
+
+
+def stored_profiles(*profiles):
+    """An in-memory user_profiles collection holding `profiles`."""
+    col = MemoryCollection("user_profiles")
+    col.insert_many([dict(p) for p in profiles])
+    return AsyncMemoryCollection(col)
 
 
 class TestProfileRoutes:
@@ -12,7 +20,7 @@ class TestProfileRoutes:
     def test_get_user_profile_by_id(self, client, mock_user_profile):
         """Test retrieving any user's profile by user_id."""
         # Arrange
-        with patch("backend.services.user_profile_service.build_user_profile", return_value=mock_user_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=mock_user_profile):
             
             # Act
             response = client.get("/profiles/test_user_123")
@@ -40,7 +48,7 @@ class TestProfileRoutes:
     def test_profile_endpoint_returns_correct_structure(self, client, mock_user_profile):
         """Test that profile response has the expected structure."""
         # Arrange
-        with patch("backend.services.user_profile_service.build_user_profile", return_value=mock_user_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=mock_user_profile):
             
             # Act
             response = client.get("/profiles/test_user_123")
@@ -64,7 +72,7 @@ class TestProfileRoutes:
     def test_profile_implicit_interests_as_dict(self, client, mock_user_profile):
         """Test that implicit_interests is returned as a dictionary."""
         # Arrange
-        with patch("backend.services.user_profile_service.build_user_profile", return_value=mock_user_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=mock_user_profile):
             
             # Act
             response = client.get("/profiles/test_user_123")
@@ -142,7 +150,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_a = client.get("/profiles/user_a_123")
             response_b = client.get("/profiles/user_b_456")
@@ -180,7 +188,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_b = client.get("/profiles/user_b_456")
 
@@ -208,7 +216,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_b = client.get("/profiles/user_b_456")
 
@@ -233,7 +241,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_a = client.get("/profiles/user_a_123")
             response_b = client.get("/profiles/user_b_456")
@@ -262,7 +270,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_a = client.get("/profiles/user_a_123")
             response_b = client.get("/profiles/user_b_456")
@@ -305,8 +313,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Add interest to User A
             response_add = client.post("/profiles/explicit/add", json={
@@ -348,8 +357,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Remove interest from User A
             response_remove = client.request("DELETE", "/profiles/explicit/remove", json={
@@ -391,8 +401,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Bulk update User A
             response_update = client.put("/profiles/explicit/bulk_update", json={
@@ -427,7 +438,7 @@ class TestMultiUserProfileIsolation:
                 return user_b_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_a = client.get("/profiles/user_a_123")
             response_b = client.get("/profiles/user_b_456")
@@ -453,7 +464,7 @@ class TestMultiUserProfileIsolation:
                 return user_c_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response = client.get("/profiles/guest")
 
@@ -477,7 +488,7 @@ class TestMultiUserProfileIsolation:
                 return user_c_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_auth = client.get("/profiles/user_a_123")
             response_guest = client.get("/profiles/guest")
@@ -502,7 +513,7 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[require_user_id_from_auth] = override_require_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", return_value=user_a_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=user_a_profile):
             # Act
             response = client.get("/profiles/me")
 
@@ -519,7 +530,7 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[require_user_id_from_auth] = override_require_user_id_a
         
-        with patch("backend.api.profile_routes.build_user_profile", return_value=user_a_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=user_a_profile):
             response_a = client.get("/profiles/me")
 
         # Arrange & Act - User B
@@ -528,7 +539,7 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[require_user_id_from_auth] = override_require_user_id_b
         
-        with patch("backend.api.profile_routes.build_user_profile", return_value=user_b_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", return_value=user_b_profile):
             response_b = client.get("/profiles/me")
 
         # Assert
@@ -561,8 +572,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Clear User A's explicit interests
             response_clear = client.post("/profiles/explicit/clear", json={})
@@ -600,9 +612,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
-            mock_col.find_one.return_value = user_a_profile
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Clear User A's implicit interests
             response_clear = client.post("/profiles/implicit/clear", json={})
@@ -645,9 +657,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
-            mock_col.find_one.return_value = user_a_profile
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act - Upgrade implicit interest for User A
             response_upgrade = client.put("/profiles/implicit/upgrade", json={
@@ -679,7 +691,7 @@ class TestMultiUserProfileIsolation:
                 return user_c_profile
             return None
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile):
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile):
             # Act
             response_a = client.get("/profiles/user_a_123")
             response_b = client.get("/profiles/user_b_456")
@@ -731,9 +743,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
-            mock_col.find_one.return_value = user_a_profile
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act
             response_remove = client.request("DELETE", "/profiles/implicit/remove", json={
@@ -772,9 +784,9 @@ class TestMultiUserProfileIsolation:
 
         test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
 
-        with patch("backend.api.profile_routes.build_user_profile", side_effect=mock_build_profile), \
-             patch("backend.api.profile_routes.user_profiles_col") as mock_col:
-            mock_col.find_one.return_value = user_a_profile
+        with patch("backend.api.profile_routes.build_user_profile_async", side_effect=mock_build_profile), \
+             patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles(user_a_profile, user_b_profile)) as mock_col:
             
             # Act
             response_remove = client.request("DELETE", "/profiles/implicit/exclusion/remove", json={
@@ -790,3 +802,228 @@ class TestMultiUserProfileIsolation:
         # User B's exclusions should be unchanged
         assert "backend" in data_b.get("implicit_exclusions", [])
         assert "databases" in data_b.get("implicit_exclusions", [])
+
+
+class TestConditionalProfileGet:
+    """Test cases for serving stored profiles with ETag / If-None-Match."""
+
+    @pytest.fixture
+    def stored(self):
+        return stored_profiles({
+            "user_id": "user_a_123",
+            "explicit_interests": [{"keyword": "python", "weight": 1.0, "last_updated": "2026-01-24T00:00:00"}],
+            "implicit_interests": {"machine learning": 0.9},
+            "implicit_exclusions": [],
+            "query_history": ["python tutorial"],
+            "click_history": ["docs.python.org"],
+            "profile_revision": 7,
+        })
+
+    def test_stored_profile_served_without_rebuild(self, client, stored):
+        with patch("backend.services.profile_mutations.async_user_profiles_col", stored), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock) as build:
+            response = client.get("/profiles/user_a_123")
+
+        assert response.status_code == 200
+        assert response.json()["profile_revision"] == 7
+        assert response.headers["ETag"].endswith('-7"')
+        build.assert_not_awaited()
+
+    def test_if_none_match_returns_304_until_profile_changes(self, client, test_app, stored):
+        async def override_get_user_id():
+            return "user_a_123"
+
+        test_app.dependency_overrides[get_user_id_from_auth] = override_get_user_id
+
+        with patch("backend.services.profile_mutations.async_user_profiles_col", stored), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock) as build:
+            etag = client.get("/profiles/user_a_123").headers["ETag"]
+            not_modified = client.get("/profiles/user_a_123", headers={"If-None-Match": f"W/{etag}"})
+
+            client.post("/profiles/explicit/add", json={"keyword": "rust"})
+            changed = client.get("/profiles/user_a_123", headers={"If-None-Match": etag})
+
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert "rust" in [e["keyword"] for e in changed.json()["explicit_interests"]]
+        build.assert_not_awaited()
+
+    def test_etag_differs_per_user(self, client):
+        with patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles({"user_id": "a", "profile_revision": 1}, {"user_id": "b", "profile_revision": 1})):
+            etag_a = client.get("/profiles/a").headers["ETag"]
+            response_b = client.get("/profiles/b", headers={"If-None-Match": etag_a})
+
+        assert response_b.status_code == 200
+
+    def test_refresh_forces_rebuild(self, client, stored):
+        rebuilt = {"user_id": "user_a_123", "implicit_interests": {}, "explicit_interests": [], "profile_revision": 8}
+        with patch("backend.services.profile_mutations.async_user_profiles_col", stored), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock,
+                   return_value=rebuilt) as build:
+            response = client.get("/profiles/user_a_123", params={"refresh": "true"})
+
+        assert response.status_code == 200
+        assert response.json()["profile_revision"] == 8
+        assert response.headers["ETag"].endswith('-8"')
+        build.assert_awaited_once_with("user_a_123")
+
+    def test_missing_profile_is_built(self, client):
+        built = {"user_id": "new_user", "implicit_interests": {}, "explicit_interests": [], "profile_revision": 1}
+        with patch("backend.services.profile_mutations.async_user_profiles_col", stored_profiles()), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock,
+                   return_value=built) as build:
+            response = client.get("/profiles/new_user", headers={"If-None-Match": '"anything"'})
+
+        assert response.status_code == 200
+        build.assert_awaited_once_with("new_user")
+
+    def test_settings_only_document_is_built(self, client):
+        built = {"user_id": "u1", "implicit_interests": {"ai": 1.0}, "explicit_interests": [], "profile_revision": 1}
+        with patch("backend.services.profile_mutations.async_user_profiles_col",
+                   stored_profiles({"user_id": "u1", "settings": {"personalization": True}})), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock,
+                   return_value=built) as build:
+            response = client.get("/profiles/u1")
+
+        assert response.json()["implicit_interests"] == {"ai": 1.0}
+        build.assert_awaited_once_with("u1")
+
+    def test_settings_change_invalidates_etag(self, client, stored):
+        with patch("backend.services.profile_mutations.async_user_profiles_col", stored), \
+             patch("backend.api.setting_routes.async_user_profiles_col", stored):
+            etag = client.get("/profiles/user_a_123").headers["ETag"]
+            client.post("/user/settings?user_id=user_a_123", json={"verbosity": "high"})
+            changed = client.get("/profiles/user_a_123", headers={"If-None-Match": etag})
+
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert changed.json()["settings"]["verbosity"] == "high"
+
+    def test_settings_default_merge_invalidates_etag(self, client):
+        profiles = stored_profiles({"user_id": "u1", "implicit_interests": {}, "explicit_interests": [],
+                                    "settings": {"verbosity": "low"}, "profile_revision": 2})
+        with patch("backend.services.profile_mutations.async_user_profiles_col", profiles), \
+             patch("backend.api.setting_routes.async_user_profiles_col", profiles):
+            etag = client.get("/profiles/u1").headers["ETag"]
+            client.get("/user/settings?user_id=u1")
+            changed = client.get("/profiles/u1", headers={"If-None-Match": etag})
+
+        assert changed.status_code == 200
+        assert changed.json()["settings"]["semantic_mode"] == "clarify_only"
+
+    async def test_etag_changes_after_rebuild_racing_an_edit(self):
+        from fastapi import Response
+        from backend.api import profile_routes
+        from backend.services import profile_mutations, user_profile_service
+
+        profiles = MemoryCollection("user_profiles")
+        profiles.insert_one({"user_id": "u1", "explicit_interests": [], "implicit_interests": {},
+                             "implicit_exclusions": [], "query_history": [], "profile_revision": 3})
+        col = AsyncMemoryCollection(profiles)
+        real_find_one = col.find_one
+        seen = {}
+
+        async def find_one_then_edit(*args, **kwargs):
+            doc = await real_find_one(*args, **kwargs)
+            if not seen:
+                seen["etag"] = None
+                # An edit and a client read land while the rebuild is scoring
+                await profile_mutations.add_explicit_interest("u1", "rust")
+                response = Response()
+                await profile_routes.load_profile("u1", response)
+                seen["etag"] = response.headers["ETag"]
+            return doc
+
+        queries = MemoryCollection("queries")
+        queries.insert_one({"user_id": "u1", "raw_text": "python asyncio", "timestamp": "2026-01-01T00:00:00+00:00"})
+        with patch.object(col, "find_one", find_one_then_edit, create=True), \
+             patch.object(profile_mutations, "async_user_profiles_col", col), \
+             patch.object(user_profile_service, "async_user_profiles_col", col), \
+             patch.object(user_profile_service, "async_queries_col", AsyncMemoryCollection(queries)), \
+             patch.object(user_profile_service, "async_interactions_col",
+                          AsyncMemoryCollection(MemoryCollection("interactions"))):
+            await user_profile_service.build_user_profile_async("u1")
+
+            response = Response()
+            profile = await profile_routes.load_profile("u1", response, if_none_match=seen["etag"])
+
+        assert not isinstance(profile, Response)
+        assert response.headers["ETag"] != seen["etag"]
+        assert profile["query_history"] and profile["explicit_interests"][0]["keyword"] == "rust"
+
+
+class TestProfileFieldsAndPaging:
+    """Test cases for `fields=` selection and limit/cursor paging on profile reads."""
+
+    @pytest.fixture
+    def heavy(self):
+        return stored_profiles({
+            "user_id": "heavy",
+            "explicit_interests": [{"keyword": "topic3", "weight": 1.0}],
+            "implicit_interests": {f"topic{i}": float(100 - i) for i in range(7)},
+            "implicit_exclusions": [],
+            "query_history": [f"q{i}" for i in range(7)],
+            "click_history": ["a.com", "b.com"],
+            "profile_revision": 2,
+        })
+
+    def test_fields_selects_top_level_fields(self, client, heavy):
+        with patch("backend.services.profile_mutations.async_user_profiles_col", heavy):
+            response = client.get("/profiles/heavy", params={"fields": "explicit_interests, click_history"})
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "explicit_interests": [{"keyword": "topic3", "weight": 1.0}],
+            "click_history": ["a.com", "b.com"],
+            "profile_revision": 2,
+        }
+
+    def test_paging_walks_every_entry_once(self, client, heavy):
+        pages, cursor = [], 0
+        with patch("backend.services.profile_mutations.async_user_profiles_col", heavy):
+            while cursor is not None:
+                data = client.get("/profiles/heavy", params={
+                    "fields": "implicit_interests,query_history", "limit": 3, "cursor": cursor,
+                }).json()
+                pages.append(data)
+                cursor = data["next_cursor"]
+
+        assert [list(p["implicit_interests"]) for p in pages] == [
+            ["topic0", "topic1", "topic2"], ["topic4", "topic5"], ["topic6"],  # topic3 is explicit
+        ]
+        assert sum((p["query_history"] for p in pages), []) == [f"q{i}" for i in range(7)]
+        assert "explicit_interests" not in pages[0]
+        assert "click_history" not in pages[0]
+
+    def test_limit_without_fields_pages_all_lists(self, client, heavy):
+        with patch("backend.services.profile_mutations.async_user_profiles_col", heavy):
+            data = client.get("/profiles/heavy", params={"limit": 2, "cursor": 1}).json()
+
+        assert data["query_history"] == ["q1", "q2"]
+        assert data["click_history"] == ["b.com"]
+        assert list(data["implicit_interests"]) == ["topic1", "topic2"]
+        assert data["explicit_interests"] == [{"keyword": "topic3", "weight": 1.0}]
+        assert data["next_cursor"] == 3
+
+    def test_rebuilt_profile_is_shaped_the_same_way(self, client, heavy):
+        rebuilt = {"user_id": "heavy", "implicit_interests": {"x": 2.0, "y": 1.0}, "explicit_interests": [],
+                   "implicit_exclusions": [], "query_history": ["q0"], "profile_revision": 3}
+        with patch("backend.services.profile_mutations.async_user_profiles_col", heavy), \
+             patch("backend.api.profile_routes.build_user_profile_async", new_callable=AsyncMock, return_value=rebuilt):
+            data = client.get("/profiles/heavy", params={
+                "refresh": "true", "fields": "implicit_interests", "limit": 1,
+            }).json()
+
+        assert data == {"implicit_interests": {"x": 2.0}, "profile_revision": 3, "next_cursor": 1}
+
+    def test_invalid_fields_and_limit_are_rejected(self, client, heavy):
+        with patch("backend.services.profile_mutations.async_user_profiles_col", heavy):
+            unknown = client.get("/profiles/heavy", params={"fields": "password"})
+            too_small = client.get("/profiles/heavy", params={"limit": 0})
+
+        assert unknown.status_code == 400
+        assert too_small.status_code == 422
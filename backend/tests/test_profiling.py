@@ -0,0 +1,85 @@
+"""
+Tests for services/profiling.py and api/profiling_routes.py.
+"""
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.services import profiling
+from backend.services.profiling import ProfilingMiddleware
+
+
+def _app(directory, sample_rate=0.0, max_files=50):
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(range(1000))}
+
+    app.add_middleware(ProfilingMiddleware, directory=directory, sample_rate=sample_rate, max_files=max_files)
+    return TestClient(app)
+
+
+class TestProfilingMiddleware:
+    """Test cases for request profiling triggers and storage."""
+
+    def test_admin_header_triggers_profile(self, tmp_path):
+        with patch.object(profiling, "PROFILING_ADMIN_TOKEN", "s3cret"):
+            client = _app(tmp_path)
+            plain = client.get("/work")
+            wrong = client.get("/work", headers={"X-Profile": "nope"})
+            profiled = client.get("/work", headers={"X-Profile": "s3cret"})
+
+        assert "x-profile-id" not in plain.headers
+        assert "x-profile-id" not in wrong.headers
+        name = profiled.headers["x-profile-id"]
+        assert (tmp_path / name).is_file()
+        assert "work" in profiling.render_text(tmp_path / name)
+
+    def test_sampling_and_directory_bound(self, tmp_path):
+        client = _app(tmp_path, sample_rate=1.0, max_files=2)
+        for _ in range(4):
+            client.get("/work")
+        assert len(list(tmp_path.glob("*.prof"))) == 2
+
+    def test_profile_path_rejects_traversal(self, tmp_path):
+        (tmp_path / "a.prof").write_bytes(b"")
+        assert profiling.profile_path("a.prof", tmp_path) is not None
+        assert profiling.profile_path("../a.prof", tmp_path) is None
+        assert profiling.profile_path("missing.prof", tmp_path) is None
+
+
+class TestProfilingRoutes:
+    """Test cases for the admin profile endpoints."""
+
+    def _client(self):
+        from backend.api.profiling_routes import router
+        app = FastAPI()
+        app.include_router(router)
+        return TestClient(app)
+
+    def test_requires_enabled_and_token(self, tmp_path):
+        client = self._client()
+        with patch.object(profiling, "PROFILING_ENABLED", False):
+            assert client.get("/admin/profiles").status_code == 404
+        with patch.object(profiling, "PROFILING_ENABLED", True), \
+             patch.object(profiling, "PROFILING_ADMIN_TOKEN", "s3cret"):
+            assert client.get("/admin/profiles", headers={"X-Admin-Token": "bad"}).status_code == 403
+
+    def test_list_and_download(self, tmp_path):
+        with patch.object(profiling, "PROFILING_ADMIN_TOKEN", "s3cret"):
+            name = _app(tmp_path).get("/work", headers={"X-Profile": "s3cret"}).headers["x-profile-id"]
+
+        client = self._client()
+        headers = {"X-Admin-Token": "s3cret"}
+        with patch.object(profiling, "PROFILING_ENABLED", True), \
+             patch.object(profiling, "PROFILING_ADMIN_TOKEN", "s3cret"), \
+             patch.object(profiling, "PROFILING_DIR", tmp_path):
+            listing = client.get("/admin/profiles", headers=headers).json()
+            download = client.get(f"/admin/profiles/{name}", headers=headers)
+            text = client.get(f"/admin/profiles/{name}?format=text", headers=headers)
+
+        assert [p["name"] for p in listing["profiles"]] == [name]
+        assert download.status_code == 200 and len(download.content) > 0
+        assert "cumulative" in text.text
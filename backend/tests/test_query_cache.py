@@ -0,0 +1,129 @@
+"""
+Tests for services/query_cache.py – QueryCache.
+"""
+import pytest
+
+from backend.services.query_cache import QueryCache, _canonicalize_query
+
+
+MODEL = "llama3.1"
+TEMP = 0.4
+
+
+class TestCanonicalizeQuery:
+    """Test cases for the canonical (filler-insensitive) query form."""
+
+    @pytest.mark.parametrize("a, b", [
+        ("python tutorial for beginners", "Python tutorial, for the beginners?"),
+        ("python tutorial for beginners", "beginners python tutorial"),
+        ("the best laptops", "laptops best"),
+    ])
+    def test_filler_variants_share_canonical_form(self, a, b):
+        """Punctuation, filler words and word order should not change the canonical form."""
+        assert _canonicalize_query(a) == _canonicalize_query(b)
+
+    @pytest.mark.parametrize("a, b", [
+        ("c programming", "r programming"),
+        ("iphone 15 review", "iphone 12 review"),
+        ("recipes with no eggs", "recipes with eggs"),
+        ("coffee without sugar", "coffee sugar"),
+        ("not python", "python"),
+        ("flights paris to london", "flights london to paris"),
+        ("flights to paris from london", "flights from paris to london"),
+        ("python tutorial", "python"),
+        ("best laptops", "laptops"),
+    ])
+    def test_distinct_searches_keep_distinct_forms(self, a, b):
+        """Negations, directions, numbers, single letters and content words are kept."""
+        assert _canonicalize_query(a) != _canonicalize_query(b)
+
+    def test_nfkc_and_casefold(self):
+        """Full-width and case variants should collapse to the same form."""
+        assert _canonicalize_query("ＰＹＴＨＯＮ Basics") == _canonicalize_query("python basics")
+
+    def test_only_stopwords_yields_empty(self):
+        """Queries with no meaningful tokens have no canonical form."""
+        assert _canonicalize_query("the and of") == ""
+
+
+class TestQueryCacheCanonicalTier:
+    """Test cases for canonical cache hits and the reuse policy."""
+
+    def test_exact_hit(self):
+        """An identical query is served from the exact tier."""
+        cache = QueryCache(ttl=60, canonical_policy="clarify_only")
+        cache.set("u1", "python tutorial", MODEL, TEMP, "clarify_only", "medium", "python guide")
+
+        value, tier = cache.lookup("u1", "Python  Tutorial", MODEL, TEMP, "clarify_only", "medium")
+
+        assert value == "python guide"
+        assert tier == "HIT"
+
+    def test_filler_variant_hits_canonical_tier(self):
+        """A query differing only in filler words is served from the canonical tier."""
+        cache = QueryCache(ttl=60, canonical_policy="clarify_only")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium", "expanded")
+
+        value, tier = cache.lookup("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium")
+
+        assert value == "expanded"
+        assert tier == "CANONICAL_HIT"
+        assert cache.get("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium") == "expanded"
+
+    @pytest.mark.parametrize("stored, asked", [
+        ("c programming", "r programming"),
+        ("iphone 15 review", "iphone 12 review"),
+        ("flights paris to london", "flights london to paris"),
+        ("recipes with no eggs", "recipes with eggs"),
+    ])
+    def test_distinct_searches_do_not_collide(self, stored, asked):
+        """A different search never gets another query's expansion."""
+        cache = QueryCache(ttl=60, canonical_policy="clarify_only")
+        cache.set("u1", stored, MODEL, TEMP, "clarify_only", "medium", "expanded")
+
+        value, tier = cache.lookup("u1", asked, MODEL, TEMP, "clarify_only", "medium")
+
+        assert value is None
+        assert tier == "MISS"
+
+    def test_clarify_only_policy_skips_personalized_mode(self):
+        """The default policy does not reuse canonical hits for personalized expansions."""
+        cache = QueryCache(ttl=60, canonical_policy="clarify_only")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_and_personalize", "medium", "expanded")
+
+        value, tier = cache.lookup("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_and_personalize", "medium")
+
+        assert value is None
+        assert tier == "MISS"
+
+    def test_always_policy_reuses_personalized_mode(self):
+        """The 'always' policy reuses canonical hits in every mode."""
+        cache = QueryCache(ttl=60, canonical_policy="always")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_and_personalize", "medium", "expanded")
+
+        value, tier = cache.lookup("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_and_personalize", "medium")
+
+        assert value == "expanded"
+        assert tier == "CANONICAL_HIT"
+
+    def test_off_policy_disables_canonical_tier(self):
+        """With the policy off, only exact matches are served."""
+        cache = QueryCache(ttl=60, canonical_policy="off")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium", "expanded")
+
+        assert cache.get("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium") is None
+
+    def test_canonical_tier_is_namespaced_by_user(self):
+        """Canonical hits never cross user namespaces."""
+        cache = QueryCache(ttl=60, canonical_policy="always")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium", "expanded")
+
+        assert cache.get("u2", "the python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium") is None
+
+    def test_clear_drops_canonical_entries(self):
+        """clear() empties both tiers."""
+        cache = QueryCache(ttl=60, canonical_policy="always")
+        cache.set("u1", "python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium", "expanded")
+        cache.clear()
+
+        assert cache.get("u1", "the python tutorial for beginners", MODEL, TEMP, "clarify_only", "medium") is None
@@ -89,3 +89,44 @@ class TestSearchRoutes:
         assert response.status_code == 200
         data = response.json()
         assert "results" in data
+
+    def test_guest_search_issues_session_id(self, client, mock_search_service, mock_logging_service):
+        """A guest without a session id gets one back in the header and body."""
+        response = client.get("/search?q=python&use_enhanced=false")
+
+        assert response.status_code == 200
+        issued = response.headers["X-Guest-Session"]
+        assert issued and response.json()["guest_session"] == issued
+
+    def test_guest_search_reuses_sent_session_id(self, client, mock_search_service, mock_logging_service):
+        """A guest's own session id is echoed back and its profile is updated."""
+        from backend.services.guest_sessions import guest_sessions
+
+        response = client.get("/search?q=python+decorators&use_enhanced=false",
+                              headers={"X-Guest-Session": "session-abc"})
+
+        assert response.headers["X-Guest-Session"] == "session-abc"
+        assert response.json()["profile_insight"]["query_history_size"] >= 1
+        assert "python" in guest_sessions.profile("session-abc")["implicit_interests"]
+
+    @pytest.mark.parametrize("use_enhanced, insight, source", [
+        (False, None, "disabled"),
+        (True, None, "error"),
+        (True, {"cache_status": "MISS", "fallback_reason": None}, "llm"),
+        (True, {"cache_status": "INFLIGHT", "fallback_reason": None}, "llm"),
+        (True, {"cache_status": "HIT", "fallback_reason": None}, "cache"),
+        (True, {"cache_status": "NEGATIVE_HIT", "fallback_reason": None}, "negative_cache"),
+        (True, {"cache_status": "DEFERRED", "fallback_reason": "latency_budget"}, "latency_budget"),
+        (True, {"cache_status": "BYPASS", "fallback_reason": "gate"}, "gate"),
+    ])
+    def test_expansion_source_names_the_producing_path(self, use_enhanced, insight, source):
+        """Logged query rows record which path produced enhanced_text."""
+        from backend.api.search_routes import _expansion_source
+
+        assert _expansion_source(use_enhanced, insight) == source
+
+    def test_search_logs_expansion_source(self, client, mock_search_service, mock_logging_service):
+        """The query row of an unexpanded search is marked as such."""
+        client.get("/search?q=python&use_enhanced=false")
+
+        assert mock_logging_service["log_query"].call_args.kwargs["expansion_source"] == "disabled"
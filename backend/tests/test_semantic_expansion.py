@@ -0,0 +1,323 @@
+"""
+Tests for services/semantic_expansion.py – expand_query resilience paths.
+"""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from backend.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from backend.services.query_cache import QueryCache, SHARED_NAMESPACE, SHARED_VERBOSITY
+from backend.services.personalization_context import PersonalizationContextCache
+
+
+def _mock_ollama(response_text=None, error=None):
+    """Build a patched httpx.AsyncClient whose post() returns `response_text` or raises `error`."""
+    client = MagicMock()
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=False)
+    if error is not None:
+        client.post = AsyncMock(side_effect=error)
+    else:
+        resp = MagicMock()
+        resp.raise_for_status.return_value = None
+        resp.json.return_value = {"response": response_text}
+        client.post = AsyncMock(return_value=resp)
+    return client
+
+
+@pytest.fixture
+def fresh_state():
+    """Isolate expand_query from module-level cache/breaker state."""
+    cache = QueryCache(ttl=3600, canonical_policy="off", negative_ttl=30)
+    breaker = CircuitBreaker("ollama-test", failure_threshold=2, reset_timeout=60)
+    profiles = AsyncMock()
+    profiles.find_one.return_value = None
+    contexts = PersonalizationContextCache(max_size=16)
+    with patch("backend.services.semantic_expansion.query_cache", cache), \
+         patch("backend.services.semantic_expansion.ollama_breaker", breaker), \
+         patch("backend.services.semantic_expansion.async_user_profiles_col", profiles), \
+         patch("backend.services.semantic_expansion.personalization_cache", contexts):
+        yield {"cache": cache, "breaker": breaker, "profiles": profiles, "contexts": contexts}
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker state transitions."""
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("t", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.allow_request() is False
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == HALF_OPEN
+        breaker.reset_timeout = 60
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+    def test_released_probe_frees_the_slot(self):
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == HALF_OPEN
+        breaker.reset_timeout = 60
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+        breaker.release_probe()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request() is True
+
+    def test_probe_success_closes(self):
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow_request() is True
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+
+class TestExpandQueryFailures:
+    """Test cases for LLM failure handling in expand_query."""
+
+    async def test_failure_is_negatively_cached(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query
+
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient",
+                   return_value=_mock_ollama(error=RuntimeError("down"))):
+            result = await expand_query("python", user_id="u1")
+
+        assert result["expanded_query"] == "python"
+        assert result["insight"]["fallback_reason"] == "llm_error"
+        value, tier = fresh_state["cache"].lookup(SHARED_NAMESPACE, "python", "llama3.1", 0.4, "clarify_only", SHARED_VERBOSITY)
+        assert tier == "NEGATIVE_HIT"
+
+    async def test_open_breaker_short_circuits(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query
+
+        breaker = fresh_state["breaker"]
+        breaker.record_failure()
+        breaker.record_failure()
+
+        mock_client = _mock_ollama(response_text="should not be used")
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient", return_value=mock_client):
+            result = await expand_query("rust", user_id="u1")
+
+        assert result["expanded_query"] == "rust"
+        assert result["insight"]["fallback_reason"] == "circuit_open"
+        mock_client.post.assert_not_called()
+
+    async def test_success_is_cached_with_full_ttl(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query
+
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient",
+                   return_value=_mock_ollama(response_text="golang concurrency tutorial")):
+            result = await expand_query("golang", user_id="u1")
+
+        assert result["expanded_query"] == "golang concurrency tutorial"
+        assert result["insight"]["fallback_reason"] is None
+        value, tier = fresh_state["cache"].lookup(SHARED_NAMESPACE, "golang", "llama3.1", 0.4, "clarify_only", SHARED_VERBOSITY)
+        assert tier == "HIT"
+
+
+class TestBreakerProbeRelease:
+    """Test cases for half-open probes that never reach Ollama."""
+
+    async def test_probe_dropped_from_queue_releases_slot(self, fresh_state):
+        from backend.services import semantic_expansion
+        from backend.services.semantic_expansion import SchedulerDeadlineExceeded
+
+        breaker = fresh_state["breaker"]
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.reset_timeout = 0
+        assert breaker.state == HALF_OPEN
+        breaker.reset_timeout = 60
+
+        with patch.object(semantic_expansion.llm_scheduler, "run", side_effect=SchedulerDeadlineExceeded()):
+            result = await semantic_expansion.expand_query("python", user_id="u1")
+
+        assert result["insight"]["fallback_reason"] == "queue_deadline"
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow_request() is True
+
+
+class TestExpansionLatencyBudget:
+    """Test cases for the per-request latency budget and deferred cache fill."""
+
+    async def test_slow_expansion_is_deferred_then_cached(self, fresh_state):
+        import asyncio
+        from backend.services import semantic_expansion
+
+        async def slow_post(*_a, **_kw):
+            await asyncio.sleep(0.2)
+            resp = MagicMock()
+            resp.raise_for_status.return_value = None
+            resp.json.return_value = {"response": "kubernetes deployment guide"}
+            return resp
+
+        mock_client = _mock_ollama()
+        mock_client.post = AsyncMock(side_effect=slow_post)
+
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient", return_value=mock_client), \
+             patch("backend.services.semantic_expansion.EXPANSION_BUDGET_MS", 20):
+            result = await semantic_expansion.expand_query("kubernetes", user_id="u1")
+
+            assert result["expanded_query"] == "kubernetes"
+            assert result["insight"]["cache_status"] == "DEFERRED"
+            assert result["insight"]["fallback_reason"] == "latency_budget"
+
+            await asyncio.gather(*list(semantic_expansion._background))
+
+            second = await semantic_expansion.expand_query("kubernetes", user_id="u1")
+
+        assert second["expanded_query"] == "kubernetes deployment guide"
+        assert second["insight"]["cache_status"] == "HIT"
+        assert mock_client.post.await_count == 1
+
+
+class TestProfileFastPath:
+    """Test cases for skipping profile I/O when the prompt is user-independent."""
+
+    @pytest.mark.parametrize("user_id,mode,verbosity", [
+        ("u1", "clarify_only", "medium"),
+        ("guest", "clarify_and_personalize", "medium"),
+        (None, "clarify_and_personalize", "high"),
+        ("u1", "clarify_and_personalize", "off"),
+    ])
+    async def test_no_profile_reads(self, fresh_state, user_id, mode, verbosity):
+        from backend.services.semantic_expansion import expand_query
+
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient",
+                   return_value=_mock_ollama(response_text="expanded")):
+            await expand_query("bread", user_id=user_id, semantic_mode=mode, verbosity=verbosity)
+
+        fresh_state["profiles"].find_one.assert_not_called()
+        value, tier = fresh_state["cache"].lookup(SHARED_NAMESPACE, "bread", "llama3.1", 0.4, mode, SHARED_VERBOSITY)
+        assert tier == "HIT"
+
+    async def test_prewarmed_expansion_serves_every_verbosity(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query, PRIORITY_PREWARM
+
+        mock_client = _mock_ollama(response_text="sourdough bread recipe")
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient", return_value=mock_client):
+            await expand_query("sourdough", user_id=None, semantic_mode="clarify_only", priority=PRIORITY_PREWARM)
+            for verbosity in ("off", "low", "medium", "high"):
+                result = await expand_query("sourdough", user_id="u1", verbosity=verbosity)
+                assert result["insight"]["cache_status"] == "HIT"
+
+        assert mock_client.post.await_count == 1
+
+
+class TestPersonalizationContext:
+    """Test cases for the memoized personalization context and cached insight."""
+
+    PROFILE = {
+        "user_id": "u1",
+        "profile_revision": 3,
+        "explicit_interests": [{"keyword": "baking", "weight": 0.9}],
+        "implicit_interests": {"python": 8.0},
+    }
+
+    def _profiles(self, fresh_state):
+        fresh_state["profiles"].find_one.side_effect = (
+            lambda query, projection=None: {"profile_revision": 3} if projection else dict(self.PROFILE)
+        )
+        return fresh_state["profiles"]
+
+    async def test_context_reused_until_revision_changes(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query
+
+        profiles = self._profiles(fresh_state)
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient",
+                   return_value=_mock_ollama(response_text="expanded")):
+            first = await expand_query("bread", user_id="u1", semantic_mode="clarify_and_personalize")
+            second = await expand_query("sourdough", user_id="u1", semantic_mode="clarify_and_personalize")
+
+        full_loads = [c for c in profiles.find_one.call_args_list if len(c.args) == 1]
+        assert len(full_loads) == 1
+        assert "baking" in first["insight"]["personalization_snippet"]
+        assert second["insight"]["personalization_snippet"] == first["insight"]["personalization_snippet"]
+        assert fresh_state["contexts"].hits == 1
+
+    async def test_cache_hit_returns_full_insight(self, fresh_state):
+        from backend.services.semantic_expansion import expand_query
+
+        self._profiles(fresh_state)
+        mock_client = _mock_ollama(response_text="bread baking recipes")
+        with patch("backend.services.semantic_expansion.httpx.AsyncClient", return_value=mock_client):
+            miss = await expand_query("bread", user_id="u1", semantic_mode="clarify_and_personalize")
+            hit = await expand_query("bread", user_id="u1", semantic_mode="clarify_and_personalize")
+
+        assert mock_client.post.await_count == 1
+        assert hit["insight"]["cache_status"] == "HIT"
+        for field in ("personalization_snippet", "top_explicit", "top_implicit", "used_interests", "model"):
+            assert hit["insight"][field] == miss["insight"][field]
+        assert hit["insight"]["top_explicit"] == [{"interest": "baking", "score": 0.9}]
+
+
+class TestLLMScheduler:
+    """Test cases for the bounded-concurrency LLM scheduler."""
+
+    async def test_priority_order_when_saturated(self):
+        import asyncio
+        from backend.services.semantic_expansion import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_PREWARM
+
+        scheduler = LLMScheduler(max_concurrency=1, shed_queue_depth=0)
+        gate = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await gate.wait()
+
+        def job(name):
+            async def _run():
+                order.append(name)
+            return _run
+
+        first = asyncio.ensure_future(scheduler.run(blocker))
+        await asyncio.sleep(0)
+        prewarm = asyncio.ensure_future(scheduler.run(job("prewarm"), priority=PRIORITY_PREWARM))
+        interactive = asyncio.ensure_future(scheduler.run(job("interactive"), priority=PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 2
+
+        gate.set()
+        await asyncio.gather(first, prewarm, interactive)
+
+        assert order == ["interactive", "prewarm"]
+        assert scheduler.stats()["started"] == 3
+
+    async def test_stale_queued_work_is_dropped(self):
+        import asyncio
+        import time
+        from backend.services.semantic_expansion import LLMScheduler, SchedulerDeadlineExceeded
+
+        scheduler = LLMScheduler(max_concurrency=1, shed_queue_depth=0)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def never_called():
+            raise AssertionError("stale work must not run")
+
+        first = asyncio.ensure_future(scheduler.run(blocker))
+        await asyncio.sleep(0)
+        stale = asyncio.ensure_future(scheduler.run(never_called, deadline=time.monotonic() - 1))
+        await asyncio.sleep(0)
+
+        gate.set()
+        await first
+        with pytest.raises(SchedulerDeadlineExceeded):
+            await stale
+        assert scheduler.stats()["dropped_stale"] == 1
+
+    def test_should_shed_above_threshold(self):
+        from backend.services.semantic_expansion import LLMScheduler
+
+        scheduler = LLMScheduler(max_concurrency=1, shed_queue_depth=2)
+        assert scheduler.should_shed() is False
+        scheduler._heap.extend([(0, 1, None, 0, None), (0, 2, None, 0, None)])
+        assert scheduler.should_shed() is True
+        assert scheduler.stats()["shed"] == 1
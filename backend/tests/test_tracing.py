@@ -0,0 +1,72 @@
+"""
+Tests for services/tracing.py – request spans and Server-Timing.
+"""
+import json
+from unittest.mock import patch
+
+from backend.services import tracing
+from backend.services.tracing import RequestTrace, span, current_trace
+
+
+class TestSpans:
+    """Test cases for span recording."""
+
+    def test_span_is_noop_outside_request(self):
+        assert current_trace() is None
+        with span("anything"):
+            pass
+
+    def test_server_timing_sums_repeated_spans(self):
+        trace = RequestTrace("GET", "/search")
+        token = tracing._current.set(trace)
+        try:
+            with span("google"):
+                pass
+            with span("expand"):
+                pass
+            with span("google"):
+                pass
+        finally:
+            tracing._current.reset(token)
+        trace.finish()
+
+        header = trace.server_timing()
+        names = [part.split(";")[0] for part in header.split(", ")]
+        assert names == ["google", "expand", "total"]
+        assert len(trace.to_dict()["spans"]) == 3
+
+    def test_spans_after_finish_are_ignored(self):
+        trace = RequestTrace()
+        trace.finish()
+        trace.add("late", 0.0, 1.0)
+        assert trace.spans == []
+
+
+class TestTracingMiddleware:
+    """Test cases for the Server-Timing header and trace sink."""
+
+    def test_search_response_has_server_timing(self, client, mock_search_service, mock_logging_service):
+        with patch("backend.api.search_routes.get_profile_insight_async", return_value=None):
+            response = client.get("/search?q=python&use_enhanced=false")
+
+        assert response.status_code == 200
+        timing = response.headers["server-timing"]
+        assert "log_query;dur=" in timing
+        assert "search;dur=" in timing
+        assert timing.split(", ")[-1].startswith("total;dur=")
+
+    def test_sampled_trace_written_to_sink(self, tmp_path):
+        sink_path = tmp_path / "traces.jsonl"
+        trace = RequestTrace("GET", "/search")
+        trace.add("google", trace.started, trace.started + 0.01)
+
+        with patch.object(tracing, "TRACE_SINK_PATH", str(sink_path)), \
+             patch.object(tracing, "TRACE_SAMPLE_RATE", 1.0), \
+             patch.object(tracing, "_sink_logger", None), \
+             patch.object(tracing, "_sink_pipeline", None):
+            tracing._record(trace, 200)
+            tracing.shutdown_sink()
+
+        line = json.loads(sink_path.read_text().strip())
+        assert line["path"] == "/search" and line["status"] == 200
+        assert line["spans"][0]["name"] == "google"
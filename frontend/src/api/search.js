@@ -2,6 +2,21 @@ import axios from "axios";
 import {getAuthHeaders, clearCurrentUser} from "../auth/auth.js";
 
 const API_BASE = import.meta.env.VITE_API_URL || "http://localhost:5000";
+const GUEST_SESSION_KEY = "guest_session";
+
+/**
+ * Headers for a request: auth when logged in, plus the anonymous session id
+ * the backend issued on the first guest search (lets guests get reranking
+ * from their own short-lived session profile).
+ */
+function requestHeaders(extra = {}) {
+    const guestSession = sessionStorage.getItem(GUEST_SESSION_KEY);
+    return {
+        ...extra,
+        ...getAuthHeaders(),
+        ...(guestSession ? {"X-Guest-Session": guestSession} : {}),
+    };
+}
 
 /**
  * Fetch the current user's settings from the backend.
@@ -33,10 +48,13 @@ export async function searchQuery(query) {
         `&verbosity=${encodeURIComponent(settings.verbosity)}` +
         `&semantic_mode=${encodeURIComponent(settings.semantic_mode)}`;
 
-    const headers = getAuthHeaders();
+    const headers = requestHeaders();
 
     try {
         const res = await axios.get(url, {headers});
+        if (res.data?.guest_session) {
+            sessionStorage.setItem(GUEST_SESSION_KEY, res.data.guest_session);
+        }
         return res.data;
     } catch (err) {
         if (err?.response?.status === 401) {
@@ -53,7 +71,7 @@ export async function searchQuery(query) {
 
 export async function logClick({user_id, query_id, clicked_url, rank}) {
     const url = `${API_BASE}/interactions`;
-    const headers = {"Content-Type": "application/json", ...getAuthHeaders()};
+    const headers = requestHeaders({"Content-Type": "application/json"});
     // If you pass user_id in the body it will be ignored if there's a logged-in user.
     try {
         await axios.post(
@@ -81,7 +99,7 @@ export async function logFeedback({
                                       is_relevant,
                                   }) {
     const url = `${API_BASE}/feedback`;
-    const headers = {"Content-Type": "application/json", ...getAuthHeaders()};
+    const headers = requestHeaders({"Content-Type": "application/json"});
     // If you pass user_id in the body it will be ignored if there's a logged-in users.
     try {
         //basically identical to logClick